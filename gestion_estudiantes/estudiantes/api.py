@@ -0,0 +1,235 @@
+import json
+from datetime import datetime, time, timedelta
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import Cohorte, DocumentoEstudiante, Especialidad, Estudiante, Extension
+from .paginacion import codificar_cursor, decodificar_cursor, paginar
+
+try:
+    import orjson
+except ImportError:  # opcional: pip install orjson
+    orjson = None
+
+
+# ====================================
+# ===== API JSON (solo lectura) ======
+# ====================================
+#
+# Para que otros sistemas lean estudiantes, documentos y datos de referencia sin
+# leer las páginas HTML. Las filas salen de .values() con las columnas de cohorte,
+# especialidad y extensión unidas en la misma consulta; los documentos de toda la
+# página se leen con una segunda consulta. No se crea ningún objeto del modelo, y la
+# respuesta se serializa con orjson si está instalado.
+#
+# estudiantes() pagina por id con un cursor (paginacion.py). cambios() devuelve los
+# estudiantes cambiados desde una fecha, en orden de (actualizado, id), y siempre
+# entrega un cursor para seguir desde ahí en la próxima consulta. Los estudiantes
+# eliminados no aparecen en cambios(): para detectarlos hay que leer la lista completa.
+
+VERSION = 1
+LIMITE = 100
+LIMITE_MAXIMO = 1000
+
+# Los cambios más recientes se entregan después de este margen: una transacción que
+# empezó antes puede confirmarse con una fecha anterior a la última ya entregada
+MARGEN_CAMBIOS = timedelta(seconds=10)
+
+# Campo de la API -> columna de .values()
+CAMPOS_SIMPLES = {
+    'id': 'id',
+    'cedula': 'cedula',
+    'nombres': 'nombres',
+    'apellidos': 'apellidos',
+    'estado_expediente': 'estado_expediente',
+    'total_documentos': 'total_documentos',
+    'documentos_entregados': 'documentos_entregados',
+    'documentos_faltantes': 'documentos_faltantes',
+    'actualizado': 'actualizado',
+}
+# Se entregan como {"id": ..., "nombre": ...}
+CAMPOS_REFERENCIA = {
+    'cohorte': 'cohorte__nombre_cohorte',
+    'especialidad': 'especialidad__nombre_especialidad',
+    'extension': 'extension__nombre_extension',
+}
+CAMPOS = [*CAMPOS_SIMPLES, *CAMPOS_REFERENCIA, 'documentos']
+
+FILTROS = ('cohorte', 'especialidad', 'extension')
+ESTADOS = [estado for estado, _ in Estudiante.EXPEDIENTES]
+
+# Tabla -> (modelo, campo del nombre, otros campos)
+REFERENCIAS = {
+    'cohortes': (Cohorte, 'nombre_cohorte', {'mes': 'mes', 'anio': 'anio'}),
+    'especialidades': (Especialidad, 'nombre_especialidad', {}),
+    'extensiones': (Extension, 'nombre_extension', {'direccion': 'direccion_extension'}),
+}
+
+
+def respuesta(datos, status=200):
+    if orjson is not None:
+        contenido = orjson.dumps(datos)
+    else:
+        contenido = json.dumps(datos, cls=DjangoJSONEncoder, ensure_ascii=False, separators=(',', ':')).encode()
+    return HttpResponse(contenido, content_type='application/json', status=status)
+
+
+# ===== Parámetros =====
+
+def _campos(parametros):
+    texto = parametros.get('fields', '').strip()
+    if not texto:
+        return CAMPOS
+    campos = list(dict.fromkeys(campo.strip() for campo in texto.split(',') if campo.strip()))
+    desconocidos = [campo for campo in campos if campo not in CAMPOS]
+    if desconocidos:
+        raise ValueError(f"Campos desconocidos: {', '.join(desconocidos)}. Válidos: {', '.join(CAMPOS)}.")
+    return campos
+
+
+def _limite(parametros):
+    valor = parametros.get('limit', '')
+    if not valor:
+        return LIMITE
+    if not valor.isdigit() or not 1 <= int(valor) <= LIMITE_MAXIMO:
+        raise ValueError(f"limit debe ser un número entre 1 y {LIMITE_MAXIMO}.")
+    return int(valor)
+
+
+def _filtrar(queryset, parametros):
+    for campo in FILTROS:
+        valor = parametros.get(campo, '')
+        if not valor:
+            continue
+        if not valor.isdigit():
+            raise ValueError(f"{campo} debe ser un id.")
+        queryset = queryset.filter(**{f'{campo}_id': int(valor)})
+    estado = parametros.get('estado', '')
+    if estado:
+        if estado not in ESTADOS:
+            raise ValueError(f"estado debe ser uno de: {', '.join(ESTADOS)}.")
+        queryset = queryset.filter(estado_expediente=estado)
+    return queryset
+
+
+def _fecha(texto):
+    """
+    Fecha y hora ISO 8601 ('2026-10-01T08:00:00Z' o '2026-10-01'); sin zona horaria
+    se toma la del servidor.
+    """
+    fecha = parse_datetime(texto)
+    if fecha is None:
+        dia = parse_date(texto)
+        if dia is None:
+            raise ValueError("since debe ser una fecha ISO 8601, por ejemplo 2026-10-01T08:00:00Z.")
+        fecha = datetime.combine(dia, time.min)
+    if timezone.is_naive(fecha):
+        fecha = timezone.make_aware(fecha)
+    return fecha
+
+
+# ===== Estudiantes =====
+
+def _columnas(campos, claves):
+    columnas = list(claves)
+    for campo in campos:
+        if campo in CAMPOS_SIMPLES:
+            columnas.append(CAMPOS_SIMPLES[campo])
+        elif campo in CAMPOS_REFERENCIA:
+            columnas += [f'{campo}_id', CAMPOS_REFERENCIA[campo]]
+    return list(dict.fromkeys(columnas))
+
+
+def _documentos(ids):
+    """
+    {id de estudiante: [documentos]} con una sola consulta.
+    """
+    por_estudiante = {pk: [] for pk in ids}
+    filas = (
+        DocumentoEstudiante.objects.filter(estudiante_id__in=ids)
+        .order_by('estudiante_id', 'tipo_documento')
+        .values_list('estudiante_id', 'tipo_documento', 'estado_documento', 'observacion',
+                     'fecha_entrega', 'fecha_vencimiento')
+    )
+    for estudiante_id, tipo, estado, observacion, entrega, vencimiento in filas:
+        por_estudiante[estudiante_id].append({
+            'tipo': tipo, 'estado': estado, 'observacion': observacion,
+            'fecha_entrega': entrega, 'fecha_vencimiento': vencimiento,
+        })
+    return por_estudiante
+
+
+def _salida(filas, campos):
+    documentos = _documentos([fila['id'] for fila in filas]) if 'documentos' in campos else {}
+    salida = []
+    for fila in filas:
+        estudiante = {}
+        for campo in campos:
+            if campo in CAMPOS_SIMPLES:
+                estudiante[campo] = fila[CAMPOS_SIMPLES[campo]]
+            elif campo in CAMPOS_REFERENCIA:
+                estudiante[campo] = {'id': fila[f'{campo}_id'], 'nombre': fila[CAMPOS_REFERENCIA[campo]]}
+            else:
+                estudiante[campo] = documentos[fila['id']]
+        salida.append(estudiante)
+    return salida
+
+
+def _cursor(parametros, claves):
+    cursor = parametros.get('cursor', '')
+    if cursor and decodificar_cursor(cursor, claves) is None:
+        raise ValueError("cursor no válido.")
+    return cursor
+
+
+def estudiantes(parametros):
+    """
+    Página de estudiantes por id: {'version', 'datos', 'siguiente'}. 'siguiente' es
+    el cursor de la página siguiente, o None si es la última.
+    """
+    campos = _campos(parametros)
+    claves = ('id',)
+    queryset = _filtrar(Estudiante.objects.all(), parametros).values(*_columnas(campos, claves))
+    filas, siguiente = paginar(queryset, claves, cursor=_cursor(parametros, claves), cantidad=_limite(parametros))
+    return {'version': VERSION, 'datos': _salida(filas, campos), 'siguiente': siguiente}
+
+
+def cambios(parametros):
+    """
+    Estudiantes cambiados desde 'since' (o desde el cursor de una consulta anterior),
+    en orden de cambio: {'version', 'datos', 'siguiente', 'hay_mas'}. 'siguiente'
+    siempre tiene un cursor, para seguir desde ahí aunque esta vez no haya cambios.
+    """
+    campos = _campos(parametros)
+    claves = ('actualizado', 'id')
+    cursor = _cursor(parametros, claves)
+    queryset = _filtrar(Estudiante.objects.all(), parametros)
+    queryset = queryset.filter(actualizado__lt=timezone.now() - MARGEN_CAMBIOS)
+    if not cursor and parametros.get('since'):
+        # El mismo cursor que "justo antes de 'since'": (since, 0)
+        cursor = codificar_cursor([_fecha(parametros['since']), 0])
+    filas, siguiente = paginar(
+        queryset.values(*_columnas(campos, claves)), claves, cursor=cursor, cantidad=_limite(parametros),
+    )
+    hay_mas = siguiente is not None
+    if not hay_mas:
+        siguiente = codificar_cursor([filas[-1]['actualizado'], filas[-1]['id']]) if filas else cursor or None
+    return {'version': VERSION, 'datos': _salida(filas, campos), 'siguiente': siguiente, 'hay_mas': hay_mas}
+
+
+# ===== Datos de referencia =====
+
+def referencias(tabla):
+    """
+    Todos los registros de 'cohortes', 'especialidades' o 'extensiones'.
+    """
+    modelo, nombre, otros = REFERENCIAS[tabla]
+    columnas = ['id', nombre, *otros.values()]
+    datos = [
+        {'id': fila[0], 'nombre': fila[1], **dict(zip(otros, fila[2:]))}
+        for fila in modelo.objects.order_by('pk').values_list(*columnas)
+    ]
+    return {'version': VERSION, 'datos': datos}
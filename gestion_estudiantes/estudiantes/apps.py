@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class EstudiantesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'estudiantes'
+
+    def ready(self):
+        from django.core import checks
+
+        from . import estaticos, signals  # noqa: F401 (registra los receptores)
+
+        checks.register(estaticos.revisar_librerias, checks.Tags.staticfiles, deploy=True)
@@ -0,0 +1,78 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+
+from . import perfiles
+
+
+# ====================================
+# ===== CONSULTAS DESDE VISTAS ASYNC =
+# ====================================
+#
+# Las vistas async de reportes (views.py) hacen su trabajo con la base de datos con
+# ejecutar() y en_paralelo(). El ORM async de Django (aget, acount...) manda todas
+# las consultas de una petición al mismo hilo, una detrás de otra. Con
+# CONSULTAS_CONCURRENTES, cada llamada va a uno de los CONSULTAS_HILOS hilos de un pool
+# del proceso, cada uno con su propia conexión, así varias consultas independientes
+# avanzan a la vez. Como en una petición, al terminar se cierran las conexiones
+# vencidas (CONN_MAX_AGE) o rotas; con el pool de PostgreSQL (CONN_MAX_AGE=0) la
+# conexión vuelve al pool.
+#
+# Los otros hilos no ven lo escrito en una transacción sin confirmar: por eso las
+# pruebas que corren dentro de una (TestCase) desactivan CONSULTAS_CONCURRENTES.
+
+
+_hilos = None
+
+
+def _pool():
+    global _hilos
+    if _hilos is None:
+        _hilos = ThreadPoolExecutor(max_workers=settings.CONSULTAS_HILOS, thread_name_prefix='consultas')
+    return _hilos
+
+
+def _con_conexion_propia(funcion):
+    def llamar(*args):
+        close_old_connections()
+        try:
+            return funcion(*args)
+        finally:
+            close_old_connections()
+    return llamar
+
+
+async def ejecutar(funcion, *args):
+    """
+    Ejecuta funcion(*args), que puede consultar la base de datos, fuera del bucle de eventos.
+    """
+    # En una petición perfilada, también se perfila el hilo que la ejecuta
+    funcion = perfiles.en_hilo(funcion)
+    if settings.CONSULTAS_CONCURRENTES:
+        return await sync_to_async(_con_conexion_propia(funcion), thread_sensitive=False, executor=_pool())(*args)
+    return await sync_to_async(funcion)(*args)
+
+
+async def en_paralelo(*funciones):
+    """
+    Ejecuta a la vez varias funciones sin argumentos y devuelve sus resultados en orden.
+    """
+    return await asyncio.gather(*(ejecutar(funcion) for funcion in funciones))
+
+
+async def iterar(iterador):
+    """
+    Recorre desde el bucle de eventos un iterador síncrono que consulta la base de datos
+    (por ejemplo, uno con queryset.iterator()). Cada paso se ejecuta en el hilo de la
+    petición y no en el pool: el cursor debe seguir en la misma conexión.
+    """
+    siguiente = sync_to_async(perfiles.en_hilo(next))
+    fin = object()
+    while True:
+        valor = await siguiente(iterador, fin)
+        if valor is fin:
+            return
+        yield valor
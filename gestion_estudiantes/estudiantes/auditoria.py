@@ -0,0 +1,170 @@
+import contextvars
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import DocumentoEstudiante, Estudiante, RegistroAuditoria
+
+
+# ====================================
+# ===== AUDITORÍA DE CAMBIOS =========
+# ====================================
+#
+# Quién creó, editó o eliminó un estudiante, sus documentos, una cohorte, especialidad,
+# extensión o usuario, y qué campos cambiaron. Las vistas toman una instantanea() del
+# registro antes de cambiarlo y llaman a registrar() después; documentos.py registra
+# los cambios de documentos.
+#
+# Los registros no se escriben en el momento. AuditoriaMiddleware (middleware.py)
+# abre un lote por petición y, cuando la vista termina, lo guarda con un solo
+# bulk_create. Un registro entra al lote cuando se confirma la transacción del cambio,
+# así un cambio revertido no queda auditado. Fuera de una petición (comandos, el
+# proceso de trabajos), o si el lote ya se guardó, se escribe enseguida.
+#
+# La tabla solo recibe INSERT: nada en la aplicación edita ni borra registros.
+
+CREAR = RegistroAuditoria.CREAR
+EDITAR = RegistroAuditoria.EDITAR
+ELIMINAR = RegistroAuditoria.ELIMINAR
+
+# No se comparan: se calculan a partir de otros datos
+OMITIDOS = {'id', 'actualizado', 'total_documentos', 'documentos_entregados', 'documentos_faltantes', 'estado_expediente'}
+# Se registra que cambiaron, pero no su valor
+OCULTOS = {'contrasena'}
+VALOR_OCULTO = '***'
+
+_lote = contextvars.ContextVar('auditoria', default=None)
+
+
+class Lote:
+    def __init__(self, request=None):
+        self.request = request
+        self.registros = []
+        self.guardado = False
+
+    def usuario(self):
+        if self.request is None:
+            return None, ''
+        sesion = self.request.session
+        return sesion.get('usuario_id'), sesion.get('usuario_nombre', '')
+
+
+def abrir(request):
+    """
+    Abre el lote de la petición. Devuelve (lote, token); al terminar la vista se
+    llama a cerrar(token) y después a guardar(lote).
+    """
+    lote = Lote(request)
+    return lote, _lote.set(lote)
+
+
+def cerrar(token):
+    _lote.reset(token)
+
+
+def guardar(lote):
+    lote.guardado = True
+    registros, lote.registros = lote.registros, []
+    if registros:
+        RegistroAuditoria.objects.bulk_create(registros)
+
+
+def _agregar(lote, registros):
+    if lote is None or lote.guardado:
+        RegistroAuditoria.objects.bulk_create(registros)
+    else:
+        lote.registros.extend(registros)
+
+
+# ===== Registrar cambios =====
+
+def instantanea(instancia):
+    """
+    {campo: valor} de un registro, para comparar después de cambiarlo.
+    """
+    return {
+        campo.attname: getattr(instancia, campo.attname)
+        for campo in instancia._meta.concrete_fields
+        if campo.attname not in OMITIDOS
+    }
+
+
+def diferencias(antes, despues):
+    """
+    {campo: [antes, después]} de los campos con distinto valor.
+    """
+    cambios = {}
+    for campo in {**antes, **despues}:
+        anterior, nuevo = antes.get(campo), despues.get(campo)
+        if anterior != nuevo:
+            if campo in OCULTOS:
+                anterior = VALOR_OCULTO if anterior is not None else None
+                nuevo = VALOR_OCULTO if nuevo is not None else None
+            cambios[campo] = [anterior, nuevo]
+    return cambios
+
+
+def agregar(modelo, accion, filas):
+    """
+    Agrega un registro por cada (objeto_id, estudiante_id, cambios) de 'filas' al
+    lote cuando se confirma la transacción en curso (de inmediato si no hay
+    transacción).
+    """
+    lote = _lote.get()
+    usuario_id, usuario_nombre = lote.usuario() if lote else (None, '')
+    fecha = timezone.now()
+    registros = [
+        RegistroAuditoria(
+            fecha=fecha, usuario_id=usuario_id, usuario_nombre=usuario_nombre or '',
+            modelo=modelo, objeto_id=objeto_id, estudiante_id=estudiante_id,
+            accion=accion, cambios=cambios,
+        )
+        for objeto_id, estudiante_id, cambios in filas
+    ]
+    if registros:
+        transaction.on_commit(lambda: _agregar(lote, registros))
+
+
+def registrar(accion, instancia, antes=None):
+    """
+    Audita que 'instancia' se creó (CREAR, después de guardarla), se editó (EDITAR,
+    'antes' es la instantanea() de antes del cambio) o se eliminará (ELIMINAR, antes
+    de borrarla). Una edición sin cambios no se registra.
+    """
+    actual = instantanea(instancia)
+    if accion == CREAR:
+        cambios = diferencias({}, actual)
+    elif accion == ELIMINAR:
+        cambios = diferencias(actual, {})
+    else:
+        cambios = diferencias(antes, actual)
+        if not cambios:
+            return
+    if isinstance(instancia, Estudiante):
+        estudiante_id = instancia.pk
+    else:
+        estudiante_id = getattr(instancia, 'estudiante_id', None)
+    agregar(type(instancia).__name__, accion, [(instancia.pk, estudiante_id, cambios)])
+
+
+def campo_documento(tipo, campo):
+    """
+    Nombre del campo en los cambios de documentos: el tipo para el estado y
+    'tipo (campo)' para los demás.
+    """
+    return tipo if campo == 'estado_documento' else f'{tipo} ({campo})'
+
+
+def documentos(estudiante_id, antes, despues):
+    """
+    Audita en un solo registro los documentos de un estudiante que cambiaron
+    ({tipo: {campo: valor}} antes y después).
+    """
+    cambios = {}
+    for tipo, valores in despues.items():
+        anteriores = antes.get(tipo, {})
+        for campo, valor in valores.items():
+            if anteriores.get(campo) != valor:
+                cambios[campo_documento(tipo, campo)] = [anteriores.get(campo), valor]
+    if cambios:
+        agregar(DocumentoEstudiante.__name__, EDITAR, [(None, estudiante_id, cambios)])
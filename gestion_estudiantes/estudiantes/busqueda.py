@@ -0,0 +1,158 @@
+import re
+from contextlib import contextmanager
+
+from django.db import connection
+from django.db.transaction import TransactionManagementError
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .models import Estudiante
+
+
+# ====================================
+# ===== BÚSQUEDA DE ESTUDIANTES ======
+# ====================================
+#
+# En SQLite se usa la tabla FTS5 'estudiantes_busqueda' (migración 0005), que ignora
+# mayúsculas y acentos y permite buscar por el comienzo de cada palabra:
+# "jose mar" encuentra a "José María". Los resultados se ordenan por relevancia
+# (bm25), dando más peso a la cédula. Si la base de datos no tiene FTS5 se usa
+# LIKE por prefijo sobre cada columna (sin ignorar acentos), con los índices de la
+# migración 0012 hechos para esas mismas expresiones.
+
+TABLA = 'estudiantes_busqueda'
+DISPARADOR_INSERTAR = 'estudiantes_busqueda_insertar'
+LIMITE = 20
+MAXIMO_PALABRAS = 6
+
+# Pesos bm25 por columna: cedula, nombres, apellidos
+PESOS = (10.0, 2.0, 3.0)
+
+# Mismas letras que acepta EstudianteForm, más los dígitos de la cédula
+_PALABRAS = re.compile(r'[0-9A-Za-zÁÉÍÓÚáéíóúÑñÜü]+')
+
+_disponible = {}
+
+
+def palabras(termino):
+    return _PALABRAS.findall(termino or '')[:MAXIMO_PALABRAS]
+
+
+def consulta_fts(termino):
+    """
+    'José Ma' -> '"José"* "Ma"*' (todas las palabras, cada una como prefijo).
+    Las comillas evitan que el texto se interprete como sintaxis de FTS5.
+    """
+    return ' '.join(f'"{palabra}"*' for palabra in palabras(termino))
+
+
+def fts_disponible():
+    """
+    True si la base de datos actual tiene la tabla de búsqueda (se consulta una vez por base).
+    """
+    nombre = connection.settings_dict['NAME']
+    if nombre not in _disponible:
+        _disponible[nombre] = (
+            connection.vendor == 'sqlite' and TABLA in connection.introspection.table_names()
+        )
+    return _disponible[nombre]
+
+
+def _filtro_like(termino):
+    # istartswith es UPPER(col) LIKE UPPER('x%') en PostgreSQL y LIKE sin distinguir
+    # mayúsculas en SQLite: no cambiar la expresión sin cambiar también los índices
+    condicion = Q()
+    for palabra in palabras(termino):
+        condicion &= (Q(cedula__startswith=palabra)
+                      | Q(apellidos__istartswith=palabra)
+                      | Q(nombres__istartswith=palabra))
+    return condicion
+
+
+def filtrar(queryset, termino):
+    """
+    Restringe un queryset de estudiantes a los que coinciden con el término, sin
+    cambiar su orden (lo usa la lista paginada de estudiantes).
+    """
+    if not palabras(termino):
+        return queryset
+    if fts_disponible():
+        return queryset.filter(pk__in=RawSQL(
+            f"SELECT rowid FROM {TABLA} WHERE {TABLA} MATCH %s", [consulta_fts(termino)]
+        ))
+    return queryset.filter(_filtro_like(termino))
+
+
+def buscar(termino, limite=LIMITE):
+    """
+    Lista de diccionarios (id, cedula, nombres, apellidos, estado_expediente) con los
+    estudiantes que coinciden, del más al menos relevante.
+    """
+    if not palabras(termino):
+        return []
+    if not fts_disponible():
+        return list(
+            Estudiante.objects.filter(_filtro_like(termino))
+            .order_by('apellidos', 'nombres', 'id')
+            .values('id', 'cedula', 'nombres', 'apellidos', 'estado_expediente')[:limite]
+        )
+
+    pesos = ', '.join(str(peso) for peso in PESOS)
+    sql = f"""
+        SELECT e.id, e.cedula, e.nombres, e.apellidos, e.estado_expediente
+        FROM {TABLA} b
+        JOIN estudiantes_estudiante e ON e.id = b.rowid
+        WHERE {TABLA} MATCH %s
+        ORDER BY bm25({TABLA}, {pesos}), e.apellidos, e.nombres
+        LIMIT %s
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [consulta_fts(termino), limite])
+        columnas = [col[0] for col in cursor.description]
+        return [dict(zip(columnas, fila)) for fila in cursor.fetchall()]
+
+
+def reconstruir():
+    """
+    Vuelve a generar el índice desde la tabla de estudiantes y lo compacta.
+    """
+    if not fts_disponible():
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(f"INSERT INTO {TABLA}({TABLA}) VALUES ('rebuild')")
+        cursor.execute(f"INSERT INTO {TABLA}({TABLA}) VALUES ('optimize')")
+    return True
+
+
+@contextmanager
+def insercion_masiva():
+    """
+    Para insertar muchos estudiantes dentro de una transacción: quita el disparador
+    de inserción y al terminar indexa con una sola sentencia los estudiantes nuevos
+    (id mayor al último que había), que es varias veces más rápido que fila por fila.
+    Si hay un error, el rollback deja el disparador como estaba.
+    """
+    if not fts_disponible():
+        yield
+        return
+    if not connection.in_atomic_block:
+        raise TransactionManagementError("insercion_masiva() debe usarse dentro de transaction.atomic().")
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = %s", [DISPARADOR_INSERTAR])
+        fila = cursor.fetchone()
+        if fila is None:
+            ultimo = None
+        else:
+            cursor.execute(f"SELECT COALESCE(MAX(id), 0) FROM {Estudiante._meta.db_table}")
+            ultimo = cursor.fetchone()[0]
+            cursor.execute(f"DROP TRIGGER {DISPARADOR_INSERTAR}")
+    yield
+    if ultimo is None:
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {TABLA}(rowid, cedula, nombres, apellidos) "
+            f"SELECT id, cedula, nombres, apellidos FROM {Estudiante._meta.db_table} WHERE id > %s",
+            [ultimo],
+        )
+        cursor.execute(fila[0])
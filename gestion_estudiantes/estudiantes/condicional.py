@@ -0,0 +1,110 @@
+import hashlib
+from functools import wraps
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+
+from . import versiones
+
+
+# ====================================
+# ===== RESPUESTAS CONDICIONALES =====
+# ====================================
+#
+# Cada tabla tiene una versión de datos (versiones.py) que cambia con cualquier
+# escritura: las señales de signals.py cubren save() y delete(), y las escrituras
+# masivas (importación, documentos en bloque, recálculo de expedientes) llaman a
+# cambiaron(). Las vistas decoradas con @segun_tablas(...) envían un ETag armado
+# con esas versiones, la URL, el usuario y su rol (las plantillas muestran botones
+# distintos por rol), y responden 304 sin consultar la base de datos cuando el
+# navegador ya tiene esa versión (If-None-Match).
+#
+# El ETag incluye además una huella de las plantillas y de views.py, para que un
+# cambio de código no deje páginas viejas en el navegador. Las plantillas de estas
+# vistas no muestran los mensajes de django.contrib.messages (solo login.html lo
+# hace); una vista que los muestre no debe decorarse.
+
+# Las que muestran los reportes
+REPORTES = ('estudiantes', 'documentos', 'cohortes', 'especialidades', 'extensiones')
+
+
+def _clave(tabla):
+    return f'tabla:{tabla}'
+
+
+def cambiaron(*tablas):
+    """
+    Cambia la versión de datos de esas tablas al confirmarse la transacción en curso.
+    """
+    for tabla in tablas:
+        versiones.incrementar(_clave(tabla))
+
+
+_huella_codigo = None
+
+
+def _codigo():
+    global _huella_codigo
+    if _huella_codigo is None:
+        carpeta = Path(__file__).resolve().parent
+        archivos = sorted([*(carpeta / 'templates').rglob('*.html'), carpeta / 'views.py'])
+        huella = hashlib.sha1()
+        for archivo in archivos:
+            estado = archivo.stat()
+            huella.update(f'{archivo.name}:{estado.st_mtime_ns}:{estado.st_size};'.encode())
+        _huella_codigo = huella.hexdigest()[:12]
+    return _huella_codigo
+
+
+def etag(request, valores):
+    partes = [
+        _codigo(),
+        request.get_full_path(),
+        str(request.session.get('usuario_id')),
+        str(request.session.get('usuario_rol')),
+        *map(str, valores),
+    ]
+    return '"' + hashlib.sha1('|'.join(partes).encode()).hexdigest() + '"'
+
+
+def _completar(respuesta, valor):
+    if respuesta.status_code == 200:
+        respuesta.headers.setdefault('ETag', valor)
+    if respuesta.status_code in (200, 304):
+        # El navegador debe preguntar siempre; la página depende de la cookie de sesión
+        patch_cache_control(respuesta, private=True, no_cache=True)
+        patch_vary_headers(respuesta, ['Cookie'])
+    return respuesta
+
+
+def segun_tablas(*tablas):
+    """
+    Decorador de vistas GET (síncronas o async) cuyo contenido depende solo de esas
+    tablas, de la URL y del usuario.
+    """
+    def decorador(vista):
+        if iscoroutinefunction(vista):
+            @wraps(vista)
+            async def envoltura(request, *args, **kwargs):
+                # Carga la sesión sin bloquear; después se lee de memoria
+                await request.session.aget('usuario_id')
+                if request.method not in ('GET', 'HEAD'):
+                    return await vista(request, *args, **kwargs)
+                valor = etag(request, [await versiones.aversion(_clave(tabla)) for tabla in tablas])
+                respuesta = get_conditional_response(request, etag=valor)
+                if respuesta is None:
+                    respuesta = await vista(request, *args, **kwargs)
+                return _completar(respuesta, valor)
+        else:
+            @wraps(vista)
+            def envoltura(request, *args, **kwargs):
+                if request.method not in ('GET', 'HEAD'):
+                    return vista(request, *args, **kwargs)
+                valor = etag(request, [versiones.version(_clave(tabla)) for tabla in tablas])
+                respuesta = get_conditional_response(request, etag=valor)
+                if respuesta is None:
+                    respuesta = vista(request, *args, **kwargs)
+                return _completar(respuesta, valor)
+        return envoltura
+    return decorador
@@ -0,0 +1,296 @@
+from django.db import connection, transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from . import auditoria, condicional, expedientes, pivote
+from .models import DocumentoEstudiante, Estudiante
+
+
+# ====================================
+# ===== DOCUMENTOS DE UN ESTUDIANTE ==
+# ====================================
+#
+# guardar() registra o edita a un estudiante junto con los estados (y las fechas de
+# entrega y vencimiento) de sus documentos con una cantidad fija de consultas: lee
+# los documentos actuales una vez, calcula el resumen del expediente en memoria (se
+# guarda con el mismo save() del estudiante) y escribe solo los documentos que
+# cambian, todos en una sentencia. Debe llamarse dentro de una transacción.
+#
+# en_bloque() cambia el estado de un tipo de documento a todos los estudiantes de una
+# cohorte, extensión, especialidad o lista de cédulas con sentencias sobre conjuntos:
+# un INSERT ... SELECT para los que no tienen el documento, un UPDATE para los que lo
+# tienen en otro estado y un UPDATE del resumen de esos estudiantes, en la misma
+# transacción. Antes marca como actualizados (Estudiante.actualizado) a los
+# estudiantes a los que algo les cambia y deja un registro de auditoría por cada uno.
+
+TIPOS = [tipo for tipo, _ in DocumentoEstudiante.TIPOS_DOCUMENTO]
+ESTADOS = [estado for estado, _ in DocumentoEstudiante.ESTADOS_DOCUMENTO]
+FECHAS = ('fecha_entrega', 'fecha_vencimiento')
+# Campos que escribe guardar()
+CAMPOS = ('estado_documento', *FECHAS)
+SIN_DOCUMENTO = {'estado_documento': "Vacío", 'fecha_entrega': None, 'fecha_vencimiento': None}
+
+
+def estados_enviados(datos, por_defecto=None):
+    """
+    {tipo: estado} tomado de un formulario con un campo por tipo de documento. Los
+    tipos sin un estado válido quedan en 'por_defecto', o se omiten si es None.
+    """
+    estados = {}
+    for tipo in TIPOS:
+        estado = datos.get(tipo)
+        if estado in ESTADOS:
+            estados[tipo] = estado
+        elif por_defecto is not None:
+            estados[tipo] = por_defecto
+    return estados
+
+
+def fechas_enviadas(datos):
+    """
+    {tipo: {campo: fecha}} tomado de un formulario con los campos
+    'fecha_entrega:<tipo>' y 'fecha_vencimiento:<tipo>' (AAAA-MM-DD; vacío es sin
+    fecha). Solo incluye los campos enviados.
+    """
+    fechas = {}
+    for tipo in TIPOS:
+        enviadas = {campo: _fecha(datos[f'{campo}:{tipo}']) for campo in FECHAS if f'{campo}:{tipo}' in datos}
+        if enviadas:
+            fechas[tipo] = enviadas
+    return fechas
+
+
+def _fecha(texto):
+    try:
+        return parse_date(texto.strip())
+    except ValueError:
+        return None
+
+
+def _escribir(estudiante, documentos, ids):
+    """
+    Crea o actualiza 'documentos' ({tipo: {campo: valor}}, con todos los CAMPOS).
+    'ids' tiene el id de los que ya existen ({tipo: id}).
+    """
+    nuevos = [DocumentoEstudiante(estudiante=estudiante, tipo_documento=tipo, **valores)
+              for tipo, valores in documentos.items()]
+    if connection.features.supports_update_conflicts_with_target:
+        # Un solo INSERT ... ON CONFLICT (estudiante, tipo) DO UPDATE
+        DocumentoEstudiante.objects.bulk_create(
+            nuevos,
+            update_conflicts=True,
+            unique_fields=['estudiante', 'tipo_documento'],
+            update_fields=list(CAMPOS),
+        )
+        return
+    DocumentoEstudiante.objects.bulk_create([d for d in nuevos if d.tipo_documento not in ids])
+    existentes = [d for d in nuevos if d.tipo_documento in ids]
+    for documento in existentes:
+        documento.pk = ids[documento.tipo_documento]
+    DocumentoEstudiante.objects.bulk_update(existentes, list(CAMPOS))
+
+
+def guardar(estudiante, estados, fechas=None):
+    """
+    Guarda al estudiante (nuevo o existente) y deja sus documentos en 'estados'
+    ({tipo: estado}) y 'fechas' ({tipo: {campo: fecha}}, ver fechas_enviadas); lo que
+    no aparece no cambia. Devuelve los documentos que cambiaron de estado, {tipo: estado}.
+    """
+    fechas = fechas or {}
+    actuales = {}
+    ids = {}
+    if not estudiante._state.adding:
+        for pk, tipo, *valores in (DocumentoEstudiante.objects.filter(estudiante=estudiante)
+                                   .values_list('pk', 'tipo_documento', *CAMPOS)):
+            actuales[tipo] = dict(zip(CAMPOS, valores))
+            ids[tipo] = pk
+
+    cambian = {}
+    for tipo in {**estados, **fechas}:
+        valores = {**actuales.get(tipo, SIN_DOCUMENTO), **fechas.get(tipo, {})}
+        if tipo in estados:
+            valores['estado_documento'] = estados[tipo]
+        if valores != actuales.get(tipo):
+            cambian[tipo] = valores
+
+    finales = {tipo: valores['estado_documento'] for tipo, valores in {**actuales, **cambian}.items()}
+    for campo, valor in expedientes.resumir_estados(finales.values()).items():
+        setattr(estudiante, campo, valor)
+    estudiante.save()
+
+    if cambian:
+        _escribir(estudiante, cambian, ids)
+        auditoria.documentos(estudiante.pk, actuales, cambian)
+        # bulk_create no envía señales
+        pivote.invalidar()
+        condicional.cambiaron('documentos')
+    return {
+        tipo: valores['estado_documento'] for tipo, valores in cambian.items()
+        if actuales.get(tipo, {}).get('estado_documento') != valores['estado_documento']
+    }
+
+
+# ===== Cambios en bloque =====
+
+FILTROS = ('cohorte', 'especialidad', 'extension', 'cedulas')
+
+
+def estudiantes_filtrados(filtros):
+    """
+    Estudiantes que cumplen todos los filtros dados: {'cohorte': id, 'especialidad': id,
+    'extension': id, 'cedulas': [...]}; los vacíos se ignoran.
+    """
+    queryset = Estudiante.objects.all()
+    for campo in ('cohorte', 'especialidad', 'extension'):
+        if filtros.get(campo) is not None:
+            queryset = queryset.filter(**{f'{campo}_id': filtros[campo]})
+    if filtros.get('cedulas'):
+        queryset = queryset.filter(cedula__in=filtros['cedulas'])
+    return queryset
+
+
+def _crear_faltantes(estudiantes, tipo, estado, observacion):
+    """
+    INSERT ... SELECT del documento 'tipo' para los estudiantes que no lo tienen.
+    """
+    faltantes = estudiantes.exclude(documentos__tipo_documento=tipo).values('pk')
+    subconsulta, parametros = faltantes.query.sql_with_params()
+    tabla = DocumentoEstudiante._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {tabla} (estudiante_id, tipo_documento, estado_documento, observacion) "
+            f"SELECT {Estudiante._meta.pk.column}, %s, %s, %s FROM {Estudiante._meta.db_table} "
+            f"WHERE {Estudiante._meta.pk.column} IN ({subconsulta})",
+            [tipo, estado, observacion, *parametros],
+        )
+        return cursor.rowcount
+
+
+def _auditar_en_bloque(distintos, estudiantes, tipo, estado, observacion):
+    """
+    Un registro de auditoría por estudiante al que se le cambia o se le crea el documento.
+    """
+    filas = []
+    for estudiante_id, anterior, observacion_anterior in distintos.values_list(
+            'estudiante_id', 'estado_documento', 'observacion').iterator():
+        cambios = {}
+        if anterior != estado:
+            cambios[tipo] = [anterior, estado]
+        if observacion is not None and observacion_anterior != observacion:
+            cambios[auditoria.campo_documento(tipo, 'observacion')] = [observacion_anterior, observacion]
+        filas.append((None, estudiante_id, cambios))
+    for estudiante_id in estudiantes.exclude(documentos__tipo_documento=tipo).values_list('pk', flat=True).iterator():
+        filas.append((None, estudiante_id, {tipo: [None, estado]}))
+    auditoria.agregar(DocumentoEstudiante.__name__, auditoria.EDITAR, filas)
+
+
+def en_bloque(tipo, estado, filtros, observacion=None, aplicar=False):
+    """
+    Deja el documento 'tipo' en 'estado' (y 'observacion', si no es None) para los
+    estudiantes que cumplen 'filtros'; crea el documento a quienes no lo tienen. Con
+    aplicar=False solo cuenta. Devuelve {'estudiantes', 'documentos', 'cambian',
+    'faltantes', 'no_encontradas'} y, al aplicar, 'actualizados' y 'creados'.
+    """
+    if tipo not in TIPOS or estado not in ESTADOS:
+        raise ValueError(f"Tipo o estado de documento no válido: {tipo}, {estado}")
+    if not any(filtros.get(campo) for campo in FILTROS):
+        raise ValueError("Se necesita al menos un filtro.")
+
+    with transaction.atomic():
+        estudiantes = estudiantes_filtrados(filtros)
+        documentos = DocumentoEstudiante.objects.filter(estudiante__in=estudiantes, tipo_documento=tipo)
+        distintos = ~Q(estado_documento=estado)
+        if observacion is not None:
+            distintos |= ~Q(observacion=observacion)
+        resultado = documentos.aggregate(documentos=Count('pk'), cambian=Count('pk', filter=distintos))
+        resultado['estudiantes'] = estudiantes.count()
+        resultado['faltantes'] = resultado['estudiantes'] - resultado['documentos']
+        resultado['no_encontradas'] = []
+        if filtros.get('cedulas'):
+            encontradas = set(estudiantes.values_list('cedula', flat=True))
+            resultado['no_encontradas'] = [c for c in filtros['cedulas'] if c not in encontradas]
+        if not aplicar:
+            return resultado
+
+        cambios = {'estado_documento': estado}
+        if observacion is not None:
+            cambios['observacion'] = observacion
+        if resultado['cambian'] or resultado['faltantes']:
+            # Antes de escribir, mientras se distingue a quiénes les cambia algo
+            Estudiante.objects.filter(
+                Q(pk__in=documentos.filter(distintos).values('estudiante'))
+                | Q(pk__in=estudiantes.exclude(documentos__tipo_documento=tipo).values('pk'))
+            ).update(actualizado=timezone.now())
+            _auditar_en_bloque(documentos.filter(distintos), estudiantes, tipo, estado, observacion)
+        resultado['actualizados'] = documentos.filter(distintos).update(**cambios)
+        resultado['creados'] = _crear_faltantes(estudiantes, tipo, estado, observacion) if resultado['faltantes'] else 0
+        if resultado['actualizados'] or resultado['creados']:
+            expedientes.recalcular_resumen(estudiantes)
+            pivote.invalidar()
+            condicional.cambiaron('documentos')
+    return resultado
+
+
+# ===== Vencimiento =====
+# vencer() pasa a 'Vencida' los documentos entregados cuya fecha de vencimiento ya
+# llegó. Los busca por el índice parcial documento_vencimiento_idx (un rango de fechas
+# por estado) y los cambia por lotes, cada uno en su propia transacción, para no
+# bloquear la base de datos mucho tiempo. Lo ejecuta el comando vencer_documentos.
+
+ESTADOS_VENCIBLES = ["Sí", "Copia"]
+ESTADO_VENCIDO = "Vencida"
+LOTE_VENCIMIENTO = 500
+
+
+def por_vencer(fecha):
+    """
+    Documentos entregados que vencen el día 'fecha' o antes.
+    """
+    return DocumentoEstudiante.objects.filter(estado_documento__in=ESTADOS_VENCIBLES, fecha_vencimiento__lte=fecha)
+
+
+def _vencer_lote(fecha, lote, resumen):
+    with transaction.atomic():
+        filas = list(por_vencer(fecha).values_list(
+            'pk', 'estudiante_id', 'estudiante__cohorte__nombre_cohorte', 'tipo_documento', 'estado_documento',
+        )[:lote])
+        if not filas:
+            return 0
+        DocumentoEstudiante.objects.filter(pk__in=[fila[0] for fila in filas]).update(estado_documento=ESTADO_VENCIDO)
+        estudiantes = {}
+        for _, estudiante_id, cohorte, tipo, estado in filas:
+            estudiantes.setdefault(estudiante_id, {})[tipo] = [estado, ESTADO_VENCIDO]
+            resumen.setdefault(cohorte, {}).setdefault(tipo, 0)
+            resumen[cohorte][tipo] += 1
+        Estudiante.objects.filter(pk__in=list(estudiantes)).update(actualizado=timezone.now())
+        expedientes.recalcular_resumen(list(estudiantes))
+        auditoria.agregar(DocumentoEstudiante.__name__, auditoria.EDITAR,
+                          [(None, estudiante_id, cambios) for estudiante_id, cambios in estudiantes.items()])
+    return len(filas)
+
+
+def vencer(fecha, lote=LOTE_VENCIMIENTO, aplicar=True):
+    """
+    Vence los documentos de por_vencer(fecha) en lotes de 'lote'. Devuelve el resumen
+    por cohorte, {cohorte: {tipo: cantidad}}; con aplicar=False solo cuenta.
+    """
+    resumen = {}
+    if not aplicar:
+        conteos = (por_vencer(fecha).values_list('estudiante__cohorte__nombre_cohorte', 'tipo_documento')
+                   .annotate(n=Count('pk')).order_by())
+        for cohorte, tipo, n in conteos:
+            resumen.setdefault(cohorte, {})[tipo] = n
+        return resumen
+
+    vencidos = 0
+    while True:
+        cantidad = _vencer_lote(fecha, lote, resumen)
+        if not cantidad:
+            break
+        vencidos += cantidad
+    if vencidos:
+        # update() no envía señales
+        pivote.invalidar()
+        condicional.cambiaron('documentos')
+    return resumen
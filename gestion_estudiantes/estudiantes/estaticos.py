@@ -0,0 +1,171 @@
+import gzip
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.core import checks
+from django.contrib.staticfiles import finders
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.exceptions import ImproperlyConfigured, SuspiciousFileOperation
+from django.http import FileResponse, HttpResponseNotFound
+from django.templatetags.static import static
+from django.utils._os import safe_join
+
+try:
+    import brotli
+except ImportError:  # opcional: pip install brotli
+    brotli = None
+
+
+# ====================================
+# ===== ARCHIVOS ESTÁTICOS ===========
+# ====================================
+#
+# Las librerías de JavaScript y CSS se guardan en estudiantes/static/vendor/ (las baja
+# "python manage.py descargar_estaticos") en vez de pedirse a los CDN en cada página.
+# En producción (ESTATICOS_MANIFIESTO) collectstatic les agrega el hash del contenido
+# al nombre y deja al lado una copia .gz (y .br si está instalado brotli);
+# EstaticosMiddleware las sirve desde STATIC_ROOT con caché de un año.
+
+# Ruta dentro de vendor/ -> URL de origen (versiones fijas)
+LIBRERIAS = {
+    'jquery/3.7.0/jquery.min.js': 'https://code.jquery.com/jquery-3.7.0.min.js',
+    'chart.js/4.4.1/chart.umd.js': 'https://cdn.jsdelivr.net/npm/chart.js@4.4.1/dist/chart.umd.js',
+    'font-awesome/6.5.0/css/all.min.css': 'https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.5.0/css/all.min.css',
+    # DataTables 1.13 (listas, con Responsive)
+    'datatables/1.13.6/css/jquery.dataTables.min.css': 'https://cdn.datatables.net/1.13.6/css/jquery.dataTables.min.css',
+    'datatables/1.13.6/js/jquery.dataTables.min.js': 'https://cdn.datatables.net/1.13.6/js/jquery.dataTables.min.js',
+    'datatables/1.13.6/i18n/es-ES.json': 'https://cdn.datatables.net/plug-ins/1.13.6/i18n/es-ES.json',
+    'datatables/responsive/2.5.0/css/responsive.dataTables.min.css': 'https://cdn.datatables.net/responsive/2.5.0/css/responsive.dataTables.min.css',
+    'datatables/responsive/2.5.0/js/dataTables.responsive.min.js': 'https://cdn.datatables.net/responsive/2.5.0/js/dataTables.responsive.min.js',
+    # DataTables 2 (reportes, con Buttons)
+    'datatables/2.0.8/css/dataTables.dataTables.min.css': 'https://cdn.datatables.net/2.0.8/css/dataTables.dataTables.min.css',
+    'datatables/2.0.8/js/dataTables.min.js': 'https://cdn.datatables.net/2.0.8/js/dataTables.min.js',
+    'datatables/2.0.8/i18n/es-ES.json': 'https://cdn.datatables.net/plug-ins/2.0.8/i18n/es-ES.json',
+    'datatables/buttons/3.0.2/css/buttons.dataTables.min.css': 'https://cdn.datatables.net/buttons/3.0.2/css/buttons.dataTables.min.css',
+    'datatables/buttons/3.0.2/js/dataTables.buttons.min.js': 'https://cdn.datatables.net/buttons/3.0.2/js/dataTables.buttons.min.js',
+    'datatables/buttons/3.0.2/js/buttons.html5.min.js': 'https://cdn.datatables.net/buttons/3.0.2/js/buttons.html5.min.js',
+    'datatables/buttons/3.0.2/js/buttons.print.min.js': 'https://cdn.datatables.net/buttons/3.0.2/js/buttons.print.min.js',
+    # Solo se cargan al exportar (static/js/exportacion_diferida.js)
+    'jszip/3.10.1/jszip.min.js': 'https://cdnjs.cloudflare.com/ajax/libs/jszip/3.10.1/jszip.min.js',
+    'pdfmake/0.2.7/pdfmake.min.js': 'https://cdnjs.cloudflare.com/ajax/libs/pdfmake/0.2.7/pdfmake.min.js',
+    'pdfmake/0.2.7/vfs_fonts.js': 'https://cdnjs.cloudflare.com/ajax/libs/pdfmake/0.2.7/vfs_fonts.js',
+}
+
+_disponibles = {}
+
+
+def url_libreria(ruta):
+    """
+    URL de una librería de LIBRERIAS: la copia local. Solo en desarrollo, mientras no se
+    haya descargado, la del CDN; en producción (ESTATICOS_MANIFIESTO) falta es un error.
+    """
+    if ruta not in _disponibles:
+        _disponibles[ruta] = finders.find(f'vendor/{ruta}') is not None
+    if _disponibles[ruta]:
+        return static(f'vendor/{ruta}')
+    if settings.ESTATICOS_MANIFIESTO:
+        raise ImproperlyConfigured(
+            f"Falta estudiantes/static/vendor/{ruta}: ejecute 'python manage.py descargar_estaticos'."
+        )
+    return LIBRERIAS[ruta]
+
+
+def revisar_librerias(app_configs, **kwargs):
+    """
+    Chequeo de "manage.py check --deploy": error si faltan librerías en vendor/, porque
+    en producción esas páginas no se podrían generar.
+    """
+    faltantes = [ruta for ruta in LIBRERIAS if finders.find(f'vendor/{ruta}') is None]
+    if not faltantes:
+        return []
+    return [checks.Error(
+        f"Faltan {len(faltantes)} de {len(LIBRERIAS)} librerías en estudiantes/static/vendor/ "
+        f"(por ejemplo {faltantes[0]}).",
+        hint="Ejecute 'python manage.py descargar_estaticos' y agregue vendor/ al repositorio.",
+        id='estudiantes.E001',
+    )]
+
+
+# ===== Compresión en collectstatic =====
+
+COMPRIMIBLES = ('.js', '.css', '.json', '.svg', '.txt', '.html', '.ttf', '.eot', '.otf')
+TAMANO_MINIMO = 1024
+
+
+def _comprimir(ruta):
+    with open(ruta, 'rb') as archivo:
+        datos = archivo.read()
+    if len(datos) < TAMANO_MINIMO:
+        return
+    variantes = [('.gz', gzip.compress(datos, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        variantes.append(('.br', brotli.compress(datos)))
+    for extension, comprimido in variantes:
+        # Solo si ahorra algo (las fuentes woff2 e imágenes ya vienen comprimidas)
+        if len(comprimido) < len(datos) * 0.95:
+            with open(ruta + extension, 'wb') as archivo:
+                archivo.write(comprimido)
+
+
+class EstaticosComprimidos(ManifestStaticFilesStorage):
+    """
+    ManifestStaticFilesStorage que además guarda una copia .gz (y .br) de cada archivo
+    con hash que valga la pena comprimir.
+    """
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        for nombre in set(self.hashed_files.values()):
+            if nombre.endswith(COMPRIMIBLES):
+                _comprimir(self.path(nombre))
+
+
+# ===== Servir desde STATIC_ROOT =====
+# Los nombres con hash no cambian nunca de contenido: se guardan un año en el navegador.
+
+CON_HASH = re.compile(r'\.[0-9a-f]{12}\.[^./]+$')
+CACHE_CON_HASH = 'public, max-age=31536000, immutable'
+CACHE_SIN_HASH = 'public, max-age=60'
+CODIFICACIONES = (('br', '.br'), ('gzip', '.gz'))
+
+
+def _aceptadas(request):
+    return {
+        parte.split(';')[0].strip().lower()
+        for parte in request.headers.get('Accept-Encoding', '').split(',')
+    }
+
+
+def servir(request):
+    """
+    Respuesta con el archivo estático pedido, o None si la URL no es de STATIC_URL.
+    El archivo se envía por partes (FileResponse), sin leerlo entero en memoria.
+    """
+    if request.method not in ('GET', 'HEAD') or not request.path.startswith(settings.STATIC_URL):
+        return None
+    nombre = request.path[len(settings.STATIC_URL):]
+    try:
+        ruta = safe_join(settings.STATIC_ROOT, nombre)
+    except SuspiciousFileOperation:
+        return HttpResponseNotFound()
+    if not nombre or not os.path.isfile(ruta):
+        return HttpResponseNotFound()
+
+    tipo, _ = mimetypes.guess_type(ruta)
+    aceptadas = _aceptadas(request)
+    codificacion = None
+    for nombre_codificacion, extension in CODIFICACIONES:
+        if nombre_codificacion in aceptadas and os.path.isfile(ruta + extension):
+            codificacion, ruta = nombre_codificacion, ruta + extension
+            break
+    # Con content_type explícito: FileResponse no lo cambia a application/gzip por la extensión
+    respuesta = FileResponse(open(ruta, 'rb'), content_type=tipo or 'application/octet-stream')
+    if codificacion:
+        respuesta['Content-Encoding'] = codificacion
+    respuesta['Vary'] = 'Accept-Encoding'
+    respuesta['Cache-Control'] = CACHE_CON_HASH if CON_HASH.search(nombre) else CACHE_SIN_HASH
+    return respuesta
@@ -0,0 +1,178 @@
+from django.db import transaction
+from django.db.models import Case, Count, Exists, Max, Min, OuterRef, Q, Subquery, Value, When, CharField, IntegerField
+from django.db.models.functions import Coalesce
+
+from . import condicional
+from .models import Estudiante, DocumentoEstudiante
+
+
+# ====================================
+# ===== COMPLETITUD DE EXPEDIENTES ===
+# ====================================
+#
+# Reglas (las mismas que usaban los reportes al recorrer estudiante por estudiante):
+#   - completo:       tiene documentos y todos están en 'Sí'.
+#   - incompleto:     tiene al menos un documento en 'No' o 'Vencida'.
+#   - pendiente:      tiene documentos, ninguno en 'No'/'Vencida', pero no todos en 'Sí'
+#                     (por ejemplo 'Copia' o 'Vacío').
+#   - sin_documentos: no tiene ningún DocumentoEstudiante.
+#
+# La clasificación se guarda en Estudiante (total_documentos, documentos_entregados,
+# documentos_faltantes y estado_expediente). Todo código que escriba documentos debe
+# llamar a recalcular_resumen() en la misma transacción, o guardar el resultado de
+# resumir_estados() si ya conoce los estados.
+
+ESTADO_ENTREGADO = "Sí"
+ESTADOS_FALTANTES = ["No", "Vencida"]
+
+COMPLETO = "completo"
+INCOMPLETO = "incompleto"
+PENDIENTE = "pendiente"
+SIN_DOCUMENTOS = "sin_documentos"
+
+EXPEDIENTES = Estudiante.EXPEDIENTES
+
+
+def clasificar(total, entregados, faltantes):
+    if faltantes > 0:
+        return INCOMPLETO
+    if total == 0:
+        return SIN_DOCUMENTOS
+    if entregados == total:
+        return COMPLETO
+    return PENDIENTE
+
+
+def resumir_estados(estados):
+    """
+    Calcula el resumen de un estudiante a partir de los estados de sus documentos.
+    """
+    estados = list(estados)
+    total = len(estados)
+    entregados = sum(1 for e in estados if e == ESTADO_ENTREGADO)
+    faltantes = sum(1 for e in estados if e in ESTADOS_FALTANTES)
+    return {
+        'total_documentos': total,
+        'documentos_entregados': entregados,
+        'documentos_faltantes': faltantes,
+        'estado_expediente': clasificar(total, entregados, faltantes),
+    }
+
+
+# ===== Cálculo en la base de datos =====
+
+def _documentos(**filtros):
+    return DocumentoEstudiante.objects.filter(estudiante=OuterRef('pk'), **filtros)
+
+
+def _contar(documentos):
+    conteo = documentos.order_by().values('estudiante').annotate(n=Count('pk')).values('n')
+    return Coalesce(Subquery(conteo, output_field=IntegerField()), 0)
+
+
+def _condiciones():
+    """
+    Condiciones EXISTS que clasifican a cada estudiante sin traer sus documentos.
+    """
+    con_documentos = Exists(_documentos())
+    con_no_entregados = Exists(_documentos().exclude(estado_documento=ESTADO_ENTREGADO))
+    con_faltantes = Exists(_documentos(estado_documento__in=ESTADOS_FALTANTES))
+    return {
+        INCOMPLETO: Q(con_faltantes),
+        SIN_DOCUMENTOS: ~Q(con_documentos),
+        COMPLETO: ~Q(con_no_entregados),
+    }
+
+
+def _expresion_expediente():
+    return Case(
+        *[When(condicion, then=Value(clave)) for clave, condicion in _condiciones().items()],
+        default=Value(PENDIENTE),
+        output_field=CharField(),
+    )
+
+
+def anotar_expediente(queryset=None):
+    """
+    Agrega a cada estudiante el campo 'expediente' calculado desde sus documentos,
+    sin usar el resumen guardado. Sirve para verificar el resumen.
+    """
+    if queryset is None:
+        queryset = Estudiante.objects.all()
+    return queryset.annotate(expediente=_expresion_expediente())
+
+
+def recalcular_resumen(estudiantes=None):
+    """
+    Recalcula el resumen guardado con un solo UPDATE. Recibe un queryset de
+    estudiantes, una lista de ids o None para todos. Devuelve las filas afectadas.
+    """
+    if estudiantes is None:
+        queryset = Estudiante.objects.all()
+    elif hasattr(estudiantes, 'values'):
+        queryset = estudiantes
+    else:
+        queryset = Estudiante.objects.filter(pk__in=list(estudiantes))
+    filas = queryset.update(
+        total_documentos=_contar(_documentos()),
+        documentos_entregados=_contar(_documentos(estado_documento=ESTADO_ENTREGADO)),
+        documentos_faltantes=_contar(_documentos(estado_documento__in=ESTADOS_FALTANTES)),
+        estado_expediente=_expresion_expediente(),
+    )
+    # update() no envía señales
+    condicional.cambiaron('estudiantes')
+    return filas
+
+
+def recalcular_por_lotes(lote=1000, avance=None):
+    """
+    Recalcula el resumen de todos los estudiantes por rangos de 'lote' ids, cada rango
+    en su propia transacción. Llama a avance(ids recorridos, ids en total) después de
+    cada rango. Devuelve los estudiantes actualizados.
+    """
+    rango = Estudiante.objects.aggregate(desde=Min('pk'), hasta=Max('pk'))
+    if rango['desde'] is None:
+        return 0
+    # Por rangos de id para que cada transacción sea corta y no bloquee la base de
+    # datos mientras se reconstruye todo
+    total = rango['hasta'] - rango['desde'] + 1
+    actualizados = 0
+    inicio = rango['desde']
+    while inicio <= rango['hasta']:
+        with transaction.atomic():
+            actualizados += recalcular_resumen(Estudiante.objects.filter(pk__gte=inicio, pk__lt=inicio + lote))
+        inicio += lote
+        if avance:
+            avance(min(inicio - rango['desde'], total), total)
+    return actualizados
+
+
+# ===== Consultas sobre el resumen guardado =====
+
+def estudiantes_con_expediente(expediente, queryset=None):
+    """
+    Estudiantes cuyo expediente está en el estado indicado (usa el índice de estado_expediente).
+    """
+    if queryset is None:
+        queryset = Estudiante.objects.all()
+    return queryset.filter(estado_expediente=expediente)
+
+
+def resumen_expedientes(queryset=None):
+    """
+    Cuenta en una sola consulta el total de estudiantes y cuántos hay en cada estado.
+    Devuelve un diccionario con las claves 'total', 'completo', 'incompleto',
+    'pendiente' y 'sin_documentos'.
+    """
+    if queryset is None:
+        queryset = Estudiante.objects.all()
+    conteos = {clave: 0 for clave, _ in EXPEDIENTES}
+    filas = queryset.order_by().values_list('estado_expediente').annotate(n=Count('pk'))
+    for estado, n in filas:
+        conteos[estado] = n
+    conteos['total'] = sum(conteos.values())
+    return conteos
+
+
+def porcentaje(parte, total):
+    return round(parte / total * 100, 2) if total > 0 else 0
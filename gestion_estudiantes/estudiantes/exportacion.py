@@ -0,0 +1,195 @@
+import csv
+import io
+import re
+import zipfile
+from datetime import date
+from xml.sax.saxutils import escape
+
+from django.http import StreamingHttpResponse
+
+
+# ====================================
+# ===== EXPORTACIÓN EN STREAMING =====
+# ====================================
+#
+# Las filas se escriben a medida que se leen de la base de datos, así la memoria del
+# servidor no depende del tamaño del reporte y el navegador recibe bytes enseguida.
+# Las fuentes de filas deben ser iteradores, por ejemplo
+# queryset.values_list(...).iterator(chunk_size=TAMANO_BLOQUE).
+
+TAMANO_BLOQUE = 2000
+FILAS_POR_ENVIO = 500
+
+FORMATOS = {
+    'csv': 'text/csv; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+
+def en_bloques(filas, tamano=FILAS_POR_ENVIO):
+    """
+    Agrupa las filas en listas de 'tamano' a medida que llegan (también streaming.py).
+    """
+    bloque = []
+    for fila in filas:
+        bloque.append(fila)
+        if len(bloque) >= tamano:
+            yield bloque
+            bloque = []
+    if bloque:
+        yield bloque
+
+
+# ===== CSV =====
+
+class _Eco:
+    """
+    Objeto tipo archivo que devuelve lo que se le escribe (para usar csv.writer sin buffer).
+    """
+    def write(self, valor):
+        return valor
+
+
+def generar_csv(encabezado, filas):
+    escritor = csv.writer(_Eco())
+    # BOM para que Excel reconozca UTF-8 (acentos y ñ)
+    yield '\ufeff' + escritor.writerow(encabezado)
+    for bloque in en_bloques(filas):
+        yield ''.join(escritor.writerow(fila) for fila in bloque)
+
+
+# ===== XLSX =====
+# Libro mínimo de una hoja escrito como zip en streaming: la hoja se comprime a
+# medida que llegan las filas y cada parte comprimida se envía de inmediato.
+
+_CARACTERES_INVALIDOS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+_ARCHIVOS_XLSX = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '<Override PartName="/xl/styles.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/>'
+        '<Relationship Id="rId2" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" '
+        'Target="styles.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/styles.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+        '<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font>'
+        '<font><b/><sz val="11"/><name val="Calibri"/></font></fonts>'
+        '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+        '<fill><patternFill patternType="gray125"/></fill></fills>'
+        '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+        '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+        '<cellXfs count="2"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+        '<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/></cellXfs>'
+        '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+        '</styleSheet>'
+    ),
+}
+
+
+def _libro_xml(hoja):
+    return (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        f'<sheets><sheet name="{escape(hoja[:31])}" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    )
+
+
+def _celda(valor, estilo=''):
+    if isinstance(valor, bool) or valor is None:
+        valor = '' if valor is None else ('Sí' if valor else 'No')
+    if isinstance(valor, (int, float)):
+        return f'<c{estilo}><v>{valor}</v></c>'
+    texto = escape(_CARACTERES_INVALIDOS.sub('', str(valor)))
+    return f'<c t="inlineStr"{estilo}><is><t xml:space="preserve">{texto}</t></is></c>'
+
+
+def _fila_xml(fila, estilo=''):
+    return '<row>' + ''.join(_celda(valor, estilo) for valor in fila) + '</row>'
+
+
+class _Tubo(io.RawIOBase):
+    """
+    Destino del zip que guarda lo escrito hasta que se envía (no permite seek).
+    """
+    def __init__(self):
+        self.partes = []
+
+    def writable(self):
+        return True
+
+    def write(self, datos):
+        self.partes.append(bytes(datos))
+        return len(datos)
+
+    def vaciar(self):
+        datos = b''.join(self.partes)
+        self.partes = []
+        return datos
+
+
+def generar_xlsx(encabezado, filas, hoja='Datos'):
+    tubo = _Tubo()
+    with zipfile.ZipFile(tubo, 'w', zipfile.ZIP_DEFLATED) as libro:
+        for nombre, contenido in _ARCHIVOS_XLSX.items():
+            libro.writestr(nombre, contenido)
+        libro.writestr('xl/workbook.xml', _libro_xml(hoja))
+        yield tubo.vaciar()
+
+        with libro.open('xl/worksheets/sheet1.xml', 'w') as xml:
+            xml.write((
+                '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+                + _fila_xml(encabezado, ' s="1"')
+            ).encode())
+            for bloque in en_bloques(filas):
+                xml.write(''.join(_fila_xml(fila) for fila in bloque).encode())
+                datos = tubo.vaciar()
+                if datos:
+                    yield datos
+            xml.write(b'</sheetData></worksheet>')
+    yield tubo.vaciar()
+
+
+# ===== Respuesta =====
+
+def respuesta_exportacion(nombre, formato, encabezado, filas, hoja='Datos'):
+    """
+    StreamingHttpResponse con el archivo 'nombre-AAAA-MM-DD.formato'.
+    """
+    if formato == 'xlsx':
+        contenido = generar_xlsx(encabezado, filas, hoja)
+    else:
+        contenido = generar_csv(encabezado, filas)
+    respuesta = StreamingHttpResponse(contenido, content_type=FORMATOS[formato])
+    respuesta['Content-Disposition'] = f'attachment; filename="{nombre}-{date.today().isoformat()}.{formato}"'
+    return respuesta
@@ -1,9 +1,86 @@
 from django import forms
-from .models import Estudiante, Extension, Usuario, Especialidad, Cohorte
+from django.forms.models import ModelChoiceIterator
+from .models import Estudiante, DocumentoEstudiante, Extension, Usuario, Especialidad, Cohorte
+from . import referencias
 import re
 
 
+# ===== Reglas de validación de estudiantes =====
+# Se usan en EstudianteForm y en la importación masiva (importacion.py)
+
+SOLO_LETRAS = re.compile(r'^[A-Za-zÁÉÍÓÚáéíóúÑñ\s]+$')
+
+
+def validar_cedula(cedula):
+    if not cedula.isdigit():
+        raise forms.ValidationError("La cédula solo puede contener números.")
+    return cedula
+
+
+def validar_nombres(nombres):
+    if not SOLO_LETRAS.match(nombres):
+        raise forms.ValidationError("El nombre solo puede contener letras y espacios.")
+    return nombres
+
+
+def validar_apellidos(apellidos):
+    if not SOLO_LETRAS.match(apellidos):
+        raise forms.ValidationError("Los apellidos solo pueden contener letras y espacios.")
+    return apellidos
+
+
+# ===== Selects de especialidad, cohorte y extensión =====
+# Las opciones salen de los datos de referencia en memoria (referencias.py), así
+# mostrar o validar el formulario no consulta esas tablas.
+
+class ReferenciaChoiceIterator(ModelChoiceIterator):
+    def _objetos(self):
+        return referencias.obtener(self.field.tabla)
+
+    def __iter__(self):
+        if self.field.empty_label is not None:
+            yield ("", self.field.empty_label)
+        for objeto in self._objetos():
+            yield self.choice(objeto)
+
+    def __len__(self):
+        return len(self._objetos()) + (1 if self.field.empty_label is not None else 0)
+
+    def __bool__(self):
+        return self.field.empty_label is not None or bool(self._objetos())
+
+
+class ReferenciaChoiceField(forms.ModelChoiceField):
+    iterator = ReferenciaChoiceIterator
+
+    def __init__(self, tabla, **kwargs):
+        self.tabla = tabla
+        modelo, _ = referencias.TABLAS[tabla]
+        super().__init__(queryset=modelo.objects.all(), **kwargs)
+
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        try:
+            pk = int(value)
+        except (ValueError, TypeError):
+            pk = None
+        objeto = referencias.por_id(self.tabla, pk) if pk is not None else None
+        if objeto is None and pk is not None:
+            # No está en memoria (se creó después de leerlas, o ya no existe): decide
+            # la base de datos
+            objeto = self.queryset.filter(pk=pk).first()
+        if objeto is None:
+            raise forms.ValidationError(self.error_messages['invalid_choice'], code='invalid_choice',
+                                  params={'value': value})
+        return objeto
+
+
 class EstudianteForm(forms.ModelForm):
+    especialidad = ReferenciaChoiceField('especialidades', widget=forms.Select(attrs={'class': 'form-select'}))
+    cohorte = ReferenciaChoiceField('cohortes', widget=forms.Select(attrs={'class': 'form-select'}))
+    extension = ReferenciaChoiceField('extensiones', widget=forms.Select(attrs={'class': 'form-select'}))
+
     class Meta:
         model = Estudiante
         fields = [
@@ -14,32 +91,18 @@ class EstudianteForm(forms.ModelForm):
             'cohorte',
             'extension',
         ]
-        widgets = {
-            'especialidad': forms.Select(attrs={'class': 'form-select'}),
-            'cohorte': forms.Select(attrs={'class': 'form-select'}),
-            'extension': forms.Select(attrs={'class': 'form-select'}),
-        }
 
     # Validación cédula: solo números
     def clean_cedula(self):
-        cedula = self.cleaned_data.get('cedula')
-        if not cedula.isdigit():
-            raise forms.ValidationError("La cédula solo puede contener números.")
-        return cedula
+        return validar_cedula(self.cleaned_data.get('cedula'))
 
     # Validación nombres: solo letras y espacios
     def clean_nombres(self):
-        nombres = self.cleaned_data.get('nombres')
-        if not re.match(r'^[A-Za-zÁÉÍÓÚáéíóúÑñ\s]+$', nombres):
-            raise forms.ValidationError("El nombre solo puede contener letras y espacios.")
-        return nombres
+        return validar_nombres(self.cleaned_data.get('nombres'))
 
     # Validación apellidos: solo letras y espacios
     def clean_apellidos(self):
-        apellidos = self.cleaned_data.get('apellidos')
-        if not re.match(r'^[A-Za-zÁÉÍÓÚáéíóúÑñ\s]+$', apellidos):
-            raise forms.ValidationError("Los apellidos solo pueden contener letras y espacios.")
-        return apellidos
+        return validar_apellidos(self.cleaned_data.get('apellidos'))
 
 
 class ExtensionForm(forms.ModelForm):
@@ -85,6 +148,76 @@ class CohorteForm(forms.ModelForm):
         model = Cohorte
         fields = '__all__'
 
+class ImportarEstudiantesForm(forms.Form):
+    archivo = forms.FileField(
+        label="Archivo CSV o XLSX",
+        widget=forms.ClearableFileInput(attrs={'accept': '.csv,.xlsx'})
+    )
+    segundo_plano = forms.BooleanField(
+        label="Procesar en segundo plano (archivos grandes)",
+        required=False,
+    )
+
+    def clean_archivo(self):
+        archivo = self.cleaned_data.get('archivo')
+        if not archivo.name.lower().endswith(('.csv', '.xlsx')):
+            raise forms.ValidationError("El archivo debe ser .csv o .xlsx.")
+        return archivo
+
+
+class OperacionDocumentosForm(forms.Form):
+    """
+    Cambio en bloque del estado de un documento (ver documentos.en_bloque).
+    """
+    tipo_documento = forms.ChoiceField(
+        choices=DocumentoEstudiante.TIPOS_DOCUMENTO,
+        widget=forms.Select(attrs={'class': 'form-select'})
+    )
+    estado_documento = forms.ChoiceField(
+        choices=DocumentoEstudiante.ESTADOS_DOCUMENTO,
+        widget=forms.Select(attrs={'class': 'form-select'})
+    )
+    observacion = forms.CharField(
+        max_length=200, required=False,
+        help_text="Vacía: no se cambia la observación.",
+        widget=forms.TextInput(attrs={'class': 'form-control'})
+    )
+    cohorte = ReferenciaChoiceField('cohortes', required=False, empty_label="Todas",
+                                    widget=forms.Select(attrs={'class': 'form-select'}))
+    especialidad = ReferenciaChoiceField('especialidades', required=False, empty_label="Todas",
+                                         widget=forms.Select(attrs={'class': 'form-select'}))
+    extension = ReferenciaChoiceField('extensiones', required=False, empty_label="Todas",
+                                      widget=forms.Select(attrs={'class': 'form-select'}))
+    cedulas = forms.CharField(
+        label="Cédulas", required=False,
+        help_text="Separadas por comas, espacios o saltos de línea.",
+        widget=forms.Textarea(attrs={'class': 'form-control', 'rows': 3})
+    )
+
+    def clean_cedulas(self):
+        cedulas = [c for c in re.split(r'[\s,;]+', self.cleaned_data.get('cedulas', '')) if c]
+        for cedula in cedulas:
+            validar_cedula(cedula)
+        return list(dict.fromkeys(cedulas))
+
+    def clean(self):
+        datos = super().clean()
+        if not any(datos.get(campo) for campo in ('cohorte', 'especialidad', 'extension', 'cedulas')):
+            raise forms.ValidationError("Indica al menos una cohorte, especialidad, extensión o cédula.")
+        return datos
+
+    def filtros(self):
+        datos = self.cleaned_data
+        filtros = {campo: datos[campo].pk for campo in ('cohorte', 'especialidad', 'extension') if datos.get(campo)}
+        if datos['cedulas']:
+            filtros['cedulas'] = datos['cedulas']
+        return filtros
+
+    def nueva_observacion(self):
+        # None deja la observación de cada documento como está
+        return self.cleaned_data['observacion'] or None
+
+
 class EspecialidadForm(forms.ModelForm):
     class Meta:
         model = Especialidad
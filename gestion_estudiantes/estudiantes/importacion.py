@@ -0,0 +1,260 @@
+import codecs
+import csv
+import io
+import unicodedata
+import zipfile
+
+from django import forms
+from django.db import IntegrityError, connection, transaction
+
+from . import busqueda, condicional, expedientes, matricula, pivote, tablero
+from .forms import validar_cedula, validar_nombres, validar_apellidos
+from .models import Estudiante, DocumentoEstudiante, Especialidad, Cohorte, Extension
+
+
+# ====================================
+# ===== IMPORTACIÓN MASIVA ===========
+# ====================================
+#
+# El archivo se lee fila por fila (nunca completo en memoria). Columnas esperadas,
+# sin importar mayúsculas ni acentos:
+#   cedula, nombres, apellidos, especialidad, cohorte, extension
+# y opcionalmente una columna por tipo de documento (por ejemplo "Copia de Cédula")
+# con su estado; si falta o está vacía el documento queda en "Vacío".
+
+TIPOS_DOCUMENTO = [tipo for tipo, _ in DocumentoEstudiante.TIPOS_DOCUMENTO]
+ESTADOS_DOCUMENTO = [estado for estado, _ in DocumentoEstudiante.ESTADOS_DOCUMENTO]
+ESTADO_INICIAL = "Vacío"
+
+COLUMNAS_OBLIGATORIAS = ['cedula', 'nombres', 'apellidos', 'especialidad', 'cohorte', 'extension']
+
+TAMANO_LOTE = 500
+
+
+class ErrorImportacion(Exception):
+    """
+    Error que impide leer el archivo completo (formato, columnas, dependencias).
+    """
+
+
+class ResultadoImportacion:
+    def __init__(self):
+        self.creados = 0
+        self.errores = []  # lista de (número de fila, mensaje)
+
+    def agregar_error(self, fila, mensaje):
+        self.errores.append((fila, mensaje))
+
+
+def normalizar(texto):
+    """
+    Minúsculas, sin acentos y sin espacios repetidos: 'Copia de  Cédula' -> 'copia de cedula'.
+    """
+    texto = unicodedata.normalize('NFKD', str(texto or ''))
+    texto = ''.join(c for c in texto if not unicodedata.combining(c))
+    return ' '.join(texto.lower().split())
+
+
+# ===== Lectura del archivo =====
+
+def _codificacion(archivo):
+    """
+    'utf-8-sig' si todo el archivo es UTF-8 válido; si no, 'cp1252' (el CSV que guarda
+    Excel en Windows). Se revisa por bloques y se vuelve al inicio del archivo.
+    """
+    decodificador = codecs.getincrementaldecoder('utf-8')()
+    try:
+        for bloque in iter(lambda: archivo.read(64 * 1024), b''):
+            decodificador.decode(bloque)
+        decodificador.decode(b'', final=True)
+        codificacion = 'utf-8-sig'
+    except UnicodeDecodeError:
+        codificacion = 'cp1252'
+    archivo.seek(0)
+    return codificacion
+
+
+def _filas_csv(archivo):
+    texto = io.TextIOWrapper(archivo, encoding=_codificacion(archivo), errors='replace', newline='')
+    muestra = texto.readline()
+    if not muestra:
+        return
+    delimitador = ';' if muestra.count(';') > muestra.count(',') else ','
+    lector = csv.reader(texto, delimiter=delimitador)
+    yield next(csv.reader([muestra], delimiter=delimitador))
+    yield from lector
+
+
+def _filas_xlsx(archivo):
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ErrorImportacion("Para importar archivos .xlsx se necesita el paquete openpyxl.")
+    from openpyxl.utils.exceptions import InvalidFileException
+    try:
+        libro = load_workbook(archivo, read_only=True, data_only=True)
+    except (zipfile.BadZipFile, InvalidFileException, KeyError, OSError):
+        raise ErrorImportacion("El archivo .xlsx está dañado o no es un libro de Excel.")
+    try:
+        for fila in libro.active.iter_rows(values_only=True):
+            yield ['' if valor is None else str(valor) for valor in fila]
+    finally:
+        libro.close()
+
+
+def leer_filas(archivo, nombre):
+    """
+    Genera (número de fila, diccionario) a partir de un archivo CSV o XLSX abierto en binario.
+    Las claves del diccionario son las columnas normalizadas.
+    """
+    filas = _filas_xlsx(archivo) if nombre.lower().endswith('.xlsx') else _filas_csv(archivo)
+    try:
+        encabezado = [normalizar(columna) for columna in next(filas)]
+    except StopIteration:
+        raise ErrorImportacion("El archivo está vacío.")
+    faltantes = [c for c in COLUMNAS_OBLIGATORIAS if c not in encabezado]
+    if faltantes:
+        raise ErrorImportacion("Faltan las columnas: " + ", ".join(faltantes))
+
+    for numero, valores in enumerate(filas, start=2):
+        if not any(str(v).strip() for v in valores):
+            continue
+        yield numero, dict(zip(encabezado, (str(v).strip() for v in valores)))
+
+
+# ===== Validación e inserción =====
+
+def _catalogo(modelo, campo):
+    """
+    Nombre normalizado -> id. Los nombres repetidos quedan como None (ambiguos).
+    """
+    catalogo = {}
+    for pk, nombre in modelo.objects.values_list('pk', campo).iterator():
+        clave = normalizar(nombre)
+        catalogo[clave] = None if clave in catalogo else pk
+    return catalogo
+
+
+class Importador:
+    def __init__(self, tamano_lote=TAMANO_LOTE):
+        self.tamano_lote = tamano_lote
+        self.resultado = ResultadoImportacion()
+        self.catalogos = {
+            'especialidad': _catalogo(Especialidad, 'nombre_especialidad'),
+            'cohorte': _catalogo(Cohorte, 'nombre_cohorte'),
+            'extension': _catalogo(Extension, 'nombre_extension'),
+        }
+        self.cedulas = set(Estudiante.objects.values_list('cedula', flat=True).iterator())
+        self.tipos = {normalizar(tipo): tipo for tipo in TIPOS_DOCUMENTO}
+        self.estados = {normalizar(estado): estado for estado in ESTADOS_DOCUMENTO}
+        self.longitudes = {
+            campo: Estudiante._meta.get_field(campo).max_length
+            for campo in ('cedula', 'nombres', 'apellidos')
+        }
+        self._lote = []
+
+    def _validar(self, datos):
+        """
+        Devuelve (estudiante, estados, errores) para una fila.
+        """
+        errores = []
+        campos = {}
+        for campo, validador in (('cedula', validar_cedula),
+                                 ('nombres', validar_nombres),
+                                 ('apellidos', validar_apellidos)):
+            valor = datos.get(campo, '')
+            if not valor:
+                errores.append(f"{campo}: este campo es obligatorio.")
+                continue
+            if len(valor) > self.longitudes[campo]:
+                errores.append(f"{campo}: máximo {self.longitudes[campo]} caracteres.")
+                continue
+            try:
+                campos[campo] = validador(valor)
+            except forms.ValidationError as error:
+                errores.extend(f"{campo}: {mensaje}" for mensaje in error.messages)
+
+        cedula = campos.get('cedula')
+        if cedula in self.cedulas:
+            errores.append(f"cedula: ya existe un estudiante con la cédula {cedula}.")
+
+        for campo, catalogo in self.catalogos.items():
+            nombre = datos.get(campo, '')
+            clave = normalizar(nombre)
+            if not clave:
+                errores.append(f"{campo}: este campo es obligatorio.")
+            elif clave not in catalogo:
+                errores.append(f"{campo}: '{nombre}' no existe.")
+            elif catalogo[clave] is None:
+                errores.append(f"{campo}: '{nombre}' está repetido, no se puede identificar.")
+            else:
+                campos[f'{campo}_id'] = catalogo[clave]
+
+        estados = {}
+        for columna, tipo in self.tipos.items():
+            valor = datos.get(columna, '')
+            if not valor:
+                estados[tipo] = ESTADO_INICIAL
+            elif normalizar(valor) in self.estados:
+                estados[tipo] = self.estados[normalizar(valor)]
+            else:
+                errores.append(f"{tipo}: estado '{valor}' no válido.")
+
+        if errores:
+            return None, None, errores
+        campos.update(expedientes.resumir_estados(estados.values()))
+        return Estudiante(**campos), estados, []
+
+    def agregar(self, numero, datos):
+        estudiante, estados, errores = self._validar(datos)
+        if errores:
+            for mensaje in errores:
+                self.resultado.agregar_error(numero, mensaje)
+            return
+        self.cedulas.add(estudiante.cedula)
+        self._lote.append((numero, estudiante, estados))
+        if len(self._lote) >= self.tamano_lote:
+            self.guardar_lote()
+
+    def guardar_lote(self):
+        if not self._lote:
+            return
+        lote, self._lote = self._lote, []
+        estudiantes = [estudiante for _, estudiante, _ in lote]
+        try:
+            with transaction.atomic(), busqueda.insercion_masiva():
+                Estudiante.objects.bulk_create(estudiantes)
+                if not connection.features.can_return_rows_from_bulk_insert:
+                    ids = dict(Estudiante.objects.filter(cedula__in=[e.cedula for e in estudiantes])
+                               .values_list('cedula', 'pk'))
+                    for estudiante in estudiantes:
+                        estudiante.pk = ids[estudiante.cedula]
+                DocumentoEstudiante.objects.bulk_create([
+                    DocumentoEstudiante(estudiante_id=estudiante.pk, tipo_documento=tipo, estado_documento=estado)
+                    for _, estudiante, estados in lote
+                    for tipo, estado in estados.items()
+                ])
+                matricula.aplicar(matricula.deltas_altas(estudiantes))
+        except IntegrityError:
+            # Otra persona registró alguna de estas cédulas mientras se importaba
+            for numero, estudiante, _ in lote:
+                self.resultado.agregar_error(numero, "No se guardó: conflicto con un registro existente.")
+            return
+        self.resultado.creados += len(lote)
+        tablero.invalidar()
+        pivote.invalidar()
+        condicional.cambiaron('estudiantes', 'documentos')
+
+    def importar(self, filas):
+        for numero, datos in filas:
+            self.agregar(numero, datos)
+        self.guardar_lote()
+        return self.resultado
+
+
+def importar_archivo(archivo, nombre, tamano_lote=TAMANO_LOTE):
+    """
+    Importa estudiantes con sus documentos desde un archivo CSV o XLSX.
+    Lanza ErrorImportacion si el archivo no se puede leer.
+    """
+    return Importador(tamano_lote).importar(leer_filas(archivo, nombre))
@@ -0,0 +1,64 @@
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+
+from django.db import connection
+from django.urls import reverse
+
+
+# Funciones compartidas por los comandos benchmark_vistas y benchmark_asgi y por las
+# pruebas de presupuesto de consultas. El guion bajo evita que Django lo tome por un
+# comando.
+
+
+# ===== Base de datos para los benchmarks =====
+
+@contextmanager
+def base_de_datos_temporal(prefijo):
+    """
+    Crea una base de datos de prueba vacía (con SQLite, en un archivo temporal y no en
+    memoria, como en el servidor) y la usa mientras dure el bloque; al salir la borra.
+    """
+    carpeta = tempfile.mkdtemp(prefix=prefijo)
+    prueba = connection.settings_dict.setdefault('TEST', {})
+    nombre_prueba = prueba.get('NAME')
+    if connection.vendor == 'sqlite':
+        prueba['NAME'] = os.path.join(carpeta, 'db.sqlite3')
+    nombre_original = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(nombre_original, verbosity=0)
+        prueba['NAME'] = nombre_prueba
+        shutil.rmtree(carpeta, ignore_errors=True)
+
+
+# ===== Recorrido de las rutas =====
+
+# Argumentos de las rutas que no reciben el id de un registro
+ARGUMENTOS_RUTAS = {
+    'exportar': {'reporte': 'estudiantes', 'formato': 'csv'},
+    'descargar_perfil': {'nombre': 'no-existe.pstats'},
+    'exportar_pivote': {'formato': 'csv'},
+    'estado_trabajo': {'pk': 0},
+    'descargar_trabajo': {'pk': 0},
+}
+
+
+def rutas_estudiantes(ids):
+    """
+    Genera (nombre, url) para cada ruta de estudiantes/urls.py. 'ids' indica el
+    registro que se usa en las rutas con id, según la última palabra del nombre de
+    la ruta: {'estudiante': 1, 'usuario': 1, 'extension': 1, 'cohorte': 1, 'especialidad': 1}.
+    """
+    from estudiantes import urls
+
+    for patron in urls.urlpatterns:
+        argumentos = {}
+        if patron.name in ARGUMENTOS_RUTAS:
+            argumentos = ARGUMENTOS_RUTAS[patron.name]
+        elif patron.pattern.converters:
+            registro = ids[patron.name.rsplit('_', 1)[1]]
+            argumentos = {nombre: registro for nombre in patron.pattern.converters}
+        yield patron.name, reverse(patron.name, kwargs=argumentos)
@@ -0,0 +1,202 @@
+import asyncio
+import io
+import json
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from django.conf import settings
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+from django.test import AsyncClient, Client, override_settings
+from django.urls import reverse
+
+from estudiantes.management.commands._benchmark import base_de_datos_temporal
+from estudiantes.models import Usuario
+
+
+RUTAS = [
+    'home',
+    'reporte_matricula_cohorte',
+    'reporte_expedientes_completos',
+    'comparativa_especialidad',
+    'comparativa_extension',
+    'panel_reportes',
+    'reporte_pivote',
+]
+
+CACHES = {
+    'local': {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'benchmark_asgi',
+        }
+    },
+    # Sin caché: cada petición hace todas sus consultas
+    'sin_cache': {
+        'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}
+    },
+}
+
+# Modo -> (servidor, CONSULTAS_CONCURRENTES)
+MODOS = {
+    'wsgi': ('wsgi', False),
+    'wsgi_concurrente': ('wsgi', True),
+    'asgi': ('asgi', False),
+    'asgi_concurrente': ('asgi', True),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara la latencia y las peticiones por segundo de las vistas de reportes "
+        "servidas como WSGI (un hilo por petición en curso) y como ASGI (un bucle de "
+        "eventos), con y sin CONSULTAS_CONCURRENTES, a varios niveles de concurrencia. "
+        "Los datos se generan en una base de datos temporal y las peticiones se hacen "
+        "dentro del proceso, sin pasar por la red."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--estudiantes', type=int, default=10000,
+                            help="Estudiantes a generar (por defecto 10000).")
+        parser.add_argument('--concurrencias', type=int, nargs='+', default=[1, 4, 16],
+                            help="Peticiones en curso a la vez (por defecto 1 4 16).")
+        parser.add_argument('--peticiones', type=int, default=64,
+                            help="Peticiones por ruta, modo y concurrencia (por defecto 64).")
+        parser.add_argument('--rutas', nargs='+', default=RUTAS, choices=RUTAS)
+        parser.add_argument('--modos', nargs='+', default=list(MODOS), choices=list(MODOS))
+        parser.add_argument('--sin-cache', action='store_true',
+                            help="Usa DummyCache: cada petición recalcula gráficos y tabla dinámica.")
+        parser.add_argument('--salida', default='benchmark_asgi',
+                            help="Nombre de los archivos del informe, sin extensión.")
+        parser.add_argument('--semilla', type=int, default=1)
+
+    def handle(self, *args, **options):
+        cache_usada = 'sin_cache' if options['sin_cache'] else 'local'
+        informe = {
+            'fecha': datetime.now().isoformat(timespec='seconds'),
+            'motor': connection.vendor,
+            'estudiantes': options['estudiantes'],
+            'peticiones': options['peticiones'],
+            'cache': cache_usada,
+            'rutas': {},
+        }
+        with override_settings(CACHES=CACHES[cache_usada], METRICAS_CABECERAS=True,
+                               ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            with base_de_datos_temporal('benchmark_asgi_'):
+                call_command('generar_datos', estudiantes=options['estudiantes'],
+                             semilla=options['semilla'], stdout=io.StringIO())
+                sesion = self.crear_sesion()
+                # Las conexiones de otros hilos deben ver los datos generados
+                connections.close_all()
+                for ruta in options['rutas']:
+                    self.stdout.write(f"Midiendo {ruta}...")
+                    url = reverse(ruta)
+                    informe['rutas'][ruta] = {
+                        modo: {
+                            str(concurrencia): self.medir(modo, url, sesion, concurrencia, options['peticiones'])
+                            for concurrencia in options['concurrencias']
+                        }
+                        for modo in options['modos']
+                    }
+
+        with open(f"{options['salida']}.json", 'w', encoding='utf-8') as archivo:
+            json.dump(informe, archivo, ensure_ascii=False, indent=2)
+        with open(f"{options['salida']}.md", 'w', encoding='utf-8') as archivo:
+            archivo.write(self.markdown(informe))
+        self.stdout.write(self.style.SUCCESS(f"Informe guardado en {options['salida']}.json y .md"))
+
+    def crear_sesion(self):
+        usuario = Usuario.objects.create(nombre_usuario="benchmark", contrasena="-", rol="Administrador")
+        sesion = SessionStore()
+        sesion['usuario_id'] = usuario.pk
+        sesion['usuario_rol'] = usuario.rol
+        sesion.create()
+        return sesion.session_key
+
+    def medir(self, modo, url, sesion, concurrencia, peticiones):
+        servidor, concurrentes = MODOS[modo]
+        # Cada una de las 'concurrencia' tareas hace su parte de las peticiones, una tras otra
+        partes = [peticiones // concurrencia + (i < peticiones % concurrencia) for i in range(concurrencia)]
+        cache.clear()
+        with override_settings(CONSULTAS_CONCURRENTES=concurrentes):
+            # Una petición previa para que la medición no incluya la carga de plantillas
+            self.peticion_wsgi(self.cliente(Client, sesion), url)
+            inicio = time.perf_counter()
+            if servidor == 'wsgi':
+                latencias = self.medir_wsgi(url, sesion, partes)
+            else:
+                latencias = asyncio.run(self.medir_asgi(url, sesion, partes))
+            duracion = time.perf_counter() - inicio
+        connections.close_all()
+        latencias.sort()
+        return {
+            'p50_ms': round(statistics.median(latencias) * 1000, 2),
+            'p95_ms': round(latencias[int(len(latencias) * 0.95) - 1] * 1000, 2),
+            'peticiones_s': round(len(latencias) / duracion, 1),
+        }
+
+    def cliente(self, clase, sesion):
+        cliente = clase()
+        cliente.cookies[settings.SESSION_COOKIE_NAME] = sesion
+        return cliente
+
+    def peticion_wsgi(self, cliente, url):
+        inicio = time.perf_counter()
+        respuesta = cliente.get(url)
+        if respuesta.status_code != 200:
+            raise RuntimeError(f"{url} respondió {respuesta.status_code}")
+        return time.perf_counter() - inicio
+
+    def medir_wsgi(self, url, sesion, partes):
+        # Como un servidor WSGI con hilos: cada hilo atiende una petición a la vez
+        def trabajar(cantidad):
+            cliente = self.cliente(Client, sesion)
+            try:
+                return [self.peticion_wsgi(cliente, url) for _ in range(cantidad)]
+            finally:
+                connections.close_all()
+
+        with ThreadPoolExecutor(max_workers=len(partes)) as hilos:
+            return [latencia for lista in hilos.map(trabajar, partes) for latencia in lista]
+
+    async def medir_asgi(self, url, sesion, partes):
+        # Como un servidor ASGI: todas las peticiones en curso comparten un bucle de eventos
+        async def trabajar(cantidad):
+            cliente = self.cliente(AsyncClient, sesion)
+            latencias = []
+            for _ in range(cantidad):
+                inicio = time.perf_counter()
+                respuesta = await cliente.get(url)
+                if respuesta.status_code != 200:
+                    raise RuntimeError(f"{url} respondió {respuesta.status_code}")
+                latencias.append(time.perf_counter() - inicio)
+            return latencias
+
+        listas = await asyncio.gather(*(trabajar(cantidad) for cantidad in partes))
+        return [latencia for lista in listas for latencia in lista]
+
+    def markdown(self, informe):
+        modos = list(next(iter(informe['rutas'].values())))
+        concurrencias = list(next(iter(informe['rutas'].values()))[modos[0]])
+        lineas = [
+            f"# Benchmark WSGI / ASGI ({informe['fecha']}, {informe['motor']})",
+            "",
+            f"{informe['estudiantes']} estudiantes, {informe['peticiones']} peticiones por celda, "
+            f"caché: {informe['cache']}. Cada celda: p50 / p95 en milisegundos y peticiones por segundo.",
+            "",
+            "| Ruta | Modo | " + " | ".join(f"concurrencia {c}" for c in concurrencias) + " |",
+            "|------|------|" + "|".join("---:" for _ in concurrencias) + "|",
+        ]
+        for ruta, resultados in informe['rutas'].items():
+            for modo in modos:
+                celdas = [
+                    f"{d['p50_ms']} / {d['p95_ms']} ({d['peticiones_s']}/s)"
+                    for d in (resultados[modo][c] for c in concurrencias)
+                ]
+                lineas.append(f"| {ruta} | {modo} | " + " | ".join(celdas) + " |")
+        return "\n".join(lineas) + "\n"
@@ -0,0 +1,159 @@
+import os
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connections, transaction
+
+from estudiantes import expedientes
+from estudiantes.models import Estudiante, DocumentoEstudiante, Especialidad, Cohorte, Extension
+
+
+# Perfiles de SQLite que se comparan en una base de datos temporal
+PERFILES_SQLITE = {
+    # La migración 0013 deja la base temporal en WAL: el básico vuelve al modo por defecto
+    'basico': {'OPTIONS': {'init_command': "PRAGMA journal_mode = DELETE"}},
+    'ajustado': {
+        'OPTIONS': {
+            'transaction_mode': 'IMMEDIATE',
+            'init_command': "PRAGMA journal_mode = WAL; " + (
+                settings.SQLITE_INICIO or "PRAGMA synchronous = NORMAL; PRAGMA busy_timeout = 5000"
+            ),
+        },
+    },
+}
+
+ESTADO_INICIAL = "Vacío"
+TIPOS_DOCUMENTO = [tipo for tipo, _ in DocumentoEstudiante.TIPOS_DOCUMENTO]
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide cuántos registros de estudiantes por segundo admite la base de datos con "
+        "varias secretarias registrando a la vez (cada hilo simula una)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hilos', type=int, default=8, help="Registros simultáneos (por defecto 8).")
+        parser.add_argument('--registros', type=int, default=100,
+                            help="Registros por hilo (por defecto 100).")
+        parser.add_argument('--perfiles', nargs='+', default=['basico', 'ajustado'],
+                            help="basico y/o ajustado (SQLite temporal) o actual (la base configurada; "
+                                 "los registros de prueba se eliminan al terminar).")
+
+    def handle(self, *args, **options):
+        for perfil in options['perfiles']:
+            if perfil != 'actual' and perfil not in PERFILES_SQLITE:
+                raise CommandError(f"Perfil desconocido: {perfil}")
+
+        self.stdout.write(f"{options['hilos']} hilos x {options['registros']} registros\n")
+        self.stdout.write("| Perfil | Registros/s | Errores | p50 (ms) | p95 (ms) |")
+        self.stdout.write("|--------|-------------|---------|----------|----------|")
+        for perfil in options['perfiles']:
+            if perfil == 'actual':
+                resultado = self.medir('default', options['hilos'], options['registros'])
+            else:
+                resultado = self.medir_sqlite_temporal(perfil, options['hilos'], options['registros'])
+            self.stdout.write(
+                f"| {perfil} | {resultado['por_segundo']:.0f} | {resultado['errores']} "
+                f"| {resultado['p50']:.1f} | {resultado['p95']:.1f} |"
+            )
+
+    def medir_sqlite_temporal(self, perfil, hilos, registros):
+        carpeta = tempfile.mkdtemp(prefix='benchmark_escritura_')
+        alias = f'benchmark_{perfil}'
+        configuracion = dict(connections.settings['default'])
+        configuracion.update({
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.path.join(carpeta, 'db.sqlite3'),
+            'CONN_MAX_AGE': 0,
+            'TEST': {},
+            **PERFILES_SQLITE[perfil],
+        })
+        connections.settings[alias] = configuracion
+        try:
+            call_command('migrate', database=alias, verbosity=0)
+            return self.medir(alias, hilos, registros)
+        finally:
+            connections[alias].close()
+            del connections[alias]
+            del connections.settings[alias]
+            shutil.rmtree(carpeta, ignore_errors=True)
+
+    def medir(self, alias, hilos, registros):
+        referencias = self.preparar_referencias(alias)
+        prefijo = str(time.time_ns())[-8:]
+        tiempos = []
+        errores = []
+        bloqueo = threading.Lock()
+
+        def secretaria(numero):
+            propios = []
+            for i in range(registros):
+                cedula = f"9{prefijo}{numero:03d}{i:05d}"
+                inicio = time.perf_counter()
+                try:
+                    self.registrar(alias, cedula, referencias)
+                    propios.append(time.perf_counter() - inicio)
+                except OperationalError as error:
+                    with bloqueo:
+                        errores.append(str(error))
+            with bloqueo:
+                tiempos.extend(propios)
+            connections[alias].close()
+
+        inicio = time.perf_counter()
+        trabajadores = [threading.Thread(target=secretaria, args=(n,)) for n in range(hilos)]
+        for trabajador in trabajadores:
+            trabajador.start()
+        for trabajador in trabajadores:
+            trabajador.join()
+        duracion = time.perf_counter() - inicio
+
+        if alias == 'default':
+            Estudiante.objects.using(alias).filter(cedula__startswith=f"9{prefijo}").delete()
+
+        tiempos.sort()
+        return {
+            'por_segundo': len(tiempos) / duracion if duracion else 0,
+            'errores': len(errores),
+            'p50': statistics.median(tiempos) * 1000 if tiempos else 0,
+            'p95': tiempos[int(len(tiempos) * 0.95) - 1] * 1000 if tiempos else 0,
+        }
+
+    def preparar_referencias(self, alias):
+        especialidad = Especialidad.objects.using(alias).first()
+        cohorte = Cohorte.objects.using(alias).first()
+        extension = Extension.objects.using(alias).first()
+        if alias == 'default' and not (especialidad and cohorte and extension):
+            raise CommandError("La base de datos necesita al menos una especialidad, cohorte y extensión.")
+        if especialidad is None:
+            especialidad = Especialidad.objects.using(alias).create(nombre_especialidad="Prueba")
+        if cohorte is None:
+            cohorte = Cohorte.objects.using(alias).create(
+                nombre_cohorte="Prueba",
+                mes=Cohorte._meta.get_field('mes').choices[0][0],
+                anio=Cohorte.AÑOS[0][0],
+            )
+        if extension is None:
+            extension = Extension.objects.using(alias).create(nombre_extension="Prueba", direccion_extension="-")
+        return {'especialidad_id': especialidad.pk, 'cohorte_id': cohorte.pk, 'extension_id': extension.pk}
+
+    def registrar(self, alias, cedula, referencias):
+        # Igual que registrar_estudiante: valida la cédula y guarda el estudiante con sus documentos
+        with transaction.atomic(using=alias):
+            if Estudiante.objects.using(alias).filter(cedula=cedula).exists():
+                return
+            estudiante = Estudiante.objects.using(alias).create(
+                cedula=cedula, nombres="Prueba", apellidos="Rendimiento", **referencias,
+                **expedientes.resumir_estados([ESTADO_INICIAL] * len(TIPOS_DOCUMENTO)),
+            )
+            DocumentoEstudiante.objects.using(alias).bulk_create([
+                DocumentoEstudiante(estudiante=estudiante, tipo_documento=tipo, estado_documento=ESTADO_INICIAL)
+                for tipo in TIPOS_DOCUMENTO
+            ])
@@ -0,0 +1,121 @@
+import io
+import json
+import statistics
+from datetime import datetime
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client, override_settings
+
+from estudiantes import metricas
+from estudiantes.management.commands._benchmark import base_de_datos_temporal, rutas_estudiantes
+from estudiantes.models import Estudiante, Especialidad, Cohorte, Extension, Usuario
+
+
+# La caché de cada medición es propia y se vacía antes de cada petición, para medir
+# el peor caso (sin datos ya calculados) y no tocar la caché del servidor.
+CACHE_BENCHMARK = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'benchmark_vistas',
+    }
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide el tiempo y las consultas de cada ruta de estudiantes/urls.py con varios "
+        "tamaños de datos. Cada tamaño se genera en una base de datos temporal "
+        "(como las de las pruebas) y el informe se guarda en JSON y Markdown."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tamanos', type=int, nargs='+', default=[1000, 10000, 100000],
+                            help="Cantidades de estudiantes a medir (por defecto 1000 10000 100000).")
+        parser.add_argument('--repeticiones', type=int, default=5, help="Peticiones por ruta (por defecto 5).")
+        parser.add_argument('--salida', default='benchmark_vistas',
+                            help="Nombre de los archivos del informe, sin extensión.")
+        parser.add_argument('--semilla', type=int, default=1)
+
+    def handle(self, *args, **options):
+        informe = {
+            'fecha': datetime.now().isoformat(timespec='seconds'),
+            'motor': connection.vendor,
+            'repeticiones': options['repeticiones'],
+            'tamanos': {},
+        }
+        with override_settings(CACHES=CACHE_BENCHMARK, METRICAS_CABECERAS=True,
+                               ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            for tamano in options['tamanos']:
+                self.stdout.write(f"Midiendo con {tamano} estudiantes...")
+                informe['tamanos'][str(tamano)] = self.medir_tamano(tamano, options)
+
+        with open(f"{options['salida']}.json", 'w', encoding='utf-8') as archivo:
+            json.dump(informe, archivo, ensure_ascii=False, indent=2)
+        with open(f"{options['salida']}.md", 'w', encoding='utf-8') as archivo:
+            archivo.write(self.markdown(informe))
+        self.stdout.write(self.style.SUCCESS(f"Informe guardado en {options['salida']}.json y .md"))
+
+    def medir_tamano(self, tamano, options):
+        with base_de_datos_temporal('benchmark_vistas_'):
+            call_command('generar_datos', estudiantes=tamano, semilla=options['semilla'], stdout=io.StringIO())
+            return self.medir_rutas(options['repeticiones'])
+
+    def medir_rutas(self, repeticiones):
+        usuario = Usuario.objects.create(nombre_usuario="benchmark", contrasena="-", rol="Administrador")
+        ids = {
+            'estudiante': Estudiante.objects.order_by('pk').values_list('pk', flat=True).first(),
+            'usuario': usuario.pk,
+            'extension': Extension.objects.order_by('pk').values_list('pk', flat=True).first(),
+            'especialidad': Especialidad.objects.order_by('pk').values_list('pk', flat=True).first(),
+            'cohorte': Cohorte.objects.order_by('pk').values_list('pk', flat=True).first(),
+        }
+        resultados = {}
+        for nombre, url in rutas_estudiantes(ids):
+            mediciones = [self.medir_peticion(url, usuario) for _ in range(repeticiones)]
+            totales = sorted(m['total_ms'] for m in mediciones)
+            resultados[nombre] = {
+                'url': url,
+                'estado': mediciones[-1]['estado'],
+                'consultas': max(m['consultas'] for m in mediciones),
+                'mediana_ms': round(statistics.median(totales), 2),
+                'maximo_ms': totales[-1],
+                'sql_ms': round(statistics.median(m['sql_ms'] for m in mediciones), 2),
+                'plantillas_ms': round(statistics.median(m['plantillas_ms'] for m in mediciones), 2),
+            }
+        return resultados
+
+    def medir_peticion(self, url, usuario):
+        cliente = Client()
+        sesion = cliente.session
+        sesion['usuario_id'] = usuario.pk
+        sesion['usuario_rol'] = usuario.rol
+        sesion.save()
+        cache.clear()
+        with metricas.medir() as medidas:
+            respuesta = cliente.get(url)
+            if respuesta.streaming:
+                b''.join(respuesta.streaming_content)
+        return {**medidas.como_dict(), 'estado': respuesta.status_code}
+
+    def markdown(self, informe):
+        tamanos = list(informe['tamanos'])
+        lineas = [
+            f"# Benchmark de vistas ({informe['fecha']}, {informe['motor']})",
+            "",
+            f"Mediana de {informe['repeticiones']} peticiones por ruta, en milisegundos, "
+            "con la caché vacía; entre paréntesis, las consultas SQL.",
+            "",
+            "| Ruta | " + " | ".join(f"{t} estudiantes" for t in tamanos) + " |",
+            "|------|" + "|".join("---:" for _ in tamanos) + "|",
+        ]
+        for ruta in informe['tamanos'][tamanos[0]]:
+            celdas = []
+            for tamano in tamanos:
+                datos = informe['tamanos'][tamano][ruta]
+                celdas.append(f"{datos['mediana_ms']} ({datos['consultas']})")
+            lineas.append(f"| {ruta} | " + " | ".join(celdas) + " |")
+        return "\n".join(lineas) + "\n"
@@ -0,0 +1,98 @@
+import hashlib
+import json
+import posixpath
+import re
+import urllib.request
+from pathlib import Path
+from urllib.parse import urljoin, urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+from estudiantes import estaticos
+
+
+VENDOR = Path(estaticos.__file__).resolve().parent / 'static' / 'vendor'
+VERSIONES = VENDOR / 'versiones.json'
+
+# Referencias de un CSS a otros archivos (fuentes, imágenes)
+URL_CSS = re.compile(r'url\(\s*[\'"]?([^\'")]+)[\'"]?\s*\)')
+# No se copian los .map: collectstatic fallaría al no encontrarlos
+SOURCE_MAP = re.compile(rb'\n?[ \t]*(//|/\*)# sourceMappingURL=[^\n]*')
+
+
+class Command(BaseCommand):
+    help = (
+        "Descarga las librerías de JavaScript y CSS de estaticos.LIBRERIAS (y las fuentes "
+        "e imágenes que usan sus CSS) a estudiantes/static/vendor/, para no depender de "
+        "los CDN. Guarda el origen y el SHA-256 de cada archivo en vendor/versiones.json; "
+        "los archivos descargados se agregan al repositorio."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--forzar', action='store_true',
+                            help="Vuelve a descargar los archivos que ya existen.")
+        parser.add_argument('--verificar', action='store_true',
+                            help="No descarga: compara los archivos con versiones.json.")
+
+    def handle(self, *args, **options):
+        versiones = json.loads(VERSIONES.read_text(encoding='utf-8')) if VERSIONES.exists() else {}
+        if options['verificar']:
+            return self.verificar(versiones)
+
+        pendientes = list(estaticos.LIBRERIAS.items())
+        while pendientes:
+            ruta, url = pendientes.pop(0)
+            destino = VENDOR / ruta
+            if destino.exists() and ruta in versiones and not options['forzar']:
+                continue
+            datos = self.descargar(url)
+            if ruta.endswith(('.js', '.css')):
+                datos = SOURCE_MAP.sub(b'', datos)
+            if ruta.endswith('.css'):
+                pendientes.extend(self.referencias(ruta, url, datos))
+            destino.parent.mkdir(parents=True, exist_ok=True)
+            destino.write_bytes(datos)
+            versiones[ruta] = {'url': url, 'sha256': hashlib.sha256(datos).hexdigest(), 'bytes': len(datos)}
+            self.stdout.write(f"  {ruta} ({len(datos) // 1024} KB)")
+
+        VERSIONES.write_text(json.dumps(versiones, indent=2, sort_keys=True) + "\n", encoding='utf-8')
+        total = sum(version['bytes'] for version in versiones.values())
+        self.stdout.write(self.style.SUCCESS(f"{len(versiones)} archivos en {VENDOR} ({total // 1024} KB)."))
+
+    def descargar(self, url):
+        try:
+            with urllib.request.urlopen(url, timeout=60) as respuesta:
+                return respuesta.read()
+        except OSError as error:
+            raise CommandError(f"No se pudo descargar {url}: {error}")
+
+    def referencias(self, ruta, url, css):
+        """
+        (ruta, url) de los archivos relativos que usa un CSS, para descargarlos al lado.
+        """
+        encontradas = []
+        for referencia in URL_CSS.findall(css.decode('utf-8')):
+            if referencia.startswith(('data:', 'http:', 'https:', '//', '#')):
+                continue
+            relativa = urlsplit(referencia).path
+            destino = posixpath.normpath(posixpath.join(posixpath.dirname(ruta), relativa))
+            if destino.startswith('..'):
+                raise CommandError(f"{ruta} usa un archivo fuera de su carpeta: {referencia}")
+            encontradas.append((destino, urljoin(url, relativa)))
+        return list(dict.fromkeys(encontradas))
+
+    def verificar(self, versiones):
+        if not versiones:
+            raise CommandError("No hay archivos descargados: ejecute descargar_estaticos.")
+        errores = []
+        for ruta, version in sorted(versiones.items()):
+            archivo = VENDOR / ruta
+            if not archivo.exists():
+                errores.append(f"falta {ruta}")
+            elif hashlib.sha256(archivo.read_bytes()).hexdigest() != version['sha256']:
+                errores.append(f"{ruta} cambió")
+        faltantes = set(estaticos.LIBRERIAS) - set(versiones)
+        errores.extend(f"{ruta} no se ha descargado" for ruta in sorted(faltantes))
+        if errores:
+            raise CommandError("; ".join(errores))
+        self.stdout.write(self.style.SUCCESS(f"{len(versiones)} archivos coinciden con versiones.json."))
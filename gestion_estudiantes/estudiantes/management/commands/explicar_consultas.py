@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+from django.http import QueryDict
+
+from estudiantes import expedientes
+from estudiantes.models import Estudiante, DocumentoEstudiante
+from estudiantes.paginacion import codificar_cursor, filtro_despues_de
+from estudiantes.views import ORDENES_ESTUDIANTES, TIPOS_DOCUMENTO, filtrar_estudiantes
+
+
+def consultas_principales():
+    """
+    Consulta principal de cada vista, tal como la arma la vista.
+    """
+    estudiante_id = Estudiante.objects.values_list('pk', flat=True).first() or 1
+    claves = ORDENES_ESTUDIANTES['apellidos']
+    cursor = ['Pérez', 'Ana', estudiante_id]
+    pagina = filtrar_estudiantes(QueryDict()).values('id', 'cedula', 'nombres', 'apellidos').order_by(*claves)
+
+    return [
+        ("listar_estudiantes_datos (primera página)", pagina[:26]),
+        ("listar_estudiantes_datos (página con cursor)",
+         pagina.filter(filtro_despues_de(claves, cursor))[:26]),
+        ("listar_estudiantes_datos (filtro por cohorte)",
+         filtrar_estudiantes(QueryDict('cohorte=1')).values('id').order_by(*claves)[:26]),
+        ("editar_estudiante (get_or_create de un documento)",
+         DocumentoEstudiante.objects.filter(estudiante_id=estudiante_id, tipo_documento=TIPOS_DOCUMENTO[0])),
+        ("detalle_estudiante (documentos del estudiante)",
+         DocumentoEstudiante.objects.filter(estudiante_id=estudiante_id)),
+        ("home (estudiantes por cohorte)",
+         Estudiante.objects.values('cohorte__nombre_cohorte').annotate(count=Count('id')).order_by('cohorte__nombre_cohorte')),
+        ("reporte_matricula_cohorte",
+         Estudiante.objects.values('cohorte__nombre_cohorte', 'cohorte__mes', 'cohorte__anio')
+         .annotate(total=Count('id')).order_by('cohorte__anio', 'cohorte__mes')),
+        ("reporte_expedientes_completos / incompletos (resumen)",
+         Estudiante.objects.order_by().values_list('estado_expediente').annotate(n=Count('pk'))),
+        ("reporte_expedientes_incompletos (detalle)",
+         expedientes.estudiantes_con_expediente(expedientes.INCOMPLETO).order_by('apellidos', 'nombres')),
+        ("recalcular_resumen (clasificación de un estudiante)",
+         expedientes.anotar_expediente(Estudiante.objects.filter(pk=estudiante_id))),
+        ("documentos en 'No' o 'Vencida'",
+         DocumentoEstudiante.objects.filter(estado_documento__in=expedientes.ESTADOS_FALTANTES)
+         .values('estudiante').distinct()),
+    ]
+
+
+class Command(BaseCommand):
+    help = "Muestra el plan de ejecución (EXPLAIN) de la consulta principal de cada vista."
+
+    def handle(self, *args, **options):
+        for nombre, queryset in consultas_principales():
+            self.stdout.write(self.style.MIGRATE_HEADING(f"== {nombre}"))
+            self.stdout.write(queryset.explain())
+            self.stdout.write("")
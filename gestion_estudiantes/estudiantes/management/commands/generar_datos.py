@@ -0,0 +1,199 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from estudiantes import busqueda, condicional, expedientes, matricula, pivote, referencias, tablero
+from estudiantes.models import Estudiante, DocumentoEstudiante, Especialidad, Cohorte, Extension
+
+
+TIPOS_DOCUMENTO = [tipo for tipo, _ in DocumentoEstudiante.TIPOS_DOCUMENTO]
+ESTADOS_DOCUMENTO = [estado for estado, _ in DocumentoEstudiante.ESTADOS_DOCUMENTO]
+
+CAMPOS_RESUMEN = ['total_documentos', 'documentos_entregados', 'documentos_faltantes', 'estado_expediente']
+CAMPOS_ESTUDIANTE = ['cedula', 'nombres', 'apellidos', 'extension', 'especialidad', 'cohorte', 'actualizado'] + CAMPOS_RESUMEN
+CAMPOS_DOCUMENTO = ['estudiante', 'tipo_documento', 'estado_documento']
+
+DISTRIBUCION = "Sí=60,No=10,Copia=10,Vencida=5,Vacío=15"
+
+NOMBRES = [
+    "José", "María", "Luis", "Ana", "Carlos", "Carmen", "Jesús", "Rosa", "Pedro", "Luisa",
+    "Miguel", "Andrea", "Ángel", "Sofía", "Rafael", "Valentina", "Andrés", "Daniela",
+    "Gabriel", "Camila", "Ramón", "Isabel", "Héctor", "Lucía", "Iván", "Mónica", "Raúl",
+    "Verónica", "Julián", "Inés", "Tomás", "Beatriz", "Óscar", "Elena", "Nicolás", "Patricia",
+]
+APELLIDOS = [
+    "González", "Rodríguez", "Pérez", "Hernández", "García", "Martínez", "López", "Díaz",
+    "Sánchez", "Ramírez", "Torres", "Flores", "Rivas", "Gómez", "Morales", "Rojas", "Núñez",
+    "Castillo", "Jiménez", "Medina", "Suárez", "Vargas", "Mendoza", "Álvarez", "Romero",
+    "Peña", "Muñoz", "Quevedo", "Blanco", "Ortiz", "Marcano", "Salazar", "Guzmán", "Briceño",
+]
+
+
+def leer_distribucion(texto):
+    """
+    'Sí=60,No=10' -> {'Sí': 60.0, 'No': 10.0}. Los estados no indicados quedan en 0.
+    """
+    pesos = {}
+    for parte in texto.split(','):
+        estado, _, peso = parte.partition('=')
+        estado = estado.strip()
+        if estado not in ESTADOS_DOCUMENTO:
+            raise CommandError(f"Estado desconocido: '{estado}'. Válidos: {', '.join(ESTADOS_DOCUMENTO)}")
+        try:
+            pesos[estado] = float(peso)
+        except ValueError:
+            raise CommandError(f"Peso no válido para '{estado}': '{peso}'")
+    if sum(pesos.values()) <= 0:
+        raise CommandError("La distribución debe tener algún peso mayor que cero.")
+    return pesos
+
+
+class Command(BaseCommand):
+    help = (
+        "Genera datos de prueba: extensiones, especialidades, cohortes y estudiantes con "
+        "sus seis documentos, insertados por lotes. Se agregan a los datos existentes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--estudiantes', type=int, default=1000)
+        parser.add_argument('--extensiones', type=int, default=5)
+        parser.add_argument('--especialidades', type=int, default=8)
+        parser.add_argument('--cohortes', type=int, default=12)
+        parser.add_argument('--distribucion', default=DISTRIBUCION,
+                            help=f"Peso de cada estado de documento (por defecto '{DISTRIBUCION}').")
+        parser.add_argument('--lote', type=int, default=5000, help="Estudiantes por transacción.")
+        parser.add_argument('--semilla', type=int, default=None, help="Semilla para repetir los mismos datos.")
+
+    def handle(self, *args, **options):
+        azar = random.Random(options['semilla'])
+        pesos = leer_distribucion(options['distribucion'])
+        self.estados = list(pesos)
+        self.pesos = list(pesos.values())
+        inicio = time.perf_counter()
+
+        with transaction.atomic():
+            extensiones = self.crear_extensiones(options['extensiones'])
+            especialidades = self.crear_especialidades(options['especialidades'])
+            cohortes = self.crear_cohortes(options['cohortes'])
+        if not (extensiones and especialidades and cohortes):
+            raise CommandError("Se necesita al menos una extensión, una especialidad y una cohorte.")
+
+        creados = 0
+        cedulas = self.cedulas_libres()
+        while creados < options['estudiantes']:
+            cantidad = min(options['lote'], options['estudiantes'] - creados)
+            with transaction.atomic(), busqueda.insercion_masiva():
+                self.crear_lote(azar, cedulas, cantidad, extensiones, especialidades, cohortes)
+            creados += cantidad
+            self.stdout.write(f"  {creados} estudiantes...", ending='\r')
+
+        referencias.invalidar()
+        tablero.invalidar()
+        pivote.invalidar()
+        condicional.cambiaron('estudiantes', 'documentos', 'cohortes', 'especialidades', 'extensiones')
+        duracion = time.perf_counter() - inicio
+        self.stdout.write(self.style.SUCCESS(
+            f"{creados} estudiantes y {creados * len(TIPOS_DOCUMENTO)} documentos en {duracion:.1f} s."
+        ))
+
+    # ===== Datos de referencia =====
+    # Se reutilizan los existentes y solo se crean los que faltan
+
+    def crear_extensiones(self, cantidad):
+        existentes = list(Extension.objects.order_by('pk')[:cantidad])
+        nuevas = [
+            Extension(nombre_extension=f"Extensión {n}", direccion_extension=f"Sede {n}")
+            for n in range(len(existentes) + 1, cantidad + 1)
+        ]
+        return existentes + Extension.objects.bulk_create(nuevas)
+
+    def crear_especialidades(self, cantidad):
+        existentes = list(Especialidad.objects.order_by('pk')[:cantidad])
+        nombres = set(Especialidad.objects.values_list('nombre_especialidad', flat=True))
+        nuevas = []
+        n = 0
+        while len(existentes) + len(nuevas) < cantidad:
+            n += 1
+            if f"Especialidad {n}" not in nombres:
+                nuevas.append(Especialidad(nombre_especialidad=f"Especialidad {n}"))
+        return existentes + Especialidad.objects.bulk_create(nuevas)
+
+    def crear_cohortes(self, cantidad):
+        existentes = list(Cohorte.objects.order_by('pk')[:cantidad])
+        ocupadas = set(Cohorte.objects.values_list('mes', 'anio'))
+        nombres = set(Cohorte.objects.values_list('nombre_cohorte', flat=True))
+        meses = [mes for mes, _ in Cohorte.MESES]
+        años = [año for año, _ in reversed(Cohorte.AÑOS)]
+        nuevas = []
+        for año in años:
+            for mes in meses:
+                if len(existentes) + len(nuevas) >= cantidad:
+                    return existentes + Cohorte.objects.bulk_create(nuevas)
+                nombre = f"Cohorte {mes} {año}"
+                if (mes, año) not in ocupadas and nombre not in nombres:
+                    nuevas.append(Cohorte(nombre_cohorte=nombre, mes=mes, anio=año))
+        return existentes + Cohorte.objects.bulk_create(nuevas)
+
+    # ===== Estudiantes =====
+
+    def cedulas_libres(self):
+        """
+        Genera cédulas de 8 dígitos que no estén registradas.
+        """
+        usadas = set(Estudiante.objects.values_list('cedula', flat=True).iterator())
+        numero = 30000000
+        while True:
+            numero += 1
+            cedula = str(numero)
+            if cedula not in usadas:
+                yield cedula
+
+    def crear_lote(self, azar, cedulas, cantidad, extensiones, especialidades, cohortes):
+        estudiantes = []
+        estados_por_cedula = {}
+        actualizado = connection.ops.adapt_datetimefield_value(timezone.now())
+        for _ in range(cantidad):
+            cedula = next(cedulas)
+            estados = azar.choices(self.estados, weights=self.pesos, k=len(TIPOS_DOCUMENTO))
+            resumen = expedientes.resumir_estados(estados)
+            estudiantes.append((
+                cedula,
+                " ".join(azar.sample(NOMBRES, 2)),
+                " ".join(azar.sample(APELLIDOS, 2)),
+                azar.choice(extensiones).pk,
+                azar.choice(especialidades).pk,
+                azar.choice(cohortes).pk,
+                actualizado,
+                *(resumen[campo] for campo in CAMPOS_RESUMEN),
+            ))
+            estados_por_cedula[cedula] = estados
+        self.insertar(Estudiante, CAMPOS_ESTUDIANTE, estudiantes)
+        matricula.aplicar(matricula.deltas_altas(
+            {'extension_id': fila[3], 'especialidad_id': fila[4], 'cohorte_id': fila[5]} for fila in estudiantes
+        ))
+
+        # Las cédulas del lote son consecutivas (con los huecos de las ya registradas)
+        ids = Estudiante.objects.filter(
+            cedula__gte=estudiantes[0][0], cedula__lte=estudiantes[-1][0]
+        ).values_list('cedula', 'pk')
+        self.insertar(DocumentoEstudiante, CAMPOS_DOCUMENTO, [
+            (pk, tipo, estado)
+            for cedula, pk in ids.iterator()
+            if cedula in estados_por_cedula
+            for tipo, estado in zip(TIPOS_DOCUMENTO, estados_por_cedula[cedula])
+        ])
+
+    def insertar(self, modelo, campos, filas):
+        """
+        INSERT con executemany, sin crear objetos del modelo (es lo que más tarda con
+        bulk_create). Los campos que no se indican quedan en NULL.
+        """
+        meta = modelo._meta
+        nombre = connection.ops.quote_name
+        columnas = ', '.join(nombre(meta.get_field(campo).column) for campo in campos)
+        marcas = ', '.join(['%s'] * len(campos))
+        with connection.cursor() as cursor:
+            cursor.executemany(f"INSERT INTO {nombre(meta.db_table)} ({columnas}) VALUES ({marcas})", filas)
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from estudiantes.importacion import ErrorImportacion, TAMANO_LOTE, importar_archivo
+
+
+class Command(BaseCommand):
+    help = "Importa estudiantes y sus documentos desde un archivo CSV o XLSX."
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo', help="Ruta del archivo .csv o .xlsx")
+        parser.add_argument('--lote', type=int, default=TAMANO_LOTE,
+                            help=f"Filas por transacción (por defecto {TAMANO_LOTE}).")
+
+    def handle(self, *args, **options):
+        ruta = options['archivo']
+        try:
+            with open(ruta, 'rb') as archivo:
+                resultado = importar_archivo(archivo, ruta, options['lote'])
+        except OSError as error:
+            raise CommandError(f"No se pudo abrir el archivo: {error}")
+        except ErrorImportacion as error:
+            raise CommandError(str(error))
+
+        for fila, mensaje in resultado.errores:
+            self.stderr.write(f"Fila {fila}: {mensaje}")
+        self.stdout.write(self.style.SUCCESS(
+            f"{resultado.creados} estudiantes importados, {len(resultado.errores)} errores."
+        ))
@@ -0,0 +1,70 @@
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from estudiantes import trabajos
+from estudiantes.models import Trabajo
+
+
+class Command(BaseCommand):
+    help = (
+        "Ejecuta los trabajos en segundo plano (exportaciones, importaciones, recálculos) "
+        "con un pool de hilos. Sin --una-vez queda esperando trabajos nuevos; se pueden "
+        "correr varios procesos a la vez."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hilos', type=int, default=settings.TRABAJOS_HILOS,
+                            help=f"Trabajos a la vez (por defecto {settings.TRABAJOS_HILOS}).")
+        parser.add_argument('--espera', type=float, default=2,
+                            help="Segundos entre consultas a la cola cuando está vacía (por defecto 2).")
+        parser.add_argument('--una-vez', action='store_true',
+                            help="Termina cuando no quedan trabajos pendientes.")
+
+    def handle(self, *args, **options):
+        hilos = max(options['hilos'], 1)
+        self.limpiar()
+        ultima_limpieza = time.monotonic()
+        en_curso = set()
+        with ThreadPoolExecutor(max_workers=hilos, thread_name_prefix='trabajo') as pool:
+            try:
+                while True:
+                    close_old_connections()
+                    while len(en_curso) < hilos:
+                        trabajo = trabajos.tomar()
+                        if trabajo is None:
+                            break
+                        self.stdout.write(f"Trabajo {trabajo.pk} ({trabajo.tipo}) iniciado.")
+                        en_curso.add(pool.submit(trabajos.ejecutar, trabajo))
+
+                    if options['una_vez'] and not en_curso:
+                        break
+                    if time.monotonic() - ultima_limpieza > 60:
+                        self.limpiar()
+                        ultima_limpieza = time.monotonic()
+
+                    if en_curso:
+                        terminados, en_curso = wait(en_curso, timeout=options['espera'],
+                                                    return_when=FIRST_COMPLETED)
+                        for futuro in terminados:
+                            self.informar(futuro.result())
+                    else:
+                        time.sleep(options['espera'])
+            except KeyboardInterrupt:
+                self.stdout.write("Deteniendo: se esperan los trabajos en curso...")
+                for futuro in wait(en_curso).done:
+                    self.informar(futuro.result())
+
+    def limpiar(self):
+        borrados, abandonados = trabajos.limpiar()
+        if borrados or abandonados:
+            self.stdout.write(f"{borrados} archivos vencidos borrados, {abandonados} trabajos abandonados.")
+
+    def informar(self, trabajo):
+        if trabajo.estado == Trabajo.TERMINADO:
+            self.stdout.write(self.style.SUCCESS(f"Trabajo {trabajo.pk} terminado."))
+        else:
+            self.stdout.write(self.style.ERROR(f"Trabajo {trabajo.pk} falló: {trabajo.mensaje}"))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from estudiantes import expedientes
+from estudiantes.models import Estudiante
+
+
+class Command(BaseCommand):
+    help = "Reconstruye el resumen de documentos de los estudiantes por lotes de ids."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=1000,
+                            help="Cantidad de ids por transacción (por defecto 1000).")
+
+    def handle(self, *args, **options):
+        if not Estudiante.objects.exists():
+            self.stdout.write("No hay estudiantes registrados.")
+            return
+        actualizados = expedientes.recalcular_por_lotes(options['lote'])
+        self.stdout.write(self.style.SUCCESS(f"Resumen recalculado para {actualizados} estudiantes."))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from estudiantes import busqueda
+
+
+class Command(BaseCommand):
+    help = "Regenera y compacta el índice de búsqueda de estudiantes (SQLite FTS5)."
+
+    def handle(self, *args, **options):
+        if busqueda.reconstruir():
+            self.stdout.write(self.style.SUCCESS("Índice de búsqueda reconstruido."))
+        else:
+            self.stdout.write("La base de datos no tiene índice FTS5; la búsqueda usa LIKE.")
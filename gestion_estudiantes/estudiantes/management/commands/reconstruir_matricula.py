@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from estudiantes import condicional, matricula, tablero
+
+
+class Command(BaseCommand):
+    help = "Vuelve a llenar las tablas de matrícula por cohorte, especialidad y extensión."
+
+    def handle(self, *args, **options):
+        conteos = matricula.reconstruir()
+        tablero.invalidar()
+        condicional.cambiaron('estudiantes')
+        total = sum(conteos['cohorte_id'].values())
+        grupos = sum(len(grupo) for grupo in conteos.values())
+        self.stdout.write(self.style.SUCCESS(f"Matrícula reconstruida: {total} estudiantes en {grupos} grupos."))
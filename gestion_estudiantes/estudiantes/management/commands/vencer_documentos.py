@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from estudiantes import documentos
+
+
+class Command(BaseCommand):
+    help = (
+        "Pasa a 'Vencida' los documentos entregados (Sí o Copia) cuya fecha de vencimiento "
+        "ya llegó, por lotes, y muestra cuántos vencieron en cada cohorte. Pensado para "
+        "ejecutarse una vez al día (cron)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fecha', help="Vence hasta ese día, AAAA-MM-DD (por defecto hoy).")
+        parser.add_argument('--lote', type=int, default=documentos.LOTE_VENCIMIENTO,
+                            help=f"Documentos por transacción (por defecto {documentos.LOTE_VENCIMIENTO}).")
+        parser.add_argument('--simular', action='store_true',
+                            help="No cambia nada: solo muestra lo que vencería.")
+
+    def handle(self, *args, **options):
+        fecha = timezone.localdate()
+        if options['fecha']:
+            try:
+                fecha = parse_date(options['fecha'])
+            except ValueError:
+                fecha = None
+            if fecha is None:
+                raise CommandError("--fecha debe tener el formato AAAA-MM-DD.")
+        if options['lote'] < 1:
+            raise CommandError("--lote debe ser mayor que cero.")
+
+        resumen = documentos.vencer(fecha, options['lote'], aplicar=not options['simular'])
+        total = sum(sum(tipos.values()) for tipos in resumen.values())
+        verbo = "vencerían" if options['simular'] else "vencieron"
+        for cohorte, tipos in sorted(resumen.items()):
+            detalle = ", ".join(f"{tipo}: {n}" for tipo, n in sorted(tipos.items()))
+            self.stdout.write(f"  {cohorte}: {sum(tipos.values())} ({detalle})")
+        self.stdout.write(self.style.SUCCESS(f"{total} documentos {verbo} hasta el {fecha:%d/%m/%Y}."))
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from estudiantes import condicional, matricula, tablero
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara las tablas de matrícula con el conteo real de estudiantes. "
+        "Termina con error si hay diferencias (útil en tareas programadas)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--corregir', action='store_true',
+                            help="Reconstruye las tablas si se encuentran diferencias.")
+
+    def handle(self, *args, **options):
+        diferencias = matricula.verificar()
+        if not diferencias:
+            self.stdout.write(self.style.SUCCESS("La matrícula coincide con los estudiantes."))
+            return
+
+        for campo, pk, guardado, real in diferencias:
+            self.stdout.write(f"  {campo}={pk}: guardado {guardado}, real {real}")
+        if options['corregir']:
+            matricula.reconstruir()
+            tablero.invalidar()
+            condicional.cambiaron('estudiantes')
+            self.stdout.write(self.style.WARNING(f"{len(diferencias)} diferencias corregidas."))
+            return
+        raise CommandError(f"{len(diferencias)} diferencias en la matrícula. Use --corregir para reconstruirla.")
@@ -0,0 +1,174 @@
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Count, F
+
+from .models import Estudiante, MatriculaCohorte, MatriculaEspecialidad, MatriculaExtension
+
+
+# ====================================
+# ===== MATRÍCULA POR GRUPO ==========
+# ====================================
+#
+# Las tablas MatriculaCohorte, MatriculaEspecialidad y MatriculaExtension guardan
+# cuántos estudiantes hay en cada grupo, para que los reportes y el inicio lean unas
+# pocas filas en lugar de contar toda la tabla de estudiantes.
+#
+# Se actualizan por diferencias (+1, -1, o -1/+1 al cambiar de grupo) en la misma
+# transacción que escribe al estudiante:
+#   - save() y delete() de un Estudiante (también las bajas en cascada): receptores
+#     en signals.py.
+#   - Inserciones masivas (importación, generar_datos): deben llamar a
+#     aplicar(deltas_altas(filas)) dentro de su transacción.
+# queryset.update() sobre cohorte, especialidad o extensión no pasa por aquí: quien lo
+# use debe llamar a reconstruir(). verificar() compara las tablas con los estudiantes.
+
+# Campo del estudiante -> (modelo de resumen, campo del grupo)
+DIMENSIONES = {
+    'cohorte_id': (MatriculaCohorte, 'cohorte_id'),
+    'especialidad_id': (MatriculaEspecialidad, 'especialidad_id'),
+    'extension_id': (MatriculaExtension, 'extension_id'),
+}
+
+
+def deltas_altas(filas, signo=1):
+    """
+    Diferencias por alta (o baja con signo=-1) de estudiantes. Cada fila es un
+    diccionario (o un Estudiante) con cohorte_id, especialidad_id y extension_id.
+    """
+    deltas = Counter()
+    for fila in filas:
+        for campo in DIMENSIONES:
+            valor = fila[campo] if isinstance(fila, dict) else getattr(fila, campo)
+            deltas[campo, valor] += signo
+    return deltas
+
+
+def deltas_cambio(anteriores, actuales):
+    """
+    Diferencias de un estudiante que pasa de los grupos 'anteriores' a los 'actuales'
+    (diccionarios campo -> id). Los campos sin valor anterior se ignoran.
+    """
+    deltas = Counter()
+    for campo in DIMENSIONES:
+        if campo in anteriores and anteriores[campo] != actuales[campo]:
+            deltas[campo, anteriores[campo]] -= 1
+            deltas[campo, actuales[campo]] += 1
+    return deltas
+
+
+def aplicar(deltas):
+    """
+    Suma las diferencias a las tablas de resumen (un UPDATE por grupo que cambia).
+    """
+    for (campo, pk), delta in deltas.items():
+        if not delta or pk is None:
+            continue
+        modelo, columna = DIMENSIONES[campo]
+        filas = modelo.objects.filter(pk=pk)
+        if filas.update(total=F('total') + delta) or delta < 0:
+            # Con delta negativo y sin fila, el grupo se está eliminando en cascada
+            continue
+        # Primer estudiante del grupo: se crea la fila (si otra transacción la creó
+        # antes, se ignora el conflicto y se suma igual)
+        modelo.objects.bulk_create([modelo(**{columna: pk})], ignore_conflicts=True)
+        filas.update(total=F('total') + delta)
+
+
+def _estado(estudiante):
+    return {campo: getattr(estudiante, campo) for campo in DIMENSIONES}
+
+
+def estudiante_guardado(estudiante, creado):
+    if creado:
+        aplicar(deltas_altas([estudiante]))
+    else:
+        anteriores = getattr(estudiante, '_matricula_original', {})
+        aplicar(deltas_cambio(anteriores, _estado(estudiante)))
+    estudiante._matricula_original = _estado(estudiante)
+
+
+def estudiante_eliminado(estudiante):
+    # Se descuenta de los grupos leídos de la base de datos, aunque se hayan cambiado en memoria
+    estado = dict(getattr(estudiante, '_matricula_original', {}))
+    for campo in DIMENSIONES:
+        if campo not in estado:
+            estado[campo] = getattr(estudiante, campo)
+    aplicar(deltas_altas([estado], signo=-1))
+
+
+# ===== Reconstrucción y verificación =====
+
+def conteos_reales():
+    """
+    Cuenta los estudiantes de cada grupo en la tabla de estudiantes: {campo: {id: total}}.
+    """
+    return {
+        campo: dict(Estudiante.objects.order_by().values_list(campo).annotate(n=Count('pk')))
+        for campo in DIMENSIONES
+    }
+
+
+def conteos_guardados():
+    return {
+        campo: dict(modelo.objects.exclude(total=0).values_list(columna, 'total'))
+        for campo, (modelo, columna) in DIMENSIONES.items()
+    }
+
+
+@transaction.atomic
+def reconstruir():
+    """
+    Vuelve a llenar las tablas de resumen desde los estudiantes. Devuelve los conteos.
+    """
+    reales = conteos_reales()
+    for campo, (modelo, columna) in DIMENSIONES.items():
+        modelo.objects.all().delete()
+        modelo.objects.bulk_create([modelo(**{columna: pk, 'total': n}) for pk, n in reales[campo].items()])
+    return reales
+
+
+def verificar():
+    """
+    Lista las diferencias entre las tablas de resumen y los estudiantes, como tuplas
+    (campo, id del grupo, total guardado, total real). Vacía si todo coincide.
+    """
+    reales = conteos_reales()
+    guardados = conteos_guardados()
+    diferencias = []
+    for campo in DIMENSIONES:
+        for pk in sorted(reales[campo].keys() | guardados[campo].keys()):
+            guardado = guardados[campo].get(pk, 0)
+            real = reales[campo].get(pk, 0)
+            if guardado != real:
+                diferencias.append((campo, pk, guardado, real))
+    return diferencias
+
+
+# ===== Consultas para los reportes =====
+
+def por_cohorte():
+    return (
+        MatriculaCohorte.objects
+        .filter(total__gt=0)
+        .values('cohorte__nombre_cohorte', 'cohorte__mes', 'cohorte__anio', 'total')
+        .order_by('cohorte__anio', 'cohorte__mes')
+    )
+
+
+def por_especialidad():
+    return (
+        MatriculaEspecialidad.objects
+        .filter(total__gt=0)
+        .values('especialidad__nombre_especialidad', 'total')
+        .order_by('especialidad__nombre_especialidad')
+    )
+
+
+def por_extension():
+    return (
+        MatriculaExtension.objects
+        .filter(total__gt=0)
+        .values('extension__nombre_extension', 'total')
+        .order_by('extension__nombre_extension')
+    )
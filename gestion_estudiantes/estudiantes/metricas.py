@@ -0,0 +1,103 @@
+import contextvars
+import time
+from contextlib import contextmanager
+
+from django.template.backends.django import DjangoTemplates
+
+
+# ====================================
+# ===== MÉTRICAS POR PETICIÓN ========
+# ====================================
+#
+# medir() cuenta las consultas SQL y su duración, el tiempo de render de plantillas y
+# el tiempo total de lo que se ejecute dentro. Lo usan MetricasMiddleware
+# (middleware.py), las pruebas de presupuesto de consultas y los benchmarks
+# (management/commands/_benchmark.py tiene lo demás que estos necesitan).
+# El tiempo de plantillas incluye las consultas que se hagan mientras se renderiza.
+#
+# Cada conexión lleva instalado _ejecutar (signals.py, al conectarse), que suma cada
+# consulta a las mediciones en curso. Como estas viajan en una ContextVar, también se
+# cuentan las consultas que una vista async hace en otros hilos (asincrono.py).
+
+# Mediciones en curso (pueden anidarse: un benchmark que envuelve al middleware)
+_actuales = contextvars.ContextVar('metricas', default=())
+
+
+class Metricas:
+    def __init__(self):
+        self.consultas = 0
+        self.sql = 0.0
+        self.plantillas = 0.0
+        self.total = 0.0
+
+    def como_dict(self):
+        return {
+            'consultas': self.consultas,
+            'sql_ms': round(self.sql * 1000, 2),
+            'plantillas_ms': round(self.plantillas * 1000, 2),
+            'total_ms': round(self.total * 1000, 2),
+        }
+
+
+@contextmanager
+def medir():
+    metricas = Metricas()
+    token = _actuales.set(_actuales.get() + (metricas,))
+    inicio = time.perf_counter()
+    try:
+        yield metricas
+    finally:
+        metricas.total = time.perf_counter() - inicio
+        _actuales.reset(token)
+
+
+def _ejecutar(ejecutar, sql, params, many, context):
+    actuales = _actuales.get()
+    if not actuales:
+        return ejecutar(sql, params, many, context)
+    inicio = time.perf_counter()
+    try:
+        return ejecutar(sql, params, many, context)
+    finally:
+        duracion = time.perf_counter() - inicio
+        for metricas in actuales:
+            metricas.sql += duracion
+            metricas.consultas += 1
+
+
+def instalar(conexion):
+    if _ejecutar not in conexion.execute_wrappers:
+        conexion.execute_wrappers.append(_ejecutar)
+
+
+# ===== Tiempo de plantillas =====
+# Motor de plantillas de Django que suma el tiempo de cada render a las métricas
+# en curso (settings.TEMPLATES). Sin medición activa no agrega nada.
+
+class PlantillaMedida:
+    def __init__(self, plantilla):
+        self.plantilla = plantilla
+
+    def __getattr__(self, nombre):
+        return getattr(self.plantilla, nombre)
+
+    def render(self, context=None, request=None):
+        actuales = _actuales.get()
+        if not actuales:
+            return self.plantilla.render(context, request)
+        inicio = time.perf_counter()
+        try:
+            return self.plantilla.render(context, request)
+        finally:
+            duracion = time.perf_counter() - inicio
+            for metricas in actuales:
+                metricas.plantillas += duracion
+
+
+class PlantillasMedidas(DjangoTemplates):
+    def from_string(self, template_code):
+        return PlantillaMedida(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return PlantillaMedida(super().get_template(template_name))
+
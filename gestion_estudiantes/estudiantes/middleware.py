@@ -0,0 +1,214 @@
+import json
+import logging
+
+from asgiref.sync import async_to_sync, iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from . import auditoria, estaticos, metricas, perfiles
+
+
+logger = logging.getLogger('estudiantes.metricas')
+
+
+class MetricasMiddleware:
+    """
+    Mide cada petición (consultas SQL, tiempo de SQL, de plantillas y total).
+    Con METRICAS_CABECERAS (por defecto en DEBUG) las agrega a la respuesta como
+    cabeceras X-Metricas-* y Server-Timing (visibles en las herramientas del
+    navegador); si no, escribe una línea JSON en el log 'estudiantes.metricas'.
+    En las respuestas en streaming no se mide el contenido enviado después.
+    Funciona con vistas síncronas (WSGI) y asíncronas (ASGI).
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with metricas.medir() as medidas:
+            response = self.get_response(request)
+        return self.registrar(request, response, medidas)
+
+    async def __acall__(self, request):
+        with metricas.medir() as medidas:
+            response = await self.get_response(request)
+        return self.registrar(request, response, medidas)
+
+    def registrar(self, request, response, medidas):
+        datos = medidas.como_dict()
+
+        if settings.METRICAS_CABECERAS:
+            response['X-Metricas-Consultas'] = datos['consultas']
+            response['X-Metricas-SQL-ms'] = datos['sql_ms']
+            response['X-Metricas-Plantillas-ms'] = datos['plantillas_ms']
+            response['X-Metricas-Total-ms'] = datos['total_ms']
+            response['Server-Timing'] = (
+                f'sql;dur={datos["sql_ms"]};desc="{datos["consultas"]} consultas", '
+                f'plantillas;dur={datos["plantillas_ms"]}, '
+                f'total;dur={datos["total_ms"]}'
+            )
+        else:
+            coincidencia = request.resolver_match
+            logger.info(json.dumps({
+                'metodo': request.method,
+                'ruta': request.path,
+                'vista': coincidencia.view_name if coincidencia else None,
+                'estado': response.status_code,
+                **datos,
+            }))
+        return response
+
+
+class AuditoriaMiddleware:
+    """
+    Junta los registros de auditoría de la petición y los guarda con un solo INSERT
+    cuando termina la vista (ver auditoria.py). La mayoría de las peticiones no cambia
+    nada y no escribe.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        lote, token = auditoria.abrir(request)
+        try:
+            return self.get_response(request)
+        finally:
+            auditoria.cerrar(token)
+            auditoria.guardar(lote)
+
+    async def __acall__(self, request):
+        lote, token = auditoria.abrir(request)
+        try:
+            return await self.get_response(request)
+        finally:
+            auditoria.cerrar(token)
+            if lote.registros:
+                await sync_to_async(auditoria.guardar)(lote)
+            else:
+                lote.guardado = True
+
+
+class PerfilMiddleware:
+    """
+    Ejecuta bajo un perfilador las peticiones de administradores que lo piden con
+    ?perfil=cprofile|muestreo o la cabecera X-Perfil (ver perfiles.py). La respuesta
+    lleva en X-Perfil el nombre del perfil guardado; en una respuesta en streaming el
+    perfil se guarda al terminar de enviarla. Con PERFILES_ACTIVOS=False el
+    middleware no se instala. Debe ser el último de MIDDLEWARE (su process_view
+    puede llamar a la vista).
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.PERFILES_ACTIVOS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+            # Con ASGI, Django llama a process_view desde el bucle: sin saltar de hilo
+            self.process_view = self.aprocess_view
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        modo = perfiles.modo_solicitado(request)
+        if modo is None:
+            return self.get_response(request)
+
+        sesion = perfiles.Sesion(modo)
+        try:
+            with sesion.activa(), sesion.hilo():
+                response = self.get_response(request)
+        except BaseException:
+            sesion.terminar()
+            raise
+        return self.terminar(request, sesion, response)
+
+    async def __acall__(self, request):
+        # La sesión se carga aquí y no dentro de modo_solicitado (no se puede consultar
+        # la base de datos desde el hilo del bucle de eventos)
+        if perfiles.pedido(request):
+            await request.session.aget('usuario_rol')
+        modo = perfiles.modo_solicitado(request)
+        if modo is None:
+            return await self.get_response(request)
+
+        sesion = perfiles.Sesion(modo)
+        try:
+            with sesion.activa(), sesion.hilo():
+                response = await self.get_response(request)
+        except BaseException:
+            sesion.terminar()
+            raise
+        return self.terminar(request, sesion, response)
+
+    # Si la vista corre en otro hilo que el middleware, process_view la llama para
+    # perfilar también ese hilo: con WSGI una vista async corre en el bucle de
+    # async_to_sync y con ASGI una síncrona en el hilo de sync_to_async. Sin perfil
+    # devuelve None y Django llama a la vista como siempre.
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if perfiles.sesion_actual() is None or not iscoroutinefunction(view_func):
+            return None
+        return async_to_sync(perfiles.en_hilo_async(view_func))(request, *view_args, **view_kwargs)
+
+    async def aprocess_view(self, request, view_func, view_args, view_kwargs):
+        if perfiles.sesion_actual() is None or iscoroutinefunction(view_func):
+            return None
+        # thread_sensitive, como Django: el mismo hilo en que correría la vista
+        return await sync_to_async(perfiles.en_hilo(view_func))(request, *view_args, **view_kwargs)
+
+    def terminar(self, request, sesion, response):
+        if not response.streaming:
+            sesion.terminar()
+            response['X-Perfil'] = perfiles.guardar(perfiles.nombre_base(request, sesion.modo, sesion.duracion), sesion)
+            return response
+        # Las partes se generan después de devolver la respuesta: el perfil sigue hasta
+        # la última y se guarda entonces, con el nombre ya enviado en X-Perfil
+        base = perfiles.nombre_base(request, sesion.modo)
+        response['X-Perfil'] = base
+        response.streaming_content = sesion.envolver(
+            response.streaming_content, response.is_async, lambda: perfiles.guardar(base, sesion),
+        )
+        return response
+
+
+class EstaticosMiddleware:
+    """
+    Sirve los archivos de STATIC_URL desde STATIC_ROOT (después de collectstatic),
+    comprimidos con brotli o gzip si el navegador los acepta y con caché de un año
+    para los nombres con hash (ver estaticos.py). Con ESTATICOS_SERVIR=False el
+    middleware no se instala (los sirve otro servidor, o runserver en desarrollo).
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.ESTATICOS_SERVIR:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        response = estaticos.servir(request)
+        return response if response is not None else self.get_response(request)
+
+    async def __acall__(self, request):
+        response = estaticos.servir(request)
+        return response if response is not None else await self.get_response(request)
@@ -0,0 +1,67 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:13
+
+from django.db import migrations, models
+
+
+# Llena el resumen de documentos de los estudiantes que ya existen
+CALCULAR_RESUMEN = """
+UPDATE estudiantes_estudiante SET
+    total_documentos = (
+        SELECT COUNT(*) FROM estudiantes_documentoestudiante d
+        WHERE d.estudiante_id = estudiantes_estudiante.id
+    ),
+    documentos_entregados = (
+        SELECT COUNT(*) FROM estudiantes_documentoestudiante d
+        WHERE d.estudiante_id = estudiantes_estudiante.id AND d.estado_documento = 'Sí'
+    ),
+    documentos_faltantes = (
+        SELECT COUNT(*) FROM estudiantes_documentoestudiante d
+        WHERE d.estudiante_id = estudiantes_estudiante.id AND d.estado_documento IN ('No', 'Vencida')
+    ),
+    estado_expediente = CASE
+        WHEN EXISTS (
+            SELECT 1 FROM estudiantes_documentoestudiante d
+            WHERE d.estudiante_id = estudiantes_estudiante.id AND d.estado_documento IN ('No', 'Vencida')
+        ) THEN 'incompleto'
+        WHEN NOT EXISTS (
+            SELECT 1 FROM estudiantes_documentoestudiante d
+            WHERE d.estudiante_id = estudiantes_estudiante.id
+        ) THEN 'sin_documentos'
+        WHEN NOT EXISTS (
+            SELECT 1 FROM estudiantes_documentoestudiante d
+            WHERE d.estudiante_id = estudiantes_estudiante.id AND d.estado_documento <> 'Sí'
+        ) THEN 'completo'
+        ELSE 'pendiente'
+    END
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('estudiantes', '0002_alter_cohorte_anio'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='estudiante',
+            name='documentos_entregados',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='estudiante',
+            name='documentos_faltantes',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='estudiante',
+            name='estado_expediente',
+            field=models.CharField(choices=[('completo', 'Completo'), ('incompleto', 'Incompleto'), ('pendiente', 'Pendiente'), ('sin_documentos', 'Sin documentos')], db_index=True, default='sin_documentos', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='estudiante',
+            name='total_documentos',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.RunSQL(CALCULAR_RESUMEN, migrations.RunSQL.noop),
+    ]
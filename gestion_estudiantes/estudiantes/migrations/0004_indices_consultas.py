@@ -0,0 +1,88 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:15
+
+from django.db import migrations, models
+from django.db.models import Count, Max
+
+
+def _clasificar(estados):
+    entregados = sum(1 for e in estados if e == 'Sí')
+    faltantes = sum(1 for e in estados if e in ('No', 'Vencida'))
+    if faltantes:
+        expediente = 'incompleto'
+    elif not estados:
+        expediente = 'sin_documentos'
+    elif entregados == len(estados):
+        expediente = 'completo'
+    else:
+        expediente = 'pendiente'
+    return {
+        'total_documentos': len(estados),
+        'documentos_entregados': entregados,
+        'documentos_faltantes': faltantes,
+        'estado_expediente': expediente,
+    }
+
+
+def eliminar_documentos_duplicados(apps, schema_editor):
+    """
+    Antes de crear la restricción única deja un solo documento por (estudiante, tipo):
+    se conserva el último registrado (id mayor) y se recalcula el resumen del estudiante.
+    """
+    Estudiante = apps.get_model('estudiantes', 'Estudiante')
+    DocumentoEstudiante = apps.get_model('estudiantes', 'DocumentoEstudiante')
+
+    duplicados = (
+        DocumentoEstudiante.objects
+        .values('estudiante_id', 'tipo_documento')
+        .annotate(n=Count('id'), ultimo=Max('id'))
+        .filter(n__gt=1)
+    )
+    afectados = set()
+    for grupo in duplicados:
+        (DocumentoEstudiante.objects
+         .filter(estudiante_id=grupo['estudiante_id'], tipo_documento=grupo['tipo_documento'])
+         .exclude(id=grupo['ultimo'])
+         .delete())
+        afectados.add(grupo['estudiante_id'])
+
+    for estudiante_id in afectados:
+        estados = list(
+            DocumentoEstudiante.objects.filter(estudiante_id=estudiante_id)
+            .values_list('estado_documento', flat=True)
+        )
+        Estudiante.objects.filter(id=estudiante_id).update(**_clasificar(estados))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('estudiantes', '0003_resumen_documentos'),
+    ]
+
+    operations = [
+        migrations.RunPython(eliminar_documentos_duplicados, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='documentoestudiante',
+            index=models.Index(fields=['estado_documento', 'estudiante'], name='documento_estado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='documentoestudiante',
+            index=models.Index(fields=['tipo_documento', 'estado_documento'], name='documento_tipo_estado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='estudiante',
+            index=models.Index(fields=['apellidos', 'nombres', 'id'], name='estudiante_apellidos_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='estudiante',
+            index=models.Index(fields=['nombres', 'apellidos', 'id'], name='estudiante_nombres_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='estudiante',
+            index=models.Index(fields=['estado_expediente', 'apellidos', 'nombres', 'id'], name='estudiante_expediente_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='documentoestudiante',
+            constraint=models.UniqueConstraint(fields=('estudiante', 'tipo_documento'), name='documento_unico_por_estudiante'),
+        ),
+    ]
@@ -0,0 +1,88 @@
+from django.db import migrations
+from django.db.utils import OperationalError
+
+
+# Índice de texto completo (FTS5) sobre cédula, nombres y apellidos, solo en SQLite.
+# Es una tabla "external content": no copia los datos, solo el índice, y los
+# disparadores la mantienen al día con cualquier escritura (incluido bulk_create y
+# UPDATE masivos). 'remove_diacritics 2' hace que Á = A y Ñ = N al buscar.
+# En otras bases de datos la migración no hace nada y busqueda.py usa LIKE.
+
+CREAR = [
+    """
+    CREATE VIRTUAL TABLE estudiantes_busqueda USING fts5(
+        cedula, nombres, apellidos,
+        content='estudiantes_estudiante', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2',
+        prefix='2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER estudiantes_busqueda_insertar AFTER INSERT ON estudiantes_estudiante BEGIN
+        INSERT INTO estudiantes_busqueda(rowid, cedula, nombres, apellidos)
+        VALUES (new.id, new.cedula, new.nombres, new.apellidos);
+    END
+    """,
+    """
+    CREATE TRIGGER estudiantes_busqueda_eliminar AFTER DELETE ON estudiantes_estudiante BEGIN
+        INSERT INTO estudiantes_busqueda(estudiantes_busqueda, rowid, cedula, nombres, apellidos)
+        VALUES ('delete', old.id, old.cedula, old.nombres, old.apellidos);
+    END
+    """,
+    # Solo cuando cambian las columnas indexadas (no al recalcular el resumen de documentos)
+    """
+    CREATE TRIGGER estudiantes_busqueda_actualizar
+    AFTER UPDATE OF cedula, nombres, apellidos ON estudiantes_estudiante BEGIN
+        INSERT INTO estudiantes_busqueda(estudiantes_busqueda, rowid, cedula, nombres, apellidos)
+        VALUES ('delete', old.id, old.cedula, old.nombres, old.apellidos);
+        INSERT INTO estudiantes_busqueda(rowid, cedula, nombres, apellidos)
+        VALUES (new.id, new.cedula, new.nombres, new.apellidos);
+    END
+    """,
+    "INSERT INTO estudiantes_busqueda(estudiantes_busqueda) VALUES ('rebuild')",
+]
+
+ELIMINAR = [
+    "DROP TRIGGER IF EXISTS estudiantes_busqueda_insertar",
+    "DROP TRIGGER IF EXISTS estudiantes_busqueda_eliminar",
+    "DROP TRIGGER IF EXISTS estudiantes_busqueda_actualizar",
+    "DROP TABLE IF EXISTS estudiantes_busqueda",
+]
+
+
+def _soporta_fts5(cursor):
+    try:
+        cursor.execute("CREATE VIRTUAL TABLE temp.prueba_fts5 USING fts5(x)")
+    except OperationalError:
+        return False
+    cursor.execute("DROP TABLE temp.prueba_fts5")
+    return True
+
+
+def crear_busqueda(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        if not _soporta_fts5(cursor):
+            return
+        for sql in CREAR:
+            cursor.execute(sql)
+
+
+def eliminar_busqueda(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for sql in ELIMINAR:
+            cursor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('estudiantes', '0004_indices_consultas'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_busqueda, eliminar_busqueda),
+    ]
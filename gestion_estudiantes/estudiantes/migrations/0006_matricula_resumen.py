@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# Llena la matrícula con los estudiantes que ya existen
+LLENAR_MATRICULA = [
+    "INSERT INTO estudiantes_matriculacohorte (cohorte_id, total) "
+    "SELECT cohorte_id, COUNT(*) FROM estudiantes_estudiante GROUP BY cohorte_id",
+    "INSERT INTO estudiantes_matriculaespecialidad (especialidad_id, total) "
+    "SELECT especialidad_id, COUNT(*) FROM estudiantes_estudiante GROUP BY especialidad_id",
+    "INSERT INTO estudiantes_matriculaextension (extension_id, total) "
+    "SELECT extension_id, COUNT(*) FROM estudiantes_estudiante GROUP BY extension_id",
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('estudiantes', '0005_busqueda_estudiantes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MatriculaCohorte',
+            fields=[
+                ('cohorte', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='matricula', serialize=False, to='estudiantes.cohorte')),
+                ('total', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='MatriculaEspecialidad',
+            fields=[
+                ('especialidad', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='matricula', serialize=False, to='estudiantes.especialidad')),
+                ('total', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='MatriculaExtension',
+            fields=[
+                ('extension', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='matricula', serialize=False, to='estudiantes.extension')),
+                ('total', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.RunSQL(LLENAR_MATRICULA, reverse_sql=migrations.RunSQL.noop),
+    ]
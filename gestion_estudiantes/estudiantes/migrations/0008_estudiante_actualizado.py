@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:40
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('estudiantes', '0007_trabajos'),
+    ]
+
+    operations = [
+        # Los estudiantes existentes quedan con la fecha de la migración
+        migrations.AddField(
+            model_name='estudiante',
+            name='actualizado',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddIndex(
+            model_name='estudiante',
+            index=models.Index(fields=['actualizado', 'id'], name='estudiante_actualizado_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:10
+
+import django.core.serializers.json
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('estudiantes', '0008_estudiante_actualizado'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RegistroAuditoria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateTimeField(default=django.utils.timezone.now)),
+                ('usuario_id', models.IntegerField(blank=True, null=True)),
+                ('usuario_nombre', models.CharField(blank=True, max_length=100)),
+                ('modelo', models.CharField(max_length=50)),
+                ('objeto_id', models.IntegerField(blank=True, null=True)),
+                ('estudiante_id', models.IntegerField(blank=True, null=True)),
+                ('accion', models.CharField(choices=[('crear', 'Creación'), ('editar', 'Edición'), ('eliminar', 'Eliminación')], max_length=20)),
+                ('cambios', models.JSONField(default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['estudiante_id', 'fecha', 'id'], name='auditoria_estudiante_idx'), models.Index(fields=['usuario_id', 'fecha', 'id'], name='auditoria_usuario_idx'), models.Index(fields=['fecha', 'id'], name='auditoria_fecha_idx')],
+            },
+        ),
+    ]
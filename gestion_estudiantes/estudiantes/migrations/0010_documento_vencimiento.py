@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('estudiantes', '0009_auditoria'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='documentoestudiante',
+            name='fecha_entrega',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='documentoestudiante',
+            name='fecha_vencimiento',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='documentoestudiante',
+            index=models.Index(condition=models.Q(('fecha_vencimiento__isnull', False)), fields=['estado_documento', 'fecha_vencimiento'], name='documento_vencimiento_idx'),
+        ),
+    ]
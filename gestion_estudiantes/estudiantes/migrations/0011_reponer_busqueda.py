@@ -0,0 +1,37 @@
+from importlib import import_module
+
+from django.db import migrations
+
+
+# La migración 0008 agregó una columna con valor por defecto, y SQLite lo hace
+# copiando la tabla de estudiantes a una nueva: al borrar la vieja se borraron con
+# ella los disparadores de la 0005 y el índice FTS5 dejó de actualizarse.
+# Se vuelven a crear y se reconstruye el índice con los datos actuales.
+# Cualquier migración futura que rehaga la tabla (AddField con default, AlterField,
+# RemoveField) debe reponerlos de la misma forma.
+
+busqueda = import_module('estudiantes.migrations.0005_busqueda_estudiantes')
+
+
+def reponer_busqueda(apps, schema_editor):
+    conexion = schema_editor.connection
+    if conexion.vendor != 'sqlite':
+        return
+    with conexion.cursor() as cursor:
+        if 'estudiantes_busqueda' not in conexion.introspection.table_names(cursor):
+            return
+        for sql in busqueda.CREAR:
+            if 'CREATE TRIGGER' in sql:
+                cursor.execute(sql.replace('CREATE TRIGGER', 'CREATE TRIGGER IF NOT EXISTS'))
+        cursor.execute("INSERT INTO estudiantes_busqueda(estudiantes_busqueda) VALUES ('rebuild')")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('estudiantes', '0010_documento_vencimiento'),
+    ]
+
+    operations = [
+        migrations.RunPython(reponer_busqueda, migrations.RunPython.noop),
+    ]
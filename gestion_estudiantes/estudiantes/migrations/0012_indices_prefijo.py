@@ -0,0 +1,54 @@
+from django.db import migrations
+
+
+# Índices para la búsqueda por LIKE de busqueda.py, que se usa cuando no hay FTS5.
+# Los índices comunes no sirven para 'apellidos__istartswith':
+#   - PostgreSQL lo traduce a UPPER("apellidos"::text) LIKE UPPER('per%'), que solo usa
+#     un índice sobre la misma expresión y con text_pattern_ops (si no, la intercalación
+#     del idioma impide recorrerlo por prefijo). La cédula ya tiene el índice '_like'
+#     que Django crea para los CharField únicos.
+#   - SQLite resuelve LIKE sin distinguir mayúsculas, y solo por un índice NOCASE.
+# En SQLite con FTS5 (migración 0005) no se crean: la búsqueda no pasa por LIKE y
+# cada índice más haría más lenta la importación.
+
+INDICES = {
+    'postgresql': [
+        ('estudiante_apellidos_prefijo', 'UPPER(apellidos::text) text_pattern_ops'),
+        ('estudiante_nombres_prefijo', 'UPPER(nombres::text) text_pattern_ops'),
+    ],
+    'sqlite': [
+        ('estudiante_cedula_prefijo', 'cedula COLLATE NOCASE'),
+        ('estudiante_apellidos_prefijo', 'apellidos COLLATE NOCASE'),
+        ('estudiante_nombres_prefijo', 'nombres COLLATE NOCASE'),
+    ],
+}
+
+
+def _indices(schema_editor):
+    conexion = schema_editor.connection
+    if conexion.vendor == 'sqlite':
+        with conexion.cursor() as cursor:
+            if 'estudiantes_busqueda' in conexion.introspection.table_names(cursor):
+                return []
+    return INDICES.get(conexion.vendor, [])
+
+
+def crear_indices(apps, schema_editor):
+    for nombre, expresion in _indices(schema_editor):
+        schema_editor.execute(f"CREATE INDEX {nombre} ON estudiantes_estudiante ({expresion})")
+
+
+def eliminar_indices(apps, schema_editor):
+    for nombre, _ in INDICES.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(f"DROP INDEX IF EXISTS {nombre}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('estudiantes', '0011_reponer_busqueda'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_indices, eliminar_indices),
+    ]
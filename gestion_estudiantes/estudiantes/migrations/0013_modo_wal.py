@@ -0,0 +1,37 @@
+from django.conf import settings
+from django.db import migrations
+
+
+# WAL (lectores y un escritor a la vez, sin bloquearse) queda guardado en el archivo
+# de la base de datos: basta con activarlo una vez. Si se ejecutara en cada conexión
+# (OPTIONS['init_command']), cualquier comando (check, shell) reescribiría la cabecera
+# de un db.sqlite3 que todavía no lo tenga. Con SQLITE_AJUSTES=0 no se activa.
+# Fuera de una transacción: SQLite no cambia journal_mode dentro de una.
+
+
+def activar_wal(apps, schema_editor):
+    conexion = schema_editor.connection
+    if conexion.vendor != 'sqlite' or conexion.is_in_memory_db() or not settings.SQLITE_AJUSTES:
+        return
+    with conexion.cursor() as cursor:
+        cursor.execute("PRAGMA journal_mode = WAL")
+
+
+def desactivar_wal(apps, schema_editor):
+    conexion = schema_editor.connection
+    if conexion.vendor != 'sqlite' or conexion.is_in_memory_db():
+        return
+    with conexion.cursor() as cursor:
+        cursor.execute("PRAGMA journal_mode = DELETE")
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('estudiantes', '0012_indices_prefijo'),
+    ]
+
+    operations = [
+        migrations.RunPython(activar_wal, desactivar_wal),
+    ]
@@ -1,3 +1,4 @@
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 from django.utils import timezone
 from datetime import datetime
@@ -61,9 +62,67 @@ class Estudiante(models.Model):
     cohorte = models.ForeignKey(Cohorte, on_delete=models.CASCADE)
     extension = models.ForeignKey(Extension, on_delete=models.CASCADE)
 
+    # Resumen de documentos, se actualiza cada vez que se escriben documentos (ver expedientes.py)
+    EXPEDIENTES = [
+        ("completo", "Completo"),
+        ("incompleto", "Incompleto"),
+        ("pendiente", "Pendiente"),
+        ("sin_documentos", "Sin documentos"),
+    ]
+
+    total_documentos = models.PositiveSmallIntegerField(default=0)
+    documentos_entregados = models.PositiveSmallIntegerField(default=0)
+    documentos_faltantes = models.PositiveSmallIntegerField(default=0)
+    estado_expediente = models.CharField(max_length=20, choices=EXPEDIENTES, default="sin_documentos", db_index=True)
+
+    # Último cambio del estudiante o de sus documentos (lo usa la API con since=). Las
+    # escrituras masivas de documentos lo actualizan a mano (ver documentos.py)
+    actualizado = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Cambios desde una fecha (api.py)
+            models.Index(fields=['actualizado', 'id'], name='estudiante_actualizado_idx'),
+            # Orden de la lista de estudiantes y cursor de paginación
+            models.Index(fields=['apellidos', 'nombres', 'id'], name='estudiante_apellidos_idx'),
+            models.Index(fields=['nombres', 'apellidos', 'id'], name='estudiante_nombres_idx'),
+            # Detalle de expedientes por estado, ya ordenado por apellidos
+            models.Index(fields=['estado_expediente', 'apellidos', 'nombres', 'id'], name='estudiante_expediente_idx'),
+        ]
+
     def __str__(self):
         return f"{self.nombres} {self.apellidos} - {self.especialidad} ({self.cohorte})"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        # Guarda la cohorte, especialidad y extensión leídas, para que matricula.py
+        # sepa de qué grupo sale el estudiante si se cambian al editarlo
+        instancia = super().from_db(db, field_names, values)
+        instancia._matricula_original = {
+            campo: getattr(instancia, campo)
+            for campo in ('cohorte_id', 'especialidad_id', 'extension_id')
+            if campo in instancia.__dict__
+        }
+        return instancia
+
+
+# ===== MATRÍCULA (tablas de resumen) =====
+# Cantidad de estudiantes por cohorte, especialidad y extensión. Se mantienen al día
+# con cada alta, baja o cambio de un estudiante (ver matricula.py).
+class MatriculaCohorte(models.Model):
+    cohorte = models.OneToOneField(Cohorte, on_delete=models.CASCADE, primary_key=True, related_name='matricula')
+    total = models.IntegerField(default=0)
+
+
+class MatriculaEspecialidad(models.Model):
+    especialidad = models.OneToOneField(Especialidad, on_delete=models.CASCADE, primary_key=True, related_name='matricula')
+    total = models.IntegerField(default=0)
+
+
+class MatriculaExtension(models.Model):
+    extension = models.OneToOneField(Extension, on_delete=models.CASCADE, primary_key=True, related_name='matricula')
+    total = models.IntegerField(default=0)
+
 
 # ===== DOCUMENTOS POR ESTUDIANTE =====
 class DocumentoEstudiante(models.Model):
@@ -88,6 +147,25 @@ class DocumentoEstudiante(models.Model):
     tipo_documento = models.CharField(max_length=100, choices=TIPOS_DOCUMENTO)
     estado_documento = models.CharField(max_length=50, choices=ESTADOS_DOCUMENTO)
     observacion = models.CharField(max_length=200, blank=True, null=True)
+    # Opcionales. Al llegar la fecha de vencimiento, el comando vencer_documentos pasa
+    # el documento a 'Vencida' (ver documentos.py)
+    fecha_entrega = models.DateField(null=True, blank=True)
+    fecha_vencimiento = models.DateField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            # Un solo registro por tipo de documento y estudiante (también sirve de índice
+            # para buscar los documentos de un estudiante)
+            models.UniqueConstraint(fields=['estudiante', 'tipo_documento'], name='documento_unico_por_estudiante'),
+        ]
+        indexes = [
+            # Reportes por estado y operaciones sobre un tipo de documento
+            models.Index(fields=['estado_documento', 'estudiante'], name='documento_estado_idx'),
+            models.Index(fields=['tipo_documento', 'estado_documento'], name='documento_tipo_estado_idx'),
+            # Documentos por vencer: un rango de fechas por estado, solo los que tienen fecha
+            models.Index(fields=['estado_documento', 'fecha_vencimiento'], name='documento_vencimiento_idx',
+                         condition=models.Q(fecha_vencimiento__isnull=False)),
+        ]
 
     def __str__(self):
         return f"{self.estudiante} - {self.tipo_documento} ({self.estado_documento})"
@@ -105,3 +183,82 @@ class Usuario(models.Model):
 
     def __str__(self):
         return f"{self.nombre_usuario} ({self.rol})"
+
+
+# ===== TRABAJOS EN SEGUNDO PLANO =====
+# Exportaciones, importaciones y recálculos largos que no se hacen dentro de la
+# petición: los ejecuta el comando procesar_trabajos (ver trabajos.py).
+class Trabajo(models.Model):
+    PENDIENTE = 'pendiente'
+    EN_CURSO = 'en_curso'
+    TERMINADO = 'terminado'
+    FALLIDO = 'fallido'
+    ESTADOS = [
+        (PENDIENTE, "Pendiente"),
+        (EN_CURSO, "En curso"),
+        (TERMINADO, "Terminado"),
+        (FALLIDO, "Fallido"),
+    ]
+
+    tipo = models.CharField(max_length=30)
+    parametros = models.JSONField(default=dict, blank=True)
+    usuario = models.ForeignKey(Usuario, on_delete=models.SET_NULL, null=True, blank=True)
+    estado = models.CharField(max_length=20, choices=ESTADOS, default=PENDIENTE)
+    # Avance: 'hecho' de 'total' (total vacío si no se conoce de antemano)
+    hecho = models.PositiveIntegerField(default=0)
+    total = models.PositiveIntegerField(null=True, blank=True)
+    mensaje = models.CharField(max_length=200, blank=True)
+    resultado = models.JSONField(null=True, blank=True)
+    # Archivo generado, dentro de TRABAJOS_DIR; se borra al vencer
+    archivo = models.CharField(max_length=200, blank=True)
+    creado = models.DateTimeField(auto_now_add=True)
+    iniciado = models.DateTimeField(null=True, blank=True)
+    terminado = models.DateTimeField(null=True, blank=True)
+    actualizado = models.DateTimeField(auto_now=True)
+    vence = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # El proceso de trabajos busca el pendiente más antiguo
+            models.Index(fields=['estado', 'creado'], name='trabajo_estado_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.tipo} #{self.pk} ({self.estado})"
+
+
+# ===== AUDITORÍA =====
+# Quién creó, editó o eliminó cada registro y qué campos cambiaron (ver auditoria.py).
+# Solo se agregan filas. El usuario y el estudiante se guardan como números, sin clave
+# foránea, para que el registro quede aunque se eliminen.
+class RegistroAuditoria(models.Model):
+    CREAR = 'crear'
+    EDITAR = 'editar'
+    ELIMINAR = 'eliminar'
+    ACCIONES = [
+        (CREAR, "Creación"),
+        (EDITAR, "Edición"),
+        (ELIMINAR, "Eliminación"),
+    ]
+
+    fecha = models.DateTimeField(default=timezone.now)
+    usuario_id = models.IntegerField(null=True, blank=True)
+    usuario_nombre = models.CharField(max_length=100, blank=True)
+    modelo = models.CharField(max_length=50)
+    objeto_id = models.IntegerField(null=True, blank=True)
+    # El estudiante al que se refiere el cambio (él mismo o sus documentos)
+    estudiante_id = models.IntegerField(null=True, blank=True)
+    accion = models.CharField(max_length=20, choices=ACCIONES)
+    # {campo: [antes, después]}
+    cambios = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+
+    class Meta:
+        indexes = [
+            # Página de auditoría: más recientes primero, por estudiante, por usuario o todos
+            models.Index(fields=['estudiante_id', 'fecha', 'id'], name='auditoria_estudiante_idx'),
+            models.Index(fields=['usuario_id', 'fecha', 'id'], name='auditoria_usuario_idx'),
+            models.Index(fields=['fecha', 'id'], name='auditoria_fecha_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_accion_display()} de {self.modelo} #{self.objeto_id} ({self.fecha:%d/%m/%Y %H:%M})"
@@ -0,0 +1,90 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+
+# ====================================
+# ===== PAGINACIÓN POR CURSOR ========
+# ====================================
+#
+# En vez de OFFSET, cada página continúa desde los valores de la última fila de la
+# anterior ("keyset"). Las claves deben terminar en un campo único (normalmente 'id')
+# para que el orden sea total, y conviene que exista un índice con esas columnas.
+
+class _Codificador(DjangoJSONEncoder):
+    def default(self, o):
+        # Con los microsegundos: DjangoJSONEncoder los recorta a milisegundos y el
+        # cursor quedaría antes de su propia fila
+        if isinstance(o, datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def codificar_cursor(valores):
+    texto = json.dumps(valores, cls=_Codificador, separators=(',', ':'))
+    return base64.urlsafe_b64encode(texto.encode()).decode()
+
+
+def decodificar_cursor(cursor, claves):
+    """
+    Devuelve la lista de valores del cursor, o None si el cursor no es válido.
+    """
+    if not cursor:
+        return None
+    try:
+        valores = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, binascii.Error):
+        return None
+    if not isinstance(valores, list) or len(valores) != len(claves):
+        return None
+    return valores
+
+
+def filtro_despues_de(claves, valores, descendente=False):
+    """
+    Condición "fila > cursor" según el orden de las claves:
+    k1 >= v1 AND ((k1 > v1) OR (k1 = v1 AND k2 > v2) OR ...)
+    La primera comparación permite que la base de datos busque en el índice
+    directamente desde el cursor en vez de recorrerlo desde el principio.
+    """
+    comparacion = 'lt' if descendente else 'gt'
+    condicion = Q()
+    for i, clave in enumerate(claves):
+        iguales = {claves[j]: valores[j] for j in range(i)}
+        condicion |= Q(**iguales, **{f'{clave}__{comparacion}': valores[i]})
+    return Q(**{f'{claves[0]}__{comparacion}e': valores[0]}) & condicion
+
+
+def _valor(fila, clave):
+    if isinstance(fila, dict):
+        return fila[clave]
+    for parte in clave.split('__'):
+        fila = getattr(fila, parte)
+    return fila
+
+
+def paginar(queryset, claves, cursor=None, cantidad=25, descendente=False, desplazamiento=0):
+    """
+    Devuelve (filas, cursor_siguiente) con una sola consulta. Si no hay cursor se
+    usa el desplazamiento (solo para saltos directos a una página). Las filas del
+    queryset (diccionarios o modelos) deben incluir todas las claves.
+    """
+    orden = [f'-{clave}' if descendente else clave for clave in claves]
+    queryset = queryset.order_by(*orden)
+
+    valores = decodificar_cursor(cursor, claves)
+    if valores is not None:
+        queryset = queryset.filter(filtro_despues_de(claves, valores, descendente))
+        desplazamiento = 0
+
+    # Se pide una fila extra para saber si hay página siguiente sin hacer COUNT(*)
+    filas = list(queryset[desplazamiento:desplazamiento + cantidad + 1])
+    siguiente = None
+    if len(filas) > cantidad:
+        filas = filas[:cantidad]
+        siguiente = codificar_cursor([_valor(filas[-1], clave) for clave in claves])
+    return filas, siguiente
@@ -0,0 +1,302 @@
+import collections
+import cProfile
+import functools
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+
+from django.conf import settings
+
+
+# ====================================
+# ===== PERFILES DE PETICIONES =======
+# ====================================
+#
+# Un administrador puede pedir que una petición se ejecute bajo un perfilador
+# agregando ?perfil=cprofile (o ?perfil=muestreo) a la URL, o la cabecera
+# "X-Perfil: cprofile". PerfilMiddleware (middleware.py) hace el resto.
+#
+#   cprofile: cProfile, con el tiempo exacto de cada función (archivo .pstats) y, a la
+#             vez, un muestreo de la pila para el gráfico de llamas (archivo .folded).
+#   muestreo: solo el muestreo de la pila (.folded), con mucho menos costo agregado.
+#
+# Se perfilan todos los hilos que trabajan para la petición, no solo el del middleware
+# (ver Sesion), y en una respuesta en streaming se sigue perfilando hasta enviar la
+# última parte.
+#
+# Los archivos quedan en PERFILES_DIR; se conservan los últimos PERFILES_MAXIMO.
+# Para ver un .pstats:  python -m pstats archivo.pstats
+# Para el gráfico:      flamegraph.pl archivo.folded > llamas.svg  (o speedscope.app)
+
+MODOS = ('cprofile', 'muestreo')
+INTERVALO_MUESTREO = 0.002
+
+_NOMBRE_ARCHIVO = re.compile(r'^[\w.-]+\.(pstats|folded)$')
+
+
+def pedido(request):
+    # Comprobación rápida para que las peticiones normales no paguen nada
+    return 'perfil=' in request.META.get('QUERY_STRING', '') or 'HTTP_X_PERFIL' in request.META
+
+
+def modo_solicitado(request):
+    """
+    Modo de perfil pedido en la petición, o None. Solo para administradores.
+    """
+    if not pedido(request):
+        return None
+    modo = request.GET.get('perfil') or request.META.get('HTTP_X_PERFIL')
+    if not modo or request.session.get('usuario_rol') != "Administrador":
+        return None
+    modo = modo.lower()
+    return modo if modo in MODOS else 'cprofile'
+
+
+# Sesión de la petición perfilada en curso (sync_to_async y async_to_sync la copian a sus hilos)
+_sesion = ContextVar('perfil_sesion', default=None)
+_FIN = object()
+
+
+class Sesion:
+    """
+    Perfil de una petición. Cada hilo que trabaja para ella entra con hilo(): el del
+    middleware, el que ejecuta la vista (con WSGI una vista async corre en el bucle de
+    async_to_sync; con ASGI una síncrona, en el de sync_to_async) y los del pool de
+    asincrono.py. Cada uno tiene su cProfile, y el muestreador toma la pila de los que
+    están dentro de hilo() en ese momento.
+    """
+    def __init__(self, modo):
+        self.modo = modo
+        # id del hilo -> [cProfile.Profile o None, profundidad]
+        self.hilos = {}
+        self.inicio = time.perf_counter()
+        self.duracion = None
+        self.muestreador = Muestreador(self.hilos)
+        self.muestreador.start()
+
+    @contextmanager
+    def activa(self):
+        """
+        Marca el contexto como parte de esta petición: en_hilo() y process_view de
+        PerfilMiddleware la encuentran desde los hilos a los que pasa el trabajo.
+        """
+        token = _sesion.set(self)
+        try:
+            yield self
+        finally:
+            _sesion.reset(token)
+
+    @contextmanager
+    def hilo(self):
+        estado = self.hilos.get(threading.get_ident())
+        if estado is None:
+            perfil = cProfile.Profile() if self.modo == 'cprofile' else None
+            estado = self.hilos.setdefault(threading.get_ident(), [perfil, 0])
+        if estado[1] == 0 and estado[0] is not None:
+            try:
+                estado[0].enable()
+            except ValueError:
+                # Otro perfilador ya está activo en el hilo (Python 3.12+ admite uno solo a la vez)
+                estado[0] = None
+        estado[1] += 1
+        try:
+            yield
+        finally:
+            estado[1] -= 1
+            if estado[1] == 0 and estado[0] is not None:
+                estado[0].disable()
+
+    def terminar(self):
+        if self.duracion is None:
+            self.duracion = time.perf_counter() - self.inicio
+            self.muestreador.detener()
+
+    def estadisticas(self):
+        """
+        pstats.Stats con los perfiles de todos los hilos, o None en modo muestreo.
+        """
+        perfiles = [perfil for perfil, _ in self.hilos.values() if perfil is not None]
+        return pstats.Stats(*perfiles) if perfiles else None
+
+    def envolver(self, contenido, es_async, al_terminar):
+        """
+        Contenido de un StreamingHttpResponse que se sigue perfilando mientras se genera,
+        después de que el middleware devolvió la respuesta. Al agotarse o cerrarse
+        termina la sesión y llama a al_terminar().
+        """
+        if es_async:
+            return self._envolver_async(contenido, al_terminar)
+        return self._envolver(contenido, al_terminar)
+
+    def _envolver(self, contenido, al_terminar):
+        iterador = iter(contenido)
+        try:
+            while True:
+                with self.activa(), self.hilo():
+                    parte = next(iterador, _FIN)
+                if parte is _FIN:
+                    return
+                yield parte
+        finally:
+            self.terminar()
+            al_terminar()
+
+    async def _envolver_async(self, contenido, al_terminar):
+        iterador = aiter(contenido)
+        try:
+            while True:
+                with self.activa(), self.hilo():
+                    parte = await anext(iterador, _FIN)
+                if parte is _FIN:
+                    return
+                yield parte
+        finally:
+            self.terminar()
+            al_terminar()
+
+
+def sesion_actual():
+    return _sesion.get()
+
+
+def en_hilo(funcion):
+    """
+    funcion envuelta para que, si se llama como parte de una petición perfilada, se
+    perfile también en el hilo donde corra. Fuera de un perfil solo cuesta leer una
+    ContextVar.
+    """
+    @functools.wraps(funcion)
+    def llamar(*args, **kwargs):
+        sesion = _sesion.get()
+        if sesion is None:
+            return funcion(*args, **kwargs)
+        with sesion.hilo():
+            return funcion(*args, **kwargs)
+    return llamar
+
+
+def en_hilo_async(funcion):
+    """
+    Como en_hilo(), para una función async (se perfila el hilo de su bucle de eventos).
+    """
+    @functools.wraps(funcion)
+    async def llamar(*args, **kwargs):
+        sesion = _sesion.get()
+        if sesion is None:
+            return await funcion(*args, **kwargs)
+        with sesion.hilo():
+            return await funcion(*args, **kwargs)
+    return llamar
+
+
+class Muestreador(threading.Thread):
+    """
+    Toma cada INTERVALO_MUESTREO segundos la pila de los hilos de 'hilos' que están
+    trabajando y cuenta cuántas veces aparece cada una (formato "collapsed stack" de
+    flamegraph.pl, con el nombre del hilo como raíz).
+    """
+    def __init__(self, hilos, intervalo=INTERVALO_MUESTREO):
+        super().__init__(daemon=True)
+        self.hilos = hilos
+        self.intervalo = intervalo
+        self.pilas = collections.Counter()
+        self._parar = threading.Event()
+
+    def run(self):
+        while not self._parar.wait(self.intervalo):
+            activos = [ident for ident, (_, profundidad) in list(self.hilos.items()) if profundidad]
+            if not activos:
+                continue
+            marcos = sys._current_frames()
+            nombres = {hilo.ident: hilo.name for hilo in threading.enumerate()}
+            for ident in activos:
+                marco = marcos.get(ident)
+                pila = []
+                while marco is not None:
+                    codigo = marco.f_code
+                    archivo = os.path.basename(codigo.co_filename)
+                    pila.append(f"{codigo.co_name} ({archivo}:{codigo.co_firstlineno})".replace(';', ','))
+                    marco = marco.f_back
+                if pila:
+                    pila.append(f"hilo {nombres.get(ident, ident)}".replace(';', ','))
+                    self.pilas[';'.join(reversed(pila))] += 1
+
+    def detener(self):
+        self._parar.set()
+        self.join()
+
+    def folded(self):
+        return ''.join(f"{pila} {cuenta}\n" for pila, cuenta in self.pilas.most_common())
+
+
+def nombre_base(request, modo, duracion=None):
+    """
+    Nombre de los archivos del perfil (sin extensión). Sin duración (una respuesta en
+    streaming, cuyo nombre se envía antes de terminar) lleva "streaming" en su lugar.
+    """
+    vista = request.resolver_match.view_name if request.resolver_match else 'sin_vista'
+    tiempo = f"{duracion * 1000:.0f}ms" if duracion is not None else 'streaming'
+    return re.sub(r'[^\w.-]', '_', f"{datetime.now():%Y%m%d-%H%M%S-%f}-{vista}-{modo}-{tiempo}")
+
+
+def guardar(base, sesion):
+    """
+    Guarda los archivos del perfil de una sesión terminada y devuelve 'base'.
+    """
+    os.makedirs(settings.PERFILES_DIR, exist_ok=True)
+    estadisticas = sesion.estadisticas()
+    if estadisticas is not None:
+        estadisticas.dump_stats(os.path.join(settings.PERFILES_DIR, f"{base}.pstats"))
+    with open(os.path.join(settings.PERFILES_DIR, f"{base}.folded"), 'w', encoding='utf-8') as archivo:
+        archivo.write(sesion.muestreador.folded())
+    _limpiar()
+    return base
+
+
+def _limpiar():
+    perfiles = listar()
+    for viejo in perfiles[settings.PERFILES_MAXIMO:]:
+        for nombre in viejo['archivos']:
+            try:
+                os.remove(os.path.join(settings.PERFILES_DIR, nombre))
+            except FileNotFoundError:
+                pass
+
+
+def listar():
+    """
+    Perfiles guardados, del más reciente al más antiguo. Cada uno es un diccionario
+    con 'base', 'fecha', 'archivos' (nombres) y 'tamano' (bytes en total).
+    """
+    if not os.path.isdir(settings.PERFILES_DIR):
+        return []
+    perfiles = {}
+    for entrada in os.scandir(settings.PERFILES_DIR):
+        if not _NOMBRE_ARCHIVO.match(entrada.name):
+            continue
+        base = entrada.name.rsplit('.', 1)[0]
+        datos = entrada.stat()
+        perfil = perfiles.setdefault(base, {'base': base, 'archivos': [], 'tamano': 0, 'modificado': 0})
+        perfil['archivos'].append(entrada.name)
+        perfil['tamano'] += datos.st_size
+        perfil['modificado'] = max(perfil['modificado'], datos.st_mtime)
+    for perfil in perfiles.values():
+        perfil['archivos'].sort()
+        perfil['fecha'] = datetime.fromtimestamp(perfil['modificado'])
+    return sorted(perfiles.values(), key=lambda p: p['modificado'], reverse=True)
+
+
+def ruta_archivo(nombre):
+    """
+    Ruta de un archivo de perfil, o None si el nombre no es válido o no existe.
+    """
+    if not _NOMBRE_ARCHIVO.match(nombre):
+        return None
+    ruta = os.path.join(settings.PERFILES_DIR, nombre)
+    return ruta if os.path.isfile(ruta) else None
@@ -0,0 +1,225 @@
+from collections import defaultdict
+
+from django.conf import settings
+from django.db.models import CharField, Count, Value
+
+from . import expedientes, referencias, versiones
+from .models import Estudiante, DocumentoEstudiante
+
+
+# ====================================
+# ===== TABLA DINÁMICA ===============
+# ====================================
+#
+# Cruza dos dimensiones cualesquiera (especialidad, extensión, cohorte o estado del
+# documento) con totales por fila y por columna, y porcentajes opcionales.
+#
+# Todo sale de un "cubo": para cada combinación (especialidad, extensión, cohorte)
+# un vector con [estudiantes, documentos en 'Sí', 'No', 'Copia', 'Vencida', 'Vacío'].
+# El cubo se calcula con una sola consulta agregada (unos segundos con un millón de
+# documentos) y se guarda en la caché bajo la versión 'pivote', que cambia al
+# guardar o eliminar estudiantes o documentos (signals.py). Las escrituras masivas
+# deben llamar a invalidar(). Cada tabla se arma recorriendo el cubo una vez, que
+# tiene a lo sumo especialidades × extensiones × cohortes entradas.
+
+VERSION = 'pivote'
+
+ESTADOS = [estado for estado, _ in DocumentoEstudiante.ESTADOS_DOCUMENTO]
+MEDIDAS = ['estudiantes'] + ESTADOS
+
+# Dimensión -> (título, posición en la clave del cubo, tabla de referencias)
+DIMENSIONES = {
+    'especialidad': ("Especialidad", 0, 'especialidades'),
+    'extension': ("Extensión", 1, 'extensiones'),
+    'cohorte': ("Cohorte", 2, 'cohortes'),
+    'estado': ("Estado del documento", None, None),
+}
+
+# Medida -> (título, función que la obtiene del vector del cubo)
+VALORES = {
+    'estudiantes': ("Estudiantes", lambda vector: vector[0]),
+    'documentos': ("Documentos", lambda vector: sum(vector[1:])),
+    **{
+        estado: (f"Documentos en '{estado}'", lambda vector, i=i: vector[i])
+        for i, estado in enumerate(MEDIDAS) if i > 0
+    },
+}
+
+PORCENTAJES = {
+    '': "Sin porcentaje",
+    'fila': "% de la fila",
+    'columna': "% de la columna",
+    'total': "% del total",
+}
+
+
+# ===== Cubo =====
+
+def calcular_cubo():
+    claves = ('especialidad_id', 'extension_id', 'cohorte_id')
+    estudiantes = (
+        Estudiante.objects.order_by()
+        .annotate(medida=Value('', output_field=CharField()))
+        .values_list(*claves, 'medida')
+        .annotate(n=Count('pk'))
+    )
+    documentos = (
+        DocumentoEstudiante.objects.order_by()
+        .values_list(*(f'estudiante__{clave}' for clave in claves), 'estado_documento')
+        .annotate(n=Count('pk'))
+    )
+    posiciones = {'': 0, **{estado: i for i, estado in enumerate(MEDIDAS) if i > 0}}
+    cubo = {}
+    for especialidad, extension, cohorte, medida, n in estudiantes.union(documentos, all=True):
+        vector = cubo.setdefault((especialidad, extension, cohorte), [0] * len(MEDIDAS))
+        vector[posiciones[medida]] += n
+    return cubo
+
+
+def cubo():
+    clave = f'pivote:{versiones.version(VERSION)}'
+    return versiones.obtener_o_calcular(clave, calcular_cubo, settings.PIVOTE_CACHE_SEGUNDOS)
+
+
+def invalidar():
+    versiones.incrementar(VERSION)
+
+
+# ===== Tabla de dos dimensiones =====
+
+class Pivote:
+    def __init__(self, filas, columnas, medida, porcentaje):
+        self.dimension_filas = filas
+        self.dimension_columnas = columnas
+        self.medida = medida
+        self.porcentaje = porcentaje
+        self.celdas = defaultdict(int)
+        self.filas = []
+        self.columnas = []
+        self.totales_fila = {}
+        self.totales_columna = {}
+        self.total = 0
+
+    @property
+    def titulo(self):
+        titulo = f"{DIMENSIONES[self.dimension_filas][0]} × {DIMENSIONES[self.dimension_columnas][0]}"
+        if 'estado' not in (self.dimension_filas, self.dimension_columnas):
+            titulo += f" ({VALORES[self.medida][0]})"
+        return titulo
+
+    def _porcentaje(self, valor, fila, columna):
+        # fila o columna en None: celdas de los totales
+        if not self.porcentaje:
+            return None
+        if self.porcentaje == 'fila' and fila is not None:
+            base = self.totales_fila[fila]
+        elif self.porcentaje == 'columna' and columna is not None:
+            base = self.totales_columna[columna]
+        else:
+            base = self.total
+        return expedientes.porcentaje(valor, base)
+
+    def tabla(self):
+        """
+        Filas para la plantilla: etiqueta, celdas [(valor, porcentaje)] y total.
+        El porcentaje es None si no se pidió.
+        """
+        for fila, etiqueta in self.filas:
+            yield {
+                'etiqueta': etiqueta,
+                'celdas': [
+                    (self.celdas[fila, columna], self._porcentaje(self.celdas[fila, columna], fila, columna))
+                    for columna, _ in self.columnas
+                ],
+                'total': self.totales_fila[fila],
+                'porcentaje_total': self._porcentaje(self.totales_fila[fila], fila, None),
+            }
+
+    def pie(self):
+        """
+        Totales por columna y el total general, como [(valor, porcentaje)].
+        """
+        return [
+            (self.totales_columna[columna], self._porcentaje(self.totales_columna[columna], None, columna))
+            for columna, _ in self.columnas
+        ] + [(self.total, self._porcentaje(self.total, None, None))]
+
+    def encabezado(self):
+        primera = f"{DIMENSIONES[self.dimension_filas][0]} / {DIMENSIONES[self.dimension_columnas][0]}"
+        if self.porcentaje:
+            primera += f" ({PORCENTAJES[self.porcentaje]})"
+        return [primera] + [etiqueta for _, etiqueta in self.columnas] + ["Total"]
+
+    def filas_exportacion(self):
+        """
+        Filas para exportacion.py; con porcentaje, las celdas llevan el porcentaje.
+        """
+        def valor(par):
+            return par[1] if self.porcentaje else par[0]
+
+        for fila in self.tabla():
+            yield [fila['etiqueta']] + [valor(celda) for celda in fila['celdas']] + [
+                valor((fila['total'], fila['porcentaje_total']))
+            ]
+        yield ["Total"] + [valor(celda) for celda in self.pie()]
+
+
+def _etiquetas(dimension, claves):
+    """
+    [(clave, etiqueta)] en el orden de la dimensión: por nombre, o el de los estados.
+    """
+    if dimension == 'estado':
+        return [(estado, estado) for estado in ESTADOS]
+    tabla = DIMENSIONES[dimension][2]
+    _, campo = referencias.TABLAS[tabla]
+    ordenadas = [
+        (objeto.pk, getattr(objeto, campo)) for objeto in referencias.obtener(tabla) if objeto.pk in claves
+    ]
+    # Registros creados después de la última lectura de las referencias
+    conocidas = {pk for pk, _ in ordenadas}
+    return ordenadas + [(pk, f"#{pk}") for pk in sorted(claves - conocidas)]
+
+
+def pivotar(filas, columnas, medida='estudiantes', filtros=None, porcentaje=''):
+    """
+    Cruza las dimensiones 'filas' y 'columnas' (claves de DIMENSIONES, distintas).
+    Si ninguna es 'estado', cada celda es la 'medida' (clave de VALORES); si una es
+    'estado', cada celda cuenta documentos en ese estado. 'filtros' limita el cubo a
+    ciertos ids: {'cohorte': 3}.
+    """
+    if filas not in DIMENSIONES or columnas not in DIMENSIONES or filas == columnas:
+        raise ValueError(f"Dimensiones no válidas: {filas} × {columnas}")
+    if medida not in VALORES or porcentaje not in PORCENTAJES:
+        raise ValueError(f"Medida o porcentaje no válidos: {medida}, {porcentaje}")
+    filtros = [(DIMENSIONES[dimension][1], pk) for dimension, pk in (filtros or {}).items() if pk is not None]
+
+    pivote = Pivote(filas, columnas, medida, porcentaje)
+    posicion_fila = DIMENSIONES[filas][1]
+    posicion_columna = DIMENSIONES[columnas][1]
+    por_estado = 'estado' in (filas, columnas)
+    obtener_valor = VALORES[medida][1]
+
+    for clave, vector in cubo().items():
+        if any(clave[posicion] != pk for posicion, pk in filtros):
+            continue
+        if por_estado:
+            otra = clave[posicion_fila if columnas == 'estado' else posicion_columna]
+            for i, estado in enumerate(ESTADOS, start=1):
+                celda = (otra, estado) if columnas == 'estado' else (estado, otra)
+                pivote.celdas[celda] += vector[i]
+        else:
+            pivote.celdas[clave[posicion_fila], clave[posicion_columna]] += obtener_valor(vector)
+
+    claves_fila = {fila for fila, _ in pivote.celdas}
+    claves_columna = {columna for _, columna in pivote.celdas}
+    pivote.filas = _etiquetas(filas, claves_fila)
+    pivote.columnas = _etiquetas(columnas, claves_columna)
+    for (fila, columna), valor in pivote.celdas.items():
+        pivote.totales_fila[fila] = pivote.totales_fila.get(fila, 0) + valor
+        pivote.totales_columna[columna] = pivote.totales_columna.get(columna, 0) + valor
+        pivote.total += valor
+    for fila, _ in pivote.filas:
+        pivote.totales_fila.setdefault(fila, 0)
+    for columna, _ in pivote.columnas:
+        pivote.totales_columna.setdefault(columna, 0)
+    return pivote
@@ -0,0 +1,94 @@
+import threading
+
+from . import versiones
+from .models import Especialidad, Cohorte, Extension
+
+
+# ====================================
+# ===== DATOS DE REFERENCIA ==========
+# ====================================
+#
+# Especialidades, cohortes y extensiones cambian pocas veces al año pero se leen en
+# cada formulario y listado. Cada proceso las guarda en memoria asociadas a la
+# versión 'referencias' de la caché compartida (ver versiones.py); al guardar o
+# eliminar uno de estos registros la versión cambia (signals.py) y todos los
+# procesos vuelven a leerlas en su siguiente uso.
+#
+# Los objetos guardados se comparten entre peticiones: solo se deben leer.
+# La versión debe estar en una caché que vean todos los procesos (CACHE_BACKEND=archivo,
+# el valor por defecto); con CACHE_BACKEND=memoria cada proceso tiene la suya.
+# Un id que no está en memoria se busca en la base de datos (ReferenciaChoiceField).
+
+VERSION = 'referencias'
+
+TABLAS = {
+    'especialidades': (Especialidad, 'nombre_especialidad'),
+    'cohortes': (Cohorte, 'nombre_cohorte'),
+    'extensiones': (Extension, 'nombre_extension'),
+}
+
+_bloqueo = threading.Lock()
+_memoria = {'version': None, 'tablas': {}}
+_contadores = {'aciertos': 0, 'fallos': 0, 'recargas': 0}
+
+
+def _tablas_vigentes():
+    version = versiones.version(VERSION)
+    with _bloqueo:
+        if _memoria['version'] != version:
+            _memoria['version'] = version
+            _memoria['tablas'] = {}
+            _contadores['recargas'] += 1
+        return _memoria['tablas']
+
+
+def _datos(tabla):
+    tablas = _tablas_vigentes()
+    datos = tablas.get(tabla)
+    if datos is not None:
+        with _bloqueo:
+            _contadores['aciertos'] += 1
+        return datos
+
+    modelo, orden = TABLAS[tabla]
+    lista = tuple(modelo.objects.order_by(orden, 'pk'))
+    datos = {'lista': lista, 'por_id': {objeto.pk: objeto for objeto in lista}}
+    with _bloqueo:
+        _contadores['fallos'] += 1
+        # Si la versión cambió mientras se leía, esto queda en el diccionario de la
+        # versión anterior, que ya no se usa.
+        tablas[tabla] = datos
+    return datos
+
+
+def obtener(tabla):
+    """
+    Tupla con los objetos de la tabla indicada ('especialidades', 'cohortes' o
+    'extensiones') ordenados por nombre.
+    """
+    return _datos(tabla)['lista']
+
+
+def por_id(tabla, pk):
+    """
+    Objeto de la tabla con ese id, o None si no está.
+    """
+    return _datos(tabla)['por_id'].get(pk)
+
+
+def invalidar():
+    versiones.incrementar(VERSION)
+
+
+def estadisticas():
+    """
+    Contadores de este proceso: aciertos, fallos, recargas (cambios de versión
+    detectados) y las tablas que hay en memoria.
+    """
+    with _bloqueo:
+        datos = dict(_contadores)
+        datos['version'] = _memoria['version']
+        datos['tablas'] = sorted(_memoria['tablas'])
+    total = datos['aciertos'] + datos['fallos']
+    datos['porcentaje_aciertos'] = round(datos['aciertos'] / total * 100, 2) if total else 0
+    return datos
@@ -0,0 +1,70 @@
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_save, post_delete, pre_delete
+from django.dispatch import receiver
+
+from . import condicional, matricula, metricas, pivote, referencias, tablero
+from .models import Estudiante, DocumentoEstudiante, Cohorte, Especialidad, Extension, Usuario
+
+
+# ===== Matrícula por grupo =====
+# Se ejecutan dentro de la transacción del save()/delete() que los dispara. La baja
+# se descuenta antes de borrar, mientras aún se pueden leer los campos diferidos.
+@receiver(post_save, sender=Estudiante)
+def sumar_matricula(sender, instance, created, **kwargs):
+    matricula.estudiante_guardado(instance, created)
+
+
+@receiver(pre_delete, sender=Estudiante)
+def restar_matricula(sender, instance, **kwargs):
+    matricula.estudiante_eliminado(instance)
+
+
+# ===== Gráficos del inicio =====
+@receiver([post_save, post_delete], sender=Estudiante)
+@receiver([post_save, post_delete], sender=Cohorte)
+@receiver([post_save, post_delete], sender=Especialidad)
+def invalidar_tablero(sender, **kwargs):
+    tablero.invalidar()
+
+
+# ===== Tabla dinámica =====
+@receiver([post_save, post_delete], sender=Estudiante)
+@receiver([post_save, post_delete], sender=DocumentoEstudiante)
+def invalidar_pivote(sender, **kwargs):
+    pivote.invalidar()
+
+
+# ===== Datos de referencia =====
+@receiver([post_save, post_delete], sender=Cohorte)
+@receiver([post_save, post_delete], sender=Especialidad)
+@receiver([post_save, post_delete], sender=Extension)
+def invalidar_referencias(sender, **kwargs):
+    referencias.invalidar()
+
+
+# ===== Versiones de datos por tabla (respuestas condicionales) =====
+TABLAS_CONDICIONALES = {
+    Estudiante: 'estudiantes',
+    DocumentoEstudiante: 'documentos',
+    Cohorte: 'cohortes',
+    Especialidad: 'especialidades',
+    Extension: 'extensiones',
+    Usuario: 'usuarios',
+}
+
+
+@receiver([post_save, post_delete], sender=Estudiante)
+@receiver([post_save, post_delete], sender=DocumentoEstudiante)
+@receiver([post_save, post_delete], sender=Cohorte)
+@receiver([post_save, post_delete], sender=Especialidad)
+@receiver([post_save, post_delete], sender=Extension)
+@receiver([post_save, post_delete], sender=Usuario)
+def cambiar_version_tabla(sender, **kwargs):
+    condicional.cambiaron(TABLAS_CONDICIONALES[sender])
+
+
+# ===== Conexiones a la base de datos =====
+# Los PRAGMA de OPTIONS['init_command'] ya se ejecutaron: no se cuentan como consultas
+@receiver(connection_created)
+def medir_conexion(sender, connection, **kwargs):
+    metricas.instalar(connection)
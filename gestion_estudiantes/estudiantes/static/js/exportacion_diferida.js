@@ -0,0 +1,49 @@
+// ===== Exportación diferida =====
+// pdfmake (con sus fuentes, ~1 MB) y jszip solo se descargan la primera vez que se
+// pulsa "Exportar a PDF" o "Exportar a Excel". Se incluye después de los scripts de
+// DataTables Buttons, con las URL de las librerías en atributos data-*.
+(function () {
+    var urls = document.currentScript.dataset;
+    var cargas = {};
+
+    function cargarScript(url) {
+        if (!cargas[url]) {
+            cargas[url] = new Promise(function (resolver, rechazar) {
+                var script = document.createElement('script');
+                script.src = url;
+                script.onload = resolver;
+                script.onerror = function () {
+                    delete cargas[url];
+                    rechazar(new Error('No se pudo cargar ' + url));
+                };
+                document.head.appendChild(script);
+            });
+        }
+        return cargas[url];
+    }
+
+    function cargarEnOrden(lista) {
+        return lista.reduce(function (anterior, url) {
+            return anterior.then(function () { return cargarScript(url); });
+        }, Promise.resolve());
+    }
+
+    // El botón se muestra aunque la librería aún no esté cargada y la carga al pulsarlo
+    function diferir(nombre, lista) {
+        var boton = DataTable.ext.buttons[nombre];
+        var accion = boton.action;
+        boton.available = function () { return window.FileReader !== undefined; };
+        boton.action = function () {
+            var contexto = this;
+            var argumentos = arguments;
+            cargarEnOrden(lista).then(function () {
+                accion.apply(contexto, argumentos);
+            }, function (error) {
+                alert(error.message);
+            });
+        };
+    }
+
+    diferir('pdfHtml5', [urls.pdfmake, urls.vfsFonts]);
+    diferir('excelHtml5', [urls.jszip]);
+})();
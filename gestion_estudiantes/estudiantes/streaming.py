@@ -0,0 +1,55 @@
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from django.template.loader import render_to_string
+from django.utils.html import format_html_join
+from django.utils.safestring import mark_safe
+
+from . import asincrono
+from .exportacion import en_bloques
+
+
+# ====================================
+# ===== PÁGINAS HTML EN STREAMING ====
+# ====================================
+#
+# Para las tablas que se muestran completas (todos los estudiantes, el detalle de los
+# expedientes incompletos). La página se renderiza una vez con una marca en el lugar
+# de las filas ({{ filas }} dentro del <tbody>) y se parte en dos: lo de antes (el
+# diseño de home.html, los estilos y el encabezado de la tabla) se envía enseguida;
+# después van las filas en bloques de FILAS_POR_ENVIO a medida que se leen de la base
+# de datos, y al final el resto de la página. Las filas deben venir de un iterador
+# (queryset.values_list(...).iterator()), así la memoria no depende de su cantidad.
+#
+# Cada fila se arma con format_html_join y un formato fijo ('<tr><td>{}</td>...'):
+# renderizar miles de filas con una plantilla de Django es unas cinco veces más lento.
+#
+# Con ASGI el contenido se entrega como iterador async (asincrono.iterar); con un
+# iterador síncrono Django lo leería completo antes de enviar el primer byte.
+
+MARCA = '<!-- filas -->'
+
+
+def _partes(antes, despues, fila, filas):
+    yield antes
+    for bloque in en_bloques(filas):
+        yield format_html_join('', fila, bloque)
+    yield despues
+
+
+def respuesta_html(request, plantilla, contexto, fila, filas):
+    """
+    StreamingHttpResponse con 'plantilla', que debe tener {{ filas }} donde van las
+    filas. Cada fila (una tupla) se escribe con el formato 'fila' de format_html_join.
+    """
+    pagina = render_to_string(plantilla, {**contexto, 'filas': mark_safe(MARCA)}, request)
+    antes, marca, despues = pagina.partition(MARCA)
+    if not marca:
+        raise ValueError(f"La plantilla {plantilla} no muestra {{{{ filas }}}}.")
+
+    partes = _partes(antes, despues, fila, filas)
+    if isinstance(request, ASGIRequest):
+        partes = asincrono.iterar(partes)
+    respuesta = StreamingHttpResponse(partes, content_type='text/html; charset=utf-8')
+    # Que nginx no junte la respuesta antes de enviarla
+    respuesta['X-Accel-Buffering'] = 'no'
+    return respuesta
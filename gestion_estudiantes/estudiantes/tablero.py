@@ -0,0 +1,56 @@
+from django.conf import settings
+
+from . import asincrono, matricula, versiones
+
+
+# ====================================
+# ===== GRÁFICOS DEL INICIO ==========
+# ====================================
+#
+# Los conteos de home() se guardan en la caché asociados a la versión 'tablero',
+# que cambia cuando se guarda o elimina un Estudiante, Cohorte o Especialidad
+# (ver signals.py). Tras un cambio, solo un proceso recalcula (ver
+# versiones.obtener_o_calcular).
+
+VERSION = 'tablero'
+
+
+# Estudiantes por cohorte y por especialidad, desde las tablas de resumen (matricula.py)
+def _por_cohorte():
+    return list(matricula.por_cohorte().order_by('cohorte__nombre_cohorte'))
+
+
+def _por_especialidad():
+    return list(matricula.por_especialidad())
+
+
+def _armar(cohorte_data, especialidad_data):
+    return {
+        'cohorte_labels': [item['cohorte__nombre_cohorte'] for item in cohorte_data],
+        'cohorte_counts': [item['total'] for item in cohorte_data],
+        'especialidad_labels': [item['especialidad__nombre_especialidad'] for item in especialidad_data],
+        'especialidad_counts': [item['total'] for item in especialidad_data],
+    }
+
+
+def calcular_datos_tablero():
+    return _armar(_por_cohorte(), _por_especialidad())
+
+
+async def acalcular_datos_tablero():
+    # Las dos consultas a la vez (ver asincrono.py)
+    return _armar(*await asincrono.en_paralelo(_por_cohorte, _por_especialidad))
+
+
+def datos_tablero():
+    clave = f'tablero:{versiones.version(VERSION)}'
+    return versiones.obtener_o_calcular(clave, calcular_datos_tablero, settings.TABLERO_CACHE_SEGUNDOS)
+
+
+async def adatos_tablero():
+    clave = f'tablero:{await versiones.aversion(VERSION)}'
+    return await versiones.aobtener_o_calcular(clave, acalcular_datos_tablero, settings.TABLERO_CACHE_SEGUNDOS)
+
+
+def invalidar():
+    versiones.incrementar(VERSION)
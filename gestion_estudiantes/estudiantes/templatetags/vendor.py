@@ -0,0 +1,13 @@
+from django import template
+
+from .. import estaticos
+
+register = template.Library()
+
+
+@register.simple_tag
+def vendor(ruta):
+    """
+    {% vendor 'jquery/3.7.0/jquery.min.js' %}: URL de una librería de estaticos.LIBRERIAS.
+    """
+    return estaticos.url_libreria(ruta)
@@ -1,3 +1,1538 @@
-from django.test import TestCase
+import csv
+import gzip
+import hashlib
+import io
+import json
+import os
+import pstats
+import re
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+from importlib import import_module
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, transaction
+from django.test import AsyncClient, Client, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import (
+    asincrono, auditoria, busqueda, documentos, estaticos, expedientes, exportacion, importacion, matricula, perfiles, pivote,
+    referencias, tablero, trabajos, versiones,
+)
+from .management.commands._benchmark import rutas_estudiantes
+from .management.commands.descargar_estaticos import VERSIONES
+from .forms import EstudianteForm
+from .models import (
+    Estudiante, DocumentoEstudiante, Especialidad, Cohorte, Extension, MatriculaCohorte, RegistroAuditoria,
+    Trabajo, Usuario,
+)
+
+
+ESTADOS = [estado for estado, _ in DocumentoEstudiante.ESTADOS_DOCUMENTO]
+TIPOS = [tipo for tipo, _ in DocumentoEstudiante.TIPOS_DOCUMENTO]
+
+
+def crear_referencias():
+    extensiones = [Extension.objects.create(nombre_extension=f"Extensión {i}", direccion_extension="Centro")
+                   for i in range(2)]
+    especialidades = [Especialidad.objects.create(nombre_especialidad=f"Especialidad {i}") for i in range(2)]
+    cohortes = [Cohorte.objects.create(nombre_cohorte=f"Cohorte {i}", mes="Enero", anio=str(2020 + i))
+                for i in range(2)]
+    return extensiones, especialidades, cohortes
+
+
+def crear_estudiantes(cantidad, desde, extensiones, especialidades, cohortes):
+    """
+    Crea estudiantes con sus seis documentos en estados variados, como la importación masiva.
+    """
+    estudiantes = Estudiante.objects.bulk_create([
+        Estudiante(
+            cedula=str(10000000 + n),
+            nombres="Ana María",
+            apellidos=f"Pérez {n}",
+            extension=extensiones[n % len(extensiones)],
+            especialidad=especialidades[n % len(especialidades)],
+            cohorte=cohortes[n % len(cohortes)],
+        )
+        for n in range(desde, desde + cantidad)
+    ])
+    DocumentoEstudiante.objects.bulk_create([
+        DocumentoEstudiante(estudiante=estudiante, tipo_documento=tipo,
+                            estado_documento=ESTADOS[(estudiante.pk + i) % len(ESTADOS)])
+        for estudiante in estudiantes
+        for i, tipo in enumerate(TIPOS)
+    ])
+    expedientes.recalcular_resumen([estudiante.pk for estudiante in estudiantes])
+    matricula.aplicar(matricula.deltas_altas(estudiantes))
+    return estudiantes
+
+
+class ConEstudiantesMixin:
+    """
+    Referencias, ESTUDIANTES estudiantes y, si hay ROL, un usuario con la sesión
+    iniciada en self.client.
+    """
+    ESTUDIANTES = 4
+    ROL = "Administrador"
+
+    def setUp(self):
+        cache.clear()
+        self.extensiones, self.especialidades, self.cohortes = crear_referencias()
+        self.estudiantes = crear_estudiantes(self.ESTUDIANTES, 0, self.extensiones, self.especialidades, self.cohortes)
+        if self.ROL:
+            self.usuario = Usuario.objects.create(nombre_usuario=self.ROL.lower(), contrasena="-", rol=self.ROL)
+            self.iniciar_sesion(self.ROL)
+
+    def iniciar_sesion(self, rol, cliente=None):
+        sesion = (cliente or self.client).session
+        sesion['usuario_id'] = self.usuario.pk
+        sesion['usuario_nombre'] = self.usuario.nombre_usuario
+        sesion['usuario_rol'] = rol
+        sesion.save()
+
+
+class CacheCompartidaMixin:
+    """
+    Caché en archivos de una carpeta temporal, compartida con en_otro_proceso(), como
+    la de varios procesos del servidor (CACHE_BACKEND=archivo).
+    """
+    def setUp(self):
+        self.carpeta_cache = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.carpeta_cache, ignore_errors=True)
+        ajustes = override_settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': self.carpeta_cache,
+        }})
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        super().setUp()
+
+    def en_otro_proceso(self, codigo):
+        """
+        Ejecuta 'codigo' en otro proceso de Python con esta caché. No usa la base de
+        datos de las pruebas.
+        """
+        entorno = {**os.environ, 'DJANGO_SETTINGS_MODULE': 'gestion_estudiantes.settings',
+                   'CACHE_BACKEND': 'archivo', 'CACHE_DIR': self.carpeta_cache}
+        subprocess.run([sys.executable, '-c', f"import django\ndjango.setup()\n{codigo}"],
+                       cwd=settings.BASE_DIR, env=entorno, check=True)
+
+
+# ===== Presupuesto de consultas por vista =====
+# Máximo de consultas SQL de cada ruta (GET como administrador, caché vacía). Incluye
+# la sesión. Una ruta nueva en urls.py debe agregarse aquí. Las consultas de las vistas
+# async se cuentan en la conexión del hilo principal: sin CONSULTAS_CONCURRENTES.
+
+PRESUPUESTO_CONSULTAS = {
+    'login_usuario': 0,
+    'logout_usuario': 2,
+    'home': 3,
+    'listar_estudiantes': 4,
+    'listar_estudiantes_datos': 2,
+    'listar_estudiantes_todos': 2,
+    'buscar_estudiantes': 1,
+    'registrar_estudiante': 4,
+    'operaciones_documentos': 4,
+    'operaciones_documentos_api': 1,
+    'importar_estudiantes': 1,
+    'editar_estudiante': 8,
+    'detalle_estudiante': 6,
+    'eliminar_estudiante': 2,
+    'listar_extensiones': 2,
+    'registrar_extension': 1,
+    'editar_extension': 2,
+    'eliminar_extension': 2,
+    'listar_usuarios': 2,
+    'crear_usuario': 1,
+    'editar_usuario': 2,
+    'eliminar_usuario': 2,
+    'listar_cohortes': 2,
+    'registrar_cohorte': 1,
+    'editar_cohorte': 2,
+    'eliminar_cohorte': 2,
+    'listar_especialidades': 2,
+    'registrar_especialidad': 1,
+    'editar_especialidad': 2,
+    'eliminar_especialidad': 2,
+    'reporte_matricula_cohorte': 2,
+    'reporte_expedientes_completos': 2,
+    'reporte_expedientes_incompletos': 3,
+    'comparativa_especialidad': 2,
+    'comparativa_extension': 2,
+    'panel_reportes': 5,
+    'reporte_pivote': 5,
+    'exportar_pivote': 4,
+    'exportar': 2,
+    'estado_referencias': 1,
+    'listar_perfiles': 1,
+    'descargar_perfil': 1,
+    'listar_trabajos': 5,
+    'crear_trabajo': 1,
+    'estado_trabajo': 2,
+    'descargar_trabajo': 2,
+    'listar_auditoria': 3,
+    'api_estudiantes': 3,
+    'api_cambios': 3,
+    'api_cohortes': 2,
+    'api_especialidades': 2,
+    'api_extensiones': 2,
+}
+
+
+@override_settings(CONSULTAS_CONCURRENTES=False)
+class PresupuestoConsultasTests(ConEstudiantesMixin, TestCase):
+    ESTUDIANTES = 5
+
+    def setUp(self):
+        super().setUp()
+        self.ids = {
+            'estudiante': self.estudiantes[0].pk,
+            'usuario': self.usuario.pk,
+            'extension': self.extensiones[0].pk,
+            'especialidad': self.especialidades[0].pk,
+            'cohorte': self.cohortes[0].pk,
+        }
+        # Datos que cada proceso calcula una sola vez
+        busqueda.fts_disponible()
+
+    def cliente_con_sesion(self):
+        cliente = Client()
+        self.iniciar_sesion(self.ROL, cliente)
+        return cliente
+
+    def contar_consultas(self):
+        """
+        Consultas de cada ruta: {nombre: (consultas, código de estado)}.
+        """
+        resultado = {}
+        for nombre, url in rutas_estudiantes(self.ids):
+            cliente = self.cliente_con_sesion()
+            cache.clear()
+            with CaptureQueriesContext(connection) as consultas:
+                respuesta = cliente.get(url)
+                if respuesta.streaming:
+                    b''.join(respuesta.streaming_content)
+            resultado[nombre] = (len(consultas), respuesta.status_code)
+        return resultado
+
+    def test_todas_las_rutas_tienen_presupuesto(self):
+        nombres = {nombre for nombre, _ in rutas_estudiantes(self.ids)}
+        self.assertEqual(nombres - set(PRESUPUESTO_CONSULTAS), set())
+
+    def test_vistas_dentro_del_presupuesto(self):
+        for nombre, (consultas, estado) in self.contar_consultas().items():
+            with self.subTest(ruta=nombre):
+                self.assertLess(estado, 500)
+                self.assertLessEqual(consultas, PRESUPUESTO_CONSULTAS.get(nombre, 0))
+
+    def test_consultas_no_crecen_con_los_estudiantes(self):
+        antes = self.contar_consultas()
+        crear_estudiantes(self.ESTUDIANTES, self.ESTUDIANTES, self.extensiones, self.especialidades, self.cohortes)
+        despues = self.contar_consultas()
+        for nombre in antes:
+            with self.subTest(ruta=nombre):
+                self.assertEqual(despues[nombre][0], antes[nombre][0])
+
+
+def expediente_recorriendo(estudiante):
+    """
+    Clasificación como la hacían los reportes antes: estudiante por estudiante.
+    """
+    estados = [d.estado_documento for d in DocumentoEstudiante.objects.filter(estudiante=estudiante)]
+    if estados and any(estado in ['No', 'Vencida'] for estado in estados):
+        return expedientes.INCOMPLETO
+    if estados and all(estado == 'Sí' for estado in estados):
+        return expedientes.COMPLETO
+    return expedientes.PENDIENTE if estados else expedientes.SIN_DOCUMENTOS
+
+
+@override_settings(CONSULTAS_CONCURRENTES=False)
+class ExpedientesTests(ConEstudiantesMixin, TestCase):
+    # Estados de los documentos de cada estudiante
+    CASOS = [
+        ["Sí"] * 6,
+        ["Sí", "Sí", "No"],
+        ["Sí", "Vencida"],
+        ["Sí", "Copia", "Vacío"],
+        ["Vacío"] * 6,
+        [],
+        ["Copia", "Vencida", "No"],
+        ["Sí"],
+    ]
+    ESTUDIANTES = len(CASOS)
+
+    def setUp(self):
+        super().setUp()
+        DocumentoEstudiante.objects.all().delete()
+        DocumentoEstudiante.objects.bulk_create([
+            DocumentoEstudiante(estudiante=estudiante, tipo_documento=TIPOS[i], estado_documento=estado)
+            for estudiante, estados in zip(self.estudiantes, self.CASOS)
+            for i, estado in enumerate(estados)
+        ])
+        # Un resumen guardado que no coincide con los documentos
+        Estudiante.objects.update(estado_expediente=expedientes.COMPLETO, documentos_entregados=0)
+
+    def esperados(self):
+        return {e.pk: expediente_recorriendo(e) for e in Estudiante.objects.all()}
+
+    def guardados(self):
+        return dict(Estudiante.objects.values_list('pk', 'estado_expediente'))
+
+    def test_sql_igual_al_recorrido(self):
+        esperados = self.esperados()
+        self.assertEqual(set(esperados.values()), {clave for clave, _ in expedientes.EXPEDIENTES})
+        self.assertEqual(dict(expedientes.anotar_expediente().values_list('pk', 'expediente')), esperados)
+        self.assertEqual(expedientes.recalcular_resumen(), self.ESTUDIANTES)
+        self.assertEqual(self.guardados(), esperados)
+        entregados = dict(Estudiante.objects.values_list('pk', 'documentos_entregados'))
+        self.assertEqual(entregados, {e.pk: estados.count("Sí") for e, estados in zip(self.estudiantes, self.CASOS)})
+        resumen = expedientes.resumen_expedientes()
+        self.assertEqual(resumen['total'], self.ESTUDIANTES)
+        for clave, _ in expedientes.EXPEDIENTES:
+            self.assertEqual(resumen[clave], list(esperados.values()).count(clave))
+        # resumir_estados (lo que usan guardar() y la importación) da lo mismo en memoria
+        for estudiante, estados in zip(self.estudiantes, self.CASOS):
+            self.assertEqual(expedientes.resumir_estados(estados)['estado_expediente'], esperados[estudiante.pk])
+
+    def test_por_lotes_de_ids(self):
+        # Un hueco en los ids: ese rango queda con un solo estudiante
+        self.estudiantes[3].delete()
+        llamadas = []
+        actualizados = expedientes.recalcular_por_lotes(lote=3, avance=lambda hecho, total: llamadas.append((hecho, total)))
+        self.assertEqual(actualizados, self.ESTUDIANTES - 1)
+        self.assertEqual(self.guardados(), self.esperados())
+        total = self.estudiantes[-1].pk - self.estudiantes[0].pk + 1
+        self.assertEqual(llamadas, [(3, total), (6, total), (total, total)])
+
+    def test_inicio_se_recalcula_al_editar(self):
+        respuesta = self.client.get(reverse('home'))
+        self.assertEqual(respuesta.context['cohorte_counts'], [4, 4])
+        version = versiones.version(tablero.VERSION)
+        estudiante = self.estudiantes[0]
+        datos = {
+            'cedula': estudiante.cedula, 'nombres': "Ana", 'apellidos': "Pérez",
+            'extension': self.extensiones[0].pk, 'especialidad': self.especialidades[0].pk,
+            'cohorte': self.cohortes[0].pk, **{tipo: "No" for tipo in TIPOS},
+        }
+        # Solo cambian documentos: el estudiante se guarda y la versión del inicio cambia
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('editar_estudiante', args=[estudiante.pk]), datos)
+        self.assertEqual(Estudiante.objects.get(pk=estudiante.pk).estado_expediente, expedientes.INCOMPLETO)
+        self.assertNotEqual(versiones.version(tablero.VERSION), version)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('editar_estudiante', args=[estudiante.pk]), {**datos, 'cohorte': self.cohortes[1].pk})
+        self.assertEqual(self.client.get(reverse('home')).context['cohorte_counts'], [3, 5])
+
+
+class ReferenciasTests(CacheCompartidaMixin, ConEstudiantesMixin, TestCase):
+    ESTUDIANTES = 0
+
+    def datos(self, cohorte):
+        return {
+            'cedula': '20000000', 'nombres': 'Luis', 'apellidos': 'Rojas',
+            'extension': self.extensiones[0].pk, 'especialidad': self.especialidades[0].pk, 'cohorte': cohorte,
+        }
+
+    def test_borrada_en_otro_proceso(self):
+        cohorte = self.cohortes[1]
+        self.assertIn(cohorte, referencias.obtener('cohortes'))
+        # Otro proceso la elimina: la fila desaparece sin pasar por las señales de este
+        # proceso, y ese proceso cambia la versión en la caché compartida
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {Cohorte._meta.db_table} WHERE id = %s', [cohorte.pk])
+        self.en_otro_proceso("from estudiantes import referencias\nreferencias.invalidar()")
+
+        formulario = EstudianteForm(self.datos(cohorte.pk))
+        self.assertFalse(formulario.is_valid())
+        self.assertIn('cohorte', formulario.errors)
+        self.assertEqual(list(referencias.obtener('cohortes')), [self.cohortes[0]])
+
+    def test_id_que_no_esta_en_memoria(self):
+        referencias.obtener('cohortes')
+        # bulk_create no envía señales: la versión no cambia
+        nueva, = Cohorte.objects.bulk_create([Cohorte(nombre_cohorte="Cohorte 9", mes="Enero", anio="2029")])
+        self.assertIsNone(referencias.por_id('cohortes', nueva.pk))
+        formulario = EstudianteForm(self.datos(nueva.pk))
+        self.assertTrue(formulario.is_valid(), formulario.errors)
+        self.assertEqual(formulario.cleaned_data['cohorte'], nueva)
+        for valor in (nueva.pk + 100, 'abc'):
+            with self.subTest(valor=valor):
+                self.assertIn('cohorte', EstudianteForm(self.datos(valor)).errors)
+
+
+class ListaEstudiantesTests(ConEstudiantesMixin, TestCase):
+    ESTUDIANTES = 7
+
+    def pagina(self, orden='apellidos', direccion='asc', cursor=None, **parametros):
+        columnas = ['cedula', 'nombres', 'apellidos']
+        consulta = {
+            'draw': 1, 'start': 0, 'length': 3,
+            **{f'columns[{i}][data]': columna for i, columna in enumerate(columnas)},
+            'order[0][column]': columnas.index(orden), 'order[0][dir]': direccion, **parametros,
+        }
+        if cursor:
+            consulta['cursor'] = cursor
+        respuesta = self.client.get(reverse('listar_estudiantes_datos'), consulta)
+        self.assertEqual(respuesta.status_code, 200)
+        return respuesta.json()
+
+    def recorrer(self, **parametros):
+        """
+        Sigue los cursores hasta la última página; devuelve los ids en orden.
+        """
+        ids, cursor = [], None
+        for _ in range(self.ESTUDIANTES + 1):
+            datos = self.pagina(cursor=cursor, **parametros)
+            ids += [fila['id'] for fila in datos['data']]
+            cursor = datos['cursor']
+            if cursor is None:
+                return ids
+        self.fail("La paginación no termina")
+
+    def test_cursor_recorre_todas_las_paginas(self):
+        # Apellidos repetidos: el id desempata y ninguna fila se pierde ni se repite
+        Estudiante.objects.filter(pk__in=[e.pk for e in self.estudiantes[:4]]).update(apellidos="Rojas")
+        for direccion in ('asc', 'desc'):
+            with self.subTest(direccion=direccion):
+                esperados = list(Estudiante.objects.order_by(
+                    *(f'-{c}' if direccion == 'desc' else c for c in ('apellidos', 'nombres', 'id'))
+                ).values_list('pk', flat=True))
+                self.assertEqual(self.recorrer(direccion=direccion), esperados)
+
+    def test_ultima_pagina_y_filtros(self):
+        datos = self.pagina(orden='cedula', cohorte=self.cohortes[0].pk)
+        # Los de la cohorte 0: 0, 2, 4 y 6
+        self.assertEqual([f['cedula'] for f in datos['data']], [e.cedula for e in self.estudiantes[0:6:2]])
+        self.assertEqual(datos['recordsFiltered'], 4)
+        datos = self.pagina(orden='cedula', cursor=datos['cursor'], cohorte=self.cohortes[0].pk)
+        self.assertEqual([f['cedula'] for f in datos['data']], [self.estudiantes[6].cedula])
+        self.assertIsNone(datos['cursor'])
+        # Un cursor no válido vuelve a la primera página
+        datos = self.pagina(orden='cedula', cursor='no-es-un-cursor')
+        self.assertEqual([f['cedula'] for f in datos['data']], [e.cedula for e in self.estudiantes[:3]])
+
+    def test_textos_se_muestran_sin_interpretar_html(self):
+        # El JSON lleva los textos tal cual; DataTables debe escaparlos al dibujar la tabla
+        Estudiante.objects.filter(pk=self.estudiantes[0].pk).update(nombres="<b>Ana</b>")
+        self.assertEqual(self.pagina(orden='cedula')['data'][0]['nombres'], "<b>Ana</b>")
+        pagina = self.client.get(reverse('listar_estudiantes')).content.decode()
+        for columna in ('cedula', 'nombres', 'apellidos'):
+            self.assertIn(f"{{ data: '{columna}', render: $.fn.dataTable.render.text() }}", pagina)
+
+
+class BusquedaTests(ConEstudiantesMixin, TestCase):
+    ESTUDIANTES = 3
+    ROL = None
+
+    def setUp(self):
+        super().setUp()
+        if not busqueda.fts_disponible():
+            self.skipTest("SQLite sin FTS5")
+        Estudiante.objects.filter(pk=self.estudiantes[0].pk).update(nombres="José Ángel", apellidos="Núñez Peña")
+
+    def ids(self, termino):
+        return [fila['id'] for fila in busqueda.buscar(termino)]
+
+    def test_disparadores_mantienen_el_indice(self):
+        primero = self.estudiantes[0]
+        # UPDATE masivo (update) y el de save()
+        self.assertEqual(self.ids("nunez"), [primero.pk])
+        primero.refresh_from_db()
+        primero.apellidos = "Rojas"
+        primero.save()
+        self.assertEqual(self.ids("nunez"), [])
+        self.assertEqual(self.ids("rojas"), [primero.pk])
+        # INSERT
+        nuevo = Estudiante.objects.create(
+            cedula="99999999", nombres="Luis", apellidos="Zambrano", extension=self.extensiones[0],
+            especialidad=self.especialidades[0], cohorte=self.cohortes[0],
+        )
+        self.assertEqual(self.ids("zambrano"), [nuevo.pk])
+        # DELETE
+        nuevo.delete()
+        self.assertEqual(self.ids("zambrano"), [])
+
+    def test_sin_acentos_ni_mayusculas_y_por_prefijo(self):
+        primero = self.estudiantes[0].pk
+        for termino in ("jose angel", "JOSÉ", "Nú pe", "angel nun"):
+            with self.subTest(termino=termino):
+                self.assertEqual(self.ids(termino), [primero])
+        # Todas las palabras deben coincidir; la cédula también por prefijo
+        self.assertEqual(self.ids("jose perez"), [])
+        self.assertEqual(self.ids(self.estudiantes[1].cedula[:6]), [e.pk for e in self.estudiantes])
+        # Las comillas y operadores no se interpretan como sintaxis de FTS5
+        self.assertEqual(self.ids('jose" (*'), [primero])
+
+    def test_filtrar_conserva_el_orden(self):
+        queryset = Estudiante.objects.order_by('-cedula')
+        self.assertEqual(list(busqueda.filtrar(queryset, "ana perez")), self.estudiantes[:0:-1])
+        self.assertEqual(list(busqueda.filtrar(queryset, "   ")), list(queryset))
+
+    def test_insercion_masiva_quita_y_repone_el_disparador(self):
+        def disparador():
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = %s",
+                               [busqueda.DISPARADOR_INSERTAR])
+                return cursor.fetchone() is not None
+
+        with transaction.atomic(), busqueda.insercion_masiva():
+            self.assertFalse(disparador())
+            nuevos = crear_estudiantes(2, 10, self.extensiones, self.especialidades, self.cohortes)
+            Estudiante.objects.filter(pk=nuevos[0].pk).update(apellidos="Zambrano")
+        self.assertTrue(disparador())
+        self.assertEqual(self.ids("zambrano"), [nuevos[0].pk])
+        self.assertEqual(self.ids("perez 11"), [nuevos[1].pk])
+        # Fuera de una transacción no se puede quitar el disparador
+        with mock.patch.object(connection, 'in_atomic_block', False):
+            with self.assertRaises(transaction.TransactionManagementError):
+                with busqueda.insercion_masiva():
+                    pass
+
+    def test_like_sin_fts5_usa_los_indices_de_prefijo(self):
+        with mock.patch.object(busqueda, 'fts_disponible', return_value=False):
+            self.assertEqual(self.ids("núñez jos"), [self.estudiantes[0].pk])
+            self.assertEqual(self.ids("ANA"), [e.pk for e in self.estudiantes[1:]])
+            queryset = busqueda.filtrar(Estudiante.objects.all(), "rojas")
+        # Los índices de la migración 0012 (en SQLite solo se crean si no hay FTS5)
+        for nombre, expresion in import_module('estudiantes.migrations.0012_indices_prefijo').INDICES['sqlite']:
+            with connection.cursor() as cursor:
+                cursor.execute(f"CREATE INDEX {nombre} ON estudiantes_estudiante ({expresion})")
+        plan = queryset.explain()
+        for nombre in ('estudiante_cedula_prefijo', 'estudiante_apellidos_prefijo', 'estudiante_nombres_prefijo'):
+            self.assertIn(nombre, plan)
+
+
+class ImportacionTests(ConEstudiantesMixin, TestCase):
+    ESTUDIANTES = 2
+    ENCABEZADO = "cedula;nombres;apellidos;especialidad;cohorte;extension;Copia de Cédula\n"
+
+    def importar(self, contenido, nombre='estudiantes.csv', **opciones):
+        return importacion.importar_archivo(io.BytesIO(contenido), nombre, **opciones)
+
+    def test_csv_de_excel_en_cp1252(self):
+        contenido = (self.ENCABEZADO + "20000001;José;Muñoz;Especialidad 0;Cohorte 1;Extensión 0;Sí\n").encode('cp1252')
+        resultado = self.importar(contenido)
+        self.assertEqual((resultado.creados, resultado.errores), (1, []))
+        estudiante = Estudiante.objects.get(cedula='20000001')
+        self.assertEqual((estudiante.nombres, estudiante.apellidos), ("José", "Muñoz"))
+        self.assertEqual(estudiante.cohorte, self.cohortes[1])
+        self.assertEqual(estudiante.documentos.get(tipo_documento="Copia de Cédula").estado_documento, "Sí")
+        self.assertEqual(estudiante.documentos.count(), len(TIPOS))
+        self.assertEqual(matricula.verificar(), [])
+
+    def test_errores_por_fila_y_cedulas_repetidas(self):
+        contenido = (
+            self.ENCABEZADO
+            + "20000001;Luis;Rojas;Especialidad 0;Cohorte 0;Extensión 0;\n"
+            + "20000001;Ana;Mora;Especialidad 0;Cohorte 0;Extensión 0;\n"
+            + f"{self.estudiantes[0].cedula};Ana;Mora;Especialidad 0;Cohorte 0;Extensión 0;\n"
+            + "12a;Ana2;Mora;Especialidad 9;Cohorte 0;Extensión 0;Tal vez\n"
+            + "\n"
+            + "20000002;Eva;Lara;especialidad 1;COHORTE 1;Extension 1;copia\n"
+        ).encode()
+        # Lotes de uno: cada estudiante válido se guarda en su propia transacción
+        resultado = self.importar(contenido, tamano_lote=1)
+        self.assertEqual(resultado.creados, 2)
+        errores = {}
+        for fila, mensaje in resultado.errores:
+            errores.setdefault(fila, []).append(mensaje.split(':')[0])
+        self.assertEqual(errores, {
+            3: ['cedula'], 4: ['cedula'],
+            5: ['cedula', 'nombres', 'especialidad', "Copia de Cédula"],
+        })
+        self.assertEqual(Estudiante.objects.get(cedula='20000001').nombres, "Luis")
+        # Acentos y mayúsculas no importan en los nombres de las referencias
+        eva = Estudiante.objects.get(cedula='20000002')
+        self.assertEqual((eva.especialidad, eva.extension), (self.especialidades[1], self.extensiones[1]))
+        self.assertEqual(eva.documentos.get(tipo_documento="Copia de Cédula").estado_documento, "Copia")
+
+    def test_xlsx_valido_y_danado(self):
+        from openpyxl import Workbook
+        libro = Workbook()
+        libro.active.append(self.ENCABEZADO.strip().split(';'))
+        libro.active.append([20000001, "Íñigo", "Núñez", "Especialidad 1", "Cohorte 0", "Extensión 1", None])
+        contenido = io.BytesIO()
+        libro.save(contenido)
+        resultado = self.importar(contenido.getvalue(), 'estudiantes.xlsx')
+        self.assertEqual((resultado.creados, resultado.errores), (1, []))
+        self.assertEqual(Estudiante.objects.get(cedula='20000001').nombres, "Íñigo")
+
+        for contenido in (b'esto no es un zip', b'PK\x03\x04truncado'):
+            with self.subTest(contenido=contenido):
+                with self.assertRaisesMessage(importacion.ErrorImportacion, "dañado"):
+                    self.importar(contenido, 'estudiantes.xlsx')
+        # En la vista, el error se muestra en la página en vez de un error 500
+        archivo = SimpleUploadedFile('estudiantes.xlsx', b'esto no es un zip')
+        respuesta = self.client.post(reverse('importar_estudiantes'), {'archivo': archivo})
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertIn("dañado", respuesta.context['error_archivo'])
+
+    def test_archivo_vacio_o_sin_columnas(self):
+        with self.assertRaisesMessage(importacion.ErrorImportacion, "vacío"):
+            self.importar(b'')
+        with self.assertRaisesMessage(importacion.ErrorImportacion, "Faltan las columnas: cohorte, extension"):
+            self.importar(b'cedula,nombres,apellidos,especialidad\n')
+
+
+class ExportacionTests(ConEstudiantesMixin, TestCase):
+    ESTUDIANTES = 5
+
+    def setUp(self):
+        super().setUp()
+        Estudiante.objects.filter(pk=self.estudiantes[0].pk).update(nombres="Íñigo", apellidos="Núñez")
+
+    def descargar(self, url):
+        respuesta = self.client.get(url)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertTrue(respuesta.streaming)
+        return respuesta, b''.join(respuesta.streaming_content)
+
+    def leer_xlsx(self, contenido):
+        from openpyxl import load_workbook
+        libro = load_workbook(io.BytesIO(contenido), read_only=True)
+        try:
+            return libro.active.title, [list(fila) for fila in libro.active.iter_rows(values_only=True)]
+        finally:
+            libro.close()
+
+    def test_csv_de_estudiantes(self):
+        respuesta, contenido = self.descargar(reverse('exportar', args=['estudiantes', 'csv']) + f'?cohorte={self.cohortes[0].pk}')
+        self.assertIn('estudiantes-', respuesta['Content-Disposition'])
+        filas = list(csv.reader(io.StringIO(contenido.decode('utf-8-sig'))))
+        self.assertEqual(filas[0], ['Cédula', 'Nombres', 'Apellidos', 'Especialidad', 'Cohorte', 'Extensión', 'Expediente'])
+        # Los de la cohorte 0: 0, 2 y 4
+        self.assertEqual(len(filas), 4)
+        self.assertIn([self.estudiantes[0].cedula, "Íñigo", "Núñez"], [fila[:3] for fila in filas])
+
+    def test_xlsx_de_estudiantes_y_tabla_dinamica(self):
+        _, contenido = self.descargar(reverse('exportar', args=['estudiantes', 'xlsx']))
+        hoja, filas = self.leer_xlsx(contenido)
+        self.assertEqual(hoja, "Estudiantes")
+        self.assertEqual(filas[0][:3], ['Cédula', 'Nombres', 'Apellidos'])
+        self.assertEqual(len(filas), self.ESTUDIANTES + 1)
+        self.assertIn("Íñigo", [fila[1] for fila in filas])
+
+        _, contenido = self.descargar(reverse('exportar_pivote', args=['xlsx']) + '?filas=especialidad&columnas=extension')
+        hoja, filas = self.leer_xlsx(contenido)
+        self.assertEqual(filas[0], ["Especialidad / Extensión", "Extensión 0", "Extensión 1", "Total"])
+        self.assertEqual(filas[-1], ["Total", 3, 2, 5])
+
+    def test_xlsx_en_varios_bloques(self):
+        cantidad = exportacion.FILAS_POR_ENVIO * 2 + 1
+        filas = ([n, f"Ñandú {n} <&>"] for n in range(cantidad))
+        _, leidas = self.leer_xlsx(b''.join(exportacion.generar_xlsx(['Número', 'Texto'], filas, 'Hoja')))
+        self.assertEqual(len(leidas), cantidad + 1)
+        self.assertEqual(leidas[-1], [cantidad - 1, f"Ñandú {cantidad - 1} <&>"])
+
+    def test_requiere_sesion(self):
+        self.client.logout()
+        for url in (reverse('exportar', args=['estudiantes', 'csv']), reverse('exportar_pivote', args=['csv'])):
+            with self.subTest(url=url):
+                self.assertRedirects(self.client.get(url), reverse('login_usuario'), fetch_redirect_response=False)
+
+
+class MatriculaTests(ConEstudiantesMixin, TestCase):
+
+    def totales_cohorte(self):
+        return {d['cohorte__nombre_cohorte']: d['total'] for d in matricula.por_cohorte()}
+
+    def test_alta_cambio_y_baja(self):
+        self.assertEqual(self.totales_cohorte(), {"Cohorte 0": 2, "Cohorte 1": 2})
+
+        self.client.post(reverse('registrar_estudiante'), {
+            'cedula': '20000000', 'nombres': 'Luis', 'apellidos': 'Rojas',
+            'extension': self.extensiones[0].pk, 'especialidad': self.especialidades[0].pk,
+            'cohorte': self.cohortes[0].pk,
+        })
+        self.assertEqual(self.totales_cohorte(), {"Cohorte 0": 3, "Cohorte 1": 2})
+
+        estudiante = Estudiante.objects.get(cedula='20000000')
+        self.client.post(reverse('editar_estudiante', args=[estudiante.pk]), {
+            'cedula': '20000000', 'nombres': 'Luis', 'apellidos': 'Rojas',
+            'extension': self.extensiones[1].pk, 'especialidad': self.especialidades[0].pk,
+            'cohorte': self.cohortes[1].pk,
+        })
+        self.assertEqual(self.totales_cohorte(), {"Cohorte 0": 2, "Cohorte 1": 3})
+
+        self.client.post(reverse('eliminar_estudiante', args=[estudiante.pk]))
+        self.assertEqual(self.totales_cohorte(), {"Cohorte 0": 2, "Cohorte 1": 2})
+        self.assertEqual(matricula.verificar(), [])
+
+    def test_baja_en_cascada(self):
+        self.cohortes[0].delete()
+        self.assertEqual(self.totales_cohorte(), {"Cohorte 1": 2})
+        self.assertEqual(matricula.verificar(), [])
+
+    def test_verificar_y_reconstruir(self):
+        MatriculaCohorte.objects.filter(pk=self.cohortes[0].pk).update(total=7)
+        self.assertEqual(matricula.verificar(), [('cohorte_id', self.cohortes[0].pk, 7, 2)])
+        matricula.reconstruir()
+        self.assertEqual(matricula.verificar(), [])
+
+
+class DocumentosTests(ConEstudiantesMixin, TestCase):
+    ESTUDIANTES = 1
+
+    def setUp(self):
+        super().setUp()
+        self.estudiante = self.estudiantes[0]
+
+    def datos(self, cedula, **estados):
+        return {
+            'cedula': cedula, 'nombres': 'Luis', 'apellidos': 'Rojas',
+            'extension': self.extensiones[0].pk, 'especialidad': self.especialidades[0].pk,
+            'cohorte': self.cohortes[0].pk, **estados,
+        }
+
+    def estados(self, estudiante):
+        return dict(estudiante.documentos.values_list('tipo_documento', 'estado_documento'))
+
+    def test_registro_crea_todos_los_documentos(self):
+        with CaptureQueriesContext(connection) as consultas:
+            self.client.post(reverse('registrar_estudiante'), self.datos('20000000', **{TIPOS[0]: "Sí"}))
+        estudiante = Estudiante.objects.get(cedula='20000000')
+        self.assertEqual(self.estados(estudiante), {tipo: "Sí" if tipo == TIPOS[0] else "Vacío" for tipo in TIPOS})
+        self.assertEqual((estudiante.documentos_entregados, estudiante.estado_expediente), (1, expedientes.PENDIENTE))
+        # Los seis documentos en un solo INSERT
+        self.assertEqual(len([c for c in consultas if 'estudiantes_documentoestudiante' in c['sql']]), 1)
+
+    def test_edicion_escribe_solo_lo_que_cambia(self):
+        anteriores = self.estados(self.estudiante)
+        url = reverse('editar_estudiante', args=[self.estudiante.pk])
+        consultas = []
+        for estados in (anteriores, {**anteriores, TIPOS[0]: "No", TIPOS[1]: "Sí"}):
+            with CaptureQueriesContext(connection) as capturadas:
+                self.client.post(url, self.datos(self.estudiante.cedula, **estados))
+            consultas.append([c['sql'] for c in capturadas])
+            self.assertEqual(self.estados(self.estudiante), estados)
+        # Sin cambios no se escriben documentos; con cambios, una sola sentencia
+        escrituras = [[sql for sql in lista if 'estudiantes_documentoestudiante' in sql] for lista in consultas]
+        self.assertEqual([len(lista) for lista in escrituras], [1, 2])
+        self.estudiante.refresh_from_db()
+        self.assertEqual(self.estudiante.estado_expediente, expedientes.INCOMPLETO)
+        self.assertEqual(expedientes.recalcular_resumen([self.estudiante.pk]), 1)
+        resumen = Estudiante.objects.filter(pk=self.estudiante.pk).values('documentos_entregados', 'documentos_faltantes')
+        self.assertEqual(resumen.get(), {
+            'documentos_entregados': self.estudiante.documentos_entregados,
+            'documentos_faltantes': self.estudiante.documentos_faltantes,
+        })
+
+    def test_en_bloque_previa_y_aplicar(self):
+        otros = crear_estudiantes(4, 1, self.extensiones, self.especialidades, self.cohortes)
+        cohorte = self.cohortes[0]
+        DocumentoEstudiante.objects.filter(estudiante=otros[1], tipo_documento=TIPOS[4]).delete()
+        antes = dict(DocumentoEstudiante.objects.values_list('pk', 'estado_documento'))
+        cuerpo = {'tipo_documento': TIPOS[4], 'estado_documento': "Sí", 'cohorte': cohorte.pk}
+        previa = self.client.post(reverse('operaciones_documentos_api'), json.dumps(cuerpo),
+                                  content_type='application/json').json()
+        en_cohorte = Estudiante.objects.filter(cohorte=cohorte)
+        self.assertEqual(previa['estudiantes'], en_cohorte.count())
+        self.assertEqual(previa['faltantes'], 1)
+        self.assertEqual(dict(DocumentoEstudiante.objects.values_list('pk', 'estado_documento')), antes)
+
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = self.client.post(reverse('operaciones_documentos'), {**cuerpo, 'accion': 'aplicar'})
+        # Un UPDATE y un INSERT ... SELECT de documentos, sin importar cuántos estudiantes
+        escrituras = [c['sql'] for c in consultas
+                      if c['sql'].startswith(('UPDATE "estudiantes_documentoestudiante"', 'INSERT INTO estudiantes_documentoestudiante'))]
+        self.assertEqual(len(escrituras), 2)
+        self.assertRedirects(respuesta, reverse('operaciones_documentos'))
+        cambiados = DocumentoEstudiante.objects.filter(estudiante__cohorte=cohorte, tipo_documento=TIPOS[4])
+        self.assertEqual(set(cambiados.values_list('estado_documento', flat=True)), {"Sí"})
+        self.assertEqual(cambiados.count(), en_cohorte.count())
+        # Las otras cohortes no cambian y el resumen queda como lo calcula recalcular_resumen
+        for documento in DocumentoEstudiante.objects.exclude(estudiante__cohorte=cohorte):
+            self.assertEqual(documento.estado_documento, antes[documento.pk])
+        resumen = list(Estudiante.objects.order_by('pk').values_list('documentos_entregados', 'estado_expediente'))
+        expedientes.recalcular_resumen()
+        self.assertEqual(list(Estudiante.objects.order_by('pk').values_list('documentos_entregados', 'estado_expediente')), resumen)
+
+    def test_en_bloque_requiere_filtro_y_permisos(self):
+        url = reverse('operaciones_documentos_api')
+        cuerpo = json.dumps({'tipo_documento': TIPOS[0], 'estado_documento': "Sí", 'aplicar': True})
+        self.assertEqual(self.client.post(url, cuerpo, content_type='application/json').status_code, 400)
+        sesion = self.client.session
+        sesion['usuario_rol'] = "Consulta"
+        sesion.save()
+        cuerpo = json.dumps({'tipo_documento': TIPOS[0], 'estado_documento': "Sí",
+                             'cedulas': [self.estudiante.cedula], 'aplicar': True})
+        self.assertEqual(self.client.post(url, cuerpo, content_type='application/json').status_code, 403)
+
+
+@override_settings(CONSULTAS_CONCURRENTES=False)
+class CondicionalTests(ConEstudiantesMixin, TestCase):
+    ESTUDIANTES = 2
+
+    def setUp(self):
+        super().setUp()
+        self.estudiante = self.estudiantes[0]
+
+    def revalidar(self, url, etag):
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        return respuesta, len(consultas)
+
+    def test_304_sin_consultar_los_datos(self):
+        for url in (reverse('listar_cohortes'), reverse('panel_reportes'),
+                    reverse('detalle_estudiante', args=[self.estudiante.pk])):
+            with self.subTest(url=url):
+                primera = self.client.get(url)
+                self.assertEqual(primera.status_code, 200)
+                self.assertIn('no-cache', primera['Cache-Control'])
+                respuesta, consultas = self.revalidar(url, primera['ETag'])
+                self.assertEqual(respuesta.status_code, 304)
+                # Solo la sesión
+                self.assertEqual(consultas, 1)
+
+    def test_cambia_con_los_datos_y_el_rol(self):
+        url = reverse('detalle_estudiante', args=[self.estudiante.pk])
+        etag = self.client.get(url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            documentos.en_bloque(TIPOS[0], "Sí", {'cedulas': [self.estudiante.cedula]}, aplicar=True)
+        respuesta, _ = self.revalidar(url, etag)
+        self.assertEqual(respuesta.status_code, 200)
+        etag = respuesta['ETag']
+        self.iniciar_sesion("Consulta")
+        self.assertEqual(self.revalidar(url, etag)[0].status_code, 200)
+        # Los cambios en otras tablas no afectan a la página
+        with self.captureOnCommitCallbacks(execute=True):
+            Usuario.objects.create(nombre_usuario="otro", contrasena="-", rol="Consulta")
+        etag = self.client.get(url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            Usuario.objects.create(nombre_usuario="otro2", contrasena="-", rol="Consulta")
+        self.assertEqual(self.revalidar(url, etag)[0].status_code, 304)
+
+
+@override_settings(CONSULTAS_CONCURRENTES=False)
+class CondicionalEntreProcesosTests(CacheCompartidaMixin, ConEstudiantesMixin, TestCase):
+    ESTUDIANTES = 2
+
+    def test_escritura_en_otro_proceso_cambia_el_etag(self):
+        url = reverse('listar_cohortes')
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        # Otro proceso guarda una cohorte: cambia la versión en la caché compartida
+        self.en_otro_proceso("from estudiantes import condicional\ncondicional.cambiaron('cohortes')")
+        respuesta = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertNotEqual(respuesta['ETag'], etag)
+
+
+@override_settings(CONSULTAS_CONCURRENTES=False)
+class StreamingTests(ConEstudiantesMixin, TestCase):
+    ESTUDIANTES = 5
+
+    def setUp(self):
+        super().setUp()
+        Estudiante.objects.filter(pk=self.estudiantes[0].pk).update(nombres="<b>Ana</b>")
+
+    def partes(self, url, parametros=None):
+        respuesta = self.client.get(url, parametros)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertTrue(respuesta.streaming)
+        return [parte.decode() for parte in respuesta.streaming_content]
+
+    def test_diseno_antes_de_las_filas(self):
+        partes = self.partes(reverse('listar_estudiantes_todos'), {'cohorte': self.cohortes[0].pk})
+        self.assertIn('<tbody>', partes[0])
+        self.assertNotIn('btn-icon view', partes[0])
+        self.assertIn('</html>', partes[-1])
+        pagina = ''.join(partes)
+        # Los de la cohorte 0: 0, 2 y 4
+        self.assertEqual(pagina.count('btn-icon view'), 3)
+        self.assertIn(reverse('editar_estudiante', args=[self.estudiantes[2].pk]), pagina)
+        self.assertIn('&lt;b&gt;Ana&lt;/b&gt;', pagina)
+        self.assertNotIn(self.estudiantes[1].cedula, pagina)
+
+        self.iniciar_sesion("Consulta")
+        pagina = ''.join(self.partes(reverse('listar_estudiantes_todos')))
+        self.assertEqual(pagina.count('btn-icon view'), 5)
+        self.assertNotIn('btn-icon edit', pagina)
+
+    async def test_reporte_async_en_streaming(self):
+        incompletos = [cedula async for cedula in Estudiante.objects.filter(
+            estado_expediente=expedientes.INCOMPLETO).values_list('cedula', flat=True)]
+        self.assertTrue(incompletos)
+        self.async_client.cookies = self.client.cookies
+        respuesta = await self.async_client.get(reverse('reporte_expedientes_incompletos'))
+        self.assertEqual(respuesta.status_code, 200)
+        # Con ASGI el contenido debe ser async: uno síncrono se leería completo antes de enviarlo
+        self.assertTrue(respuesta.is_async)
+        pagina = b''.join([parte async for parte in respuesta.streaming_content]).decode()
+        self.assertEqual(pagina.count('</td></tr>'), len(incompletos))
+        for cedula in incompletos:
+            self.assertIn(f'<td>{cedula}</td>', pagina)
+
+
+class ApiTests(ConEstudiantesMixin, TestCase):
+    ESTUDIANTES = 5
+    ROL = "Consulta"
+
+    def get(self, ruta, **parametros):
+        respuesta = self.client.get(reverse(ruta), parametros)
+        self.assertEqual(respuesta['Content-Type'], 'application/json')
+        return respuesta.status_code, respuesta.json()
+
+    def test_campos_filtros_y_paginas(self):
+        with CaptureQueriesContext(connection) as consultas:
+            estado, datos = self.get('api_estudiantes', cohorte=self.cohortes[0].pk, limit=2)
+        self.assertEqual(estado, 200)
+        # Los de la cohorte 0: 0, 2 y 4
+        self.assertEqual([e['cedula'] for e in datos['datos']], [self.estudiantes[0].cedula, self.estudiantes[2].cedula])
+        primero = datos['datos'][0]
+        self.assertEqual(primero['cohorte'], {'id': self.cohortes[0].pk, 'nombre': "Cohorte 0"})
+        self.assertEqual(len(primero['documentos']), len(TIPOS))
+        # Sesión, estudiantes con sus referencias y documentos de toda la página
+        sql = [c['sql'] for c in consultas]
+        self.assertEqual(len(sql), 3)
+        self.assertEqual(len([s for s in sql if 'estudiantes_documentoestudiante' in s]), 1)
+
+        estado, datos = self.get('api_estudiantes', cohorte=self.cohortes[0].pk, limit=2,
+                                 cursor=datos['siguiente'], fields='id,cedula')
+        self.assertEqual(datos['datos'], [{'id': self.estudiantes[4].pk, 'cedula': self.estudiantes[4].cedula}])
+        self.assertIsNone(datos['siguiente'])
+
+        estado, datos = self.get('api_estudiantes', estado=expedientes.INCOMPLETO, fields='id')
+        incompletos = Estudiante.objects.filter(estado_expediente=expedientes.INCOMPLETO).order_by('pk')
+        self.assertEqual([e['id'] for e in datos['datos']], list(incompletos.values_list('pk', flat=True)))
+
+    def test_parametros_no_validos_y_sin_sesion(self):
+        for parametros in ({'fields': 'id,clave'}, {'limit': '0'}, {'limit': 'x'}, {'cohorte': 'a'},
+                           {'estado': 'Otro'}, {'cursor': 'no-es-un-cursor'}):
+            with self.subTest(parametros=parametros):
+                estado, datos = self.get('api_estudiantes', **parametros)
+                self.assertEqual(estado, 400)
+                self.assertIn('error', datos)
+        self.assertEqual(self.get('api_cambios', since='ayer')[0], 400)
+        self.client.logout()
+        self.assertEqual(self.get('api_estudiantes')[0], 401)
+        self.assertEqual(self.get('api_cohortes')[0], 401)
+
+    def test_referencias(self):
+        estado, datos = self.get('api_extensiones')
+        self.assertEqual(datos['datos'][0], {
+            'id': self.extensiones[0].pk, 'nombre': "Extensión 0", 'direccion': "Centro",
+        })
+        estado, datos = self.get('api_cohortes')
+        self.assertEqual([c['anio'] for c in datos['datos']], ["2020", "2021"])
+
+    def test_cambios_desde_una_fecha(self):
+        ahora = timezone.now()
+        Estudiante.objects.update(actualizado=ahora - timedelta(hours=2))
+        Estudiante.objects.filter(pk=self.estudiantes[3].pk).update(actualizado=ahora - timedelta(minutes=30))
+        estado, datos = self.get('api_cambios', since=(ahora - timedelta(hours=1)).isoformat(), fields='id')
+        self.assertEqual((datos['datos'], datos['hay_mas']), ([{'id': self.estudiantes[3].pk}], False))
+
+        # Sin cambios nuevos el cursor sigue sirviendo
+        cursor = datos['siguiente']
+        self.assertEqual(self.get('api_cambios', cursor=cursor)[1]['datos'], [])
+
+        # documentos.en_bloque marca a los estudiantes que cambia; se entregan pasado el margen
+        estudiante = self.estudiantes[1]
+        anterior = estudiante.documentos.get(tipo_documento=TIPOS[0]).estado_documento
+        nuevo = next(estado for estado in ESTADOS if estado != anterior)
+        documentos.en_bloque(TIPOS[0], nuevo, {'cedulas': [estudiante.cedula]}, aplicar=True)
+        # Si el documento ya está en ese estado, el estudiante no cambia
+        otro = self.estudiantes[2]
+        igual = otro.documentos.get(tipo_documento=TIPOS[0]).estado_documento
+        documentos.en_bloque(TIPOS[0], igual, {'cedulas': [otro.cedula]}, aplicar=True)
+        self.assertEqual(self.get('api_cambios', cursor=cursor)[1]['datos'], [])
+        Estudiante.objects.filter(actualizado__gt=ahora).update(actualizado=ahora - timedelta(minutes=1))
+        datos = self.get('api_cambios', cursor=cursor, fields='cedula')[1]
+        self.assertEqual(datos['datos'], [{'cedula': estudiante.cedula}])
+
+
+class VencimientoTests(ConEstudiantesMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        DocumentoEstudiante.objects.update(estado_documento="Sí")
+        expedientes.recalcular_resumen()
+        self.hoy = date(2026, 10, 18)
+
+    def documento(self, estudiante, tipo):
+        return DocumentoEstudiante.objects.get(estudiante=estudiante, tipo_documento=tipo)
+
+    def vencer(self, *argumentos):
+        salida = io.StringIO()
+        call_command('vencer_documentos', '--fecha', self.hoy.isoformat(), *argumentos, stdout=salida)
+        return salida.getvalue()
+
+    def test_edicion_guarda_las_fechas(self):
+        estudiante = self.estudiantes[0]
+        self.client.post(reverse('editar_estudiante', args=[estudiante.pk]), {
+            'cedula': estudiante.cedula, 'nombres': "Ana", 'apellidos': "Pérez",
+            'extension': self.extensiones[0].pk, 'especialidad': self.especialidades[0].pk,
+            'cohorte': self.cohortes[0].pk, **{tipo: "Sí" for tipo in TIPOS},
+            f'fecha_entrega:{TIPOS[0]}': '2026-01-10', f'fecha_vencimiento:{TIPOS[0]}': '2027-01-10',
+            f'fecha_vencimiento:{TIPOS[1]}': '',
+        })
+        documento = self.documento(estudiante, TIPOS[0])
+        self.assertEqual((documento.fecha_entrega, documento.fecha_vencimiento), (date(2026, 1, 10), date(2027, 1, 10)))
+        self.assertIsNone(self.documento(estudiante, TIPOS[1]).fecha_vencimiento)
+
+    def test_vence_por_lotes_con_resumen_por_cohorte(self):
+        vencen = [self.documento(e, tipo) for e in self.estudiantes[:3] for tipo in TIPOS[:2]]
+        DocumentoEstudiante.objects.filter(pk__in=[d.pk for d in vencen]).update(fecha_vencimiento=self.hoy)
+        DocumentoEstudiante.objects.filter(pk=vencen[0].pk).update(estado_documento="Copia")
+        # Mañana, o sin entregar: no vencen
+        DocumentoEstudiante.objects.filter(estudiante=self.estudiantes[3], tipo_documento=TIPOS[0]).update(
+            fecha_vencimiento=self.hoy + timedelta(days=1))
+        DocumentoEstudiante.objects.filter(estudiante=self.estudiantes[3], tipo_documento=TIPOS[1]).update(
+            fecha_vencimiento=self.hoy, estado_documento="No")
+        Estudiante.objects.update(actualizado=timezone.now() - timedelta(days=1))
+
+        simulado = self.vencer('--simular')
+        self.assertIn("6 documentos vencerían", simulado)
+        self.assertFalse(DocumentoEstudiante.objects.filter(estado_documento="Vencida").exists())
+        if connection.vendor == 'sqlite':
+            self.assertIn('documento_vencimiento_idx', documentos.por_vencer(self.hoy).explain())
+
+        with CaptureQueriesContext(connection) as consultas:
+            salida = self.vencer('--lote', '4')
+        self.assertEqual(len([c for c in consultas if c['sql'].startswith('UPDATE "estudiantes_documentoestudiante"')]), 2)
+        # Los estudiantes 0 y 2 son de la cohorte 0; el 1, de la cohorte 1
+        self.assertIn("Cohorte 0: 4", salida)
+        self.assertIn("Cohorte 1: 2", salida)
+        self.assertIn("6 documentos vencieron", salida)
+        self.assertEqual(set(DocumentoEstudiante.objects.filter(estado_documento="Vencida").values_list('pk', flat=True)),
+                         {d.pk for d in vencen})
+        reciente = timezone.now() - timedelta(hours=1)
+        for estudiante in Estudiante.objects.all():
+            with self.subTest(estudiante=estudiante.pk):
+                vencio = estudiante.pk != self.estudiantes[3].pk
+                self.assertEqual(estudiante.actualizado > reciente, vencio)
+        self.assertEqual(Estudiante.objects.get(pk=self.estudiantes[0].pk).estado_expediente, expedientes.INCOMPLETO)
+        self.assertIn("0 documentos vencieron", self.vencer())
+
+
+class PivoteTests(ConEstudiantesMixin, TestCase):
+    ESTUDIANTES = 8
+    ROL = None
+
+    def test_cruce_con_totales(self):
+        tabla = pivote.pivotar('especialidad', 'extension')
+        self.assertEqual(tabla.encabezado(), ["Especialidad / Extensión", "Extensión 0", "Extensión 1", "Total"])
+        self.assertEqual(list(tabla.filas_exportacion()), [
+            ["Especialidad 0", 4, 0, 4],
+            ["Especialidad 1", 0, 4, 4],
+            ["Total", 4, 4, 8],
+        ])
+
+    def test_estados_con_porcentaje_y_filtro(self):
+        tabla = pivote.pivotar('cohorte', 'estado', porcentaje='fila', filtros={'cohorte': self.cohortes[1].pk})
+        filas = list(tabla.filas_exportacion())
+        self.assertEqual([fila[0] for fila in filas], ["Cohorte 1", "Total"])
+        self.assertEqual(filas[0][-1], 100)
+        self.assertEqual(tabla.total, 4 * len(TIPOS))
+        conteos = dict(zip(pivote.ESTADOS, (celda for celda, _ in next(tabla.tabla())['celdas'])))
+        for estado, n in conteos.items():
+            self.assertEqual(n, DocumentoEstudiante.objects.filter(
+                estudiante__cohorte=self.cohortes[1], estado_documento=estado).count())
+
+    def test_se_invalida_al_escribir_documentos(self):
+        self.assertEqual(pivote.pivotar('especialidad', 'estado').total, 8 * len(TIPOS))
+        with self.captureOnCommitCallbacks(execute=True):
+            DocumentoEstudiante.objects.first().delete()
+        self.assertEqual(pivote.pivotar('especialidad', 'estado').total, 8 * len(TIPOS) - 1)
+
+
+class ConsultasConcurrentesTests(ConEstudiantesMixin, TransactionTestCase):
+    """
+    Las vistas async dan lo mismo con las consultas a la vez (cada una en su hilo y
+    conexión) que una tras otra. TransactionTestCase: los otros hilos solo ven datos
+    confirmados.
+    """
+    ESTUDIANTES = 6
+
+    def contextos(self, nombre):
+        resultado = []
+        for concurrentes in (True, False):
+            cache.clear()
+            with override_settings(CONSULTAS_CONCURRENTES=concurrentes):
+                respuesta = self.client.get(reverse(nombre))
+            self.assertEqual(respuesta.status_code, 200)
+            resultado.append(respuesta)
+        return resultado
+
+    def test_panel_igual_en_ambos_modos(self):
+        concurrente, secuencial = self.contextos('panel_reportes')
+        for clave in ('cohortes', 'especialidades', 'extensiones', 'expedientes', 'total_estudiantes'):
+            self.assertEqual(concurrente.context[clave], secuencial.context[clave])
+        self.assertEqual(concurrente.context['total_estudiantes'], 6)
+
+    def test_inicio_igual_en_ambos_modos(self):
+        concurrente, secuencial = self.contextos('home')
+        self.assertEqual(concurrente.content, secuencial.content)
+
+
+class AuditoriaTests(ConEstudiantesMixin, TransactionTestCase):
+    """
+    TransactionTestCase: los registros entran al lote al confirmarse cada transacción.
+    """
+    ESTUDIANTES = 3
+
+    def setUp(self):
+        super().setUp()
+        self.estudiante = self.estudiantes[0]
+
+    def test_edicion_en_un_solo_insert(self):
+        estados = dict(self.estudiante.documentos.values_list('tipo_documento', 'estado_documento'))
+        nuevo = next(estado for estado in ESTADOS if estado != estados[TIPOS[0]])
+        with CaptureQueriesContext(connection) as consultas:
+            self.client.post(reverse('editar_estudiante', args=[self.estudiante.pk]), {
+                'cedula': self.estudiante.cedula, 'nombres': "Luisa", 'apellidos': "Pérez",
+                'extension': self.extensiones[0].pk, 'especialidad': self.especialidades[0].pk,
+                'cohorte': self.cohortes[0].pk, **estados, TIPOS[0]: nuevo,
+            })
+        inserciones = [c for c in consultas if c['sql'].startswith('INSERT INTO "estudiantes_registroauditoria"')]
+        self.assertEqual(len(inserciones), 1)
+        registros = {r.modelo: r for r in RegistroAuditoria.objects.filter(estudiante_id=self.estudiante.pk)}
+        self.assertEqual(registros['Estudiante'].cambios, {
+            'nombres': ["Ana María", "Luisa"], 'apellidos': [self.estudiante.apellidos, "Pérez"],
+        })
+        self.assertEqual(registros['Estudiante'].usuario_nombre, self.usuario.nombre_usuario)
+        self.assertEqual(registros['DocumentoEstudiante'].cambios, {TIPOS[0]: [estados[TIPOS[0]], nuevo]})
+
+        # Sin cambios no se registra nada, y una petición que no escribe no guarda el lote
+        with CaptureQueriesContext(connection) as consultas:
+            self.client.get(reverse('listar_extensiones'))
+        self.assertFalse([c for c in consultas if 'estudiantes_registroauditoria' in c['sql']])
+
+    def test_crear_editar_eliminar_y_revertir(self):
+        self.client.post(reverse('crear_usuario'), {'nombre_usuario': "ana", 'contrasena': "secreta", 'rol': "Consulta"})
+        usuario = Usuario.objects.get(nombre_usuario="ana")
+        self.client.post(reverse('editar_usuario', args=[usuario.pk]),
+                         {'nombre_usuario': "ana.maria", 'contrasena': "otra clave", 'rol': "Secretaria"})
+        self.client.post(reverse('eliminar_usuario', args=[usuario.pk]))
+        registros = list(RegistroAuditoria.objects.filter(modelo='Usuario').order_by('id'))
+        self.assertEqual([r.accion for r in registros], [auditoria.CREAR, auditoria.EDITAR, auditoria.ELIMINAR])
+        self.assertEqual({r.objeto_id for r in registros}, {usuario.pk})
+        # La contraseña no se guarda
+        self.assertEqual(registros[1].cambios, {
+            'nombre_usuario': ["ana", "ana.maria"], 'contrasena': ["***", "***"], 'rol': ["Consulta", "Secretaria"],
+        })
+        self.assertNotIn("secreta", str([r.cambios for r in registros]))
+
+        try:
+            with transaction.atomic():
+                extension = self.extensiones[0]
+                auditoria.registrar(auditoria.ELIMINAR, extension)
+                raise ValueError
+        except ValueError:
+            pass
+        self.assertFalse(RegistroAuditoria.objects.filter(modelo='Extension').exists())
+
+    def test_en_bloque_y_pagina_con_filtros(self):
+        otro = Usuario.objects.create(nombre_usuario="otro", contrasena="-", rol="Administrador")
+        documentos.en_bloque(TIPOS[2], "Vencida", {'cohorte': self.cohortes[0].pk}, aplicar=True)
+        en_cohorte = set(Estudiante.objects.filter(cohorte=self.cohortes[0]).values_list('pk', flat=True))
+        # Fuera de una petición no hay usuario
+        self.assertEqual(set(RegistroAuditoria.objects.values_list('estudiante_id', flat=True)), en_cohorte)
+        self.assertEqual(set(RegistroAuditoria.objects.values_list('usuario_id', flat=True)), {None})
+
+        self.client.post(reverse('editar_extension', args=[self.extensiones[1].pk]),
+                         {'nombre_extension': "Norte", 'direccion_extension': "Centro"})
+        respuesta = self.client.get(reverse('listar_auditoria'), {'estudiante': self.estudiante.pk})
+        self.assertEqual([r.estudiante_id for r in respuesta.context['registros']], [self.estudiante.pk])
+        respuesta = self.client.get(reverse('listar_auditoria'), {'usuario': self.usuario.pk})
+        self.assertEqual([r.modelo for r in respuesta.context['registros']], ['Extension'])
+        self.assertContains(respuesta, "Extensión 1")
+        respuesta = self.client.get(reverse('listar_auditoria'), {'usuario': otro.pk})
+        self.assertEqual(list(respuesta.context['registros']), [])
+        respuesta = self.client.get(reverse('listar_auditoria'), {'hasta': '2000-01-01', 'desde': 'x'})
+        self.assertEqual(list(respuesta.context['registros']), [])
+
+        # Paginación de los más recientes a los más antiguos
+        respuesta = self.client.get(reverse('listar_auditoria'))
+        fechas = [(r.fecha, r.pk) for r in respuesta.context['registros']]
+        self.assertEqual(fechas, sorted(fechas, reverse=True))
+
+        sesion = self.client.session
+        sesion['usuario_rol'] = "Consulta"
+        sesion.save()
+        self.assertRedirects(self.client.get(reverse('listar_auditoria')), reverse('home'), fetch_redirect_response=False)
+
+
+# ===== Perfil de base de datos =====
+
+@skipUnless(connection.vendor == 'sqlite' and settings.SQLITE_AJUSTES, "Solo con SQLITE_AJUSTES")
+class PerfilBaseDatosTests(ConEstudiantesMixin, TestCase):
+    ESTUDIANTES = 1
+
+    def test_pragmas_al_abrir_la_conexion(self):
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA busy_timeout")
+            self.assertEqual(cursor.fetchone()[0], settings.SQLITE_PRAGMAS['busy_timeout'])
+            cursor.execute("PRAGMA synchronous")
+            self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+
+    def test_wal_solo_lo_activa_la_migracion(self):
+        # Abrir la conexión (check, shell) no cambia el archivo; migrate sí lo pasa a WAL
+        carpeta = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, carpeta, ignore_errors=True)
+        archivo = os.path.join(carpeta, 'db.sqlite3')
+        sqlite3.connect(archivo).close()
+        entorno = {**os.environ, 'DJANGO_SETTINGS_MODULE': 'gestion_estudiantes.settings', 'DB_NOMBRE': archivo}
+
+        def modo():
+            with sqlite3.connect(archivo) as conexion:
+                return conexion.execute("PRAGMA journal_mode").fetchone()[0]
+
+        subprocess.run([sys.executable, '-c', "import django\ndjango.setup()\n"
+                        "from django.db import connection\nconnection.ensure_connection()"],
+                       cwd=settings.BASE_DIR, env=entorno, check=True)
+        self.assertEqual(modo(), 'delete')
+        subprocess.run([sys.executable, 'manage.py', 'migrate', '-v0'], cwd=settings.BASE_DIR, env=entorno, check=True)
+        self.assertEqual(modo(), 'wal')
+
+    def test_editar_solo_abre_transaccion_en_el_post(self):
+        # Con transaction_mode IMMEDIATE la transacción toma el bloqueo de escritura
+        estudiante = self.estudiantes[0]
+        url = reverse('editar_estudiante', args=[estudiante.pk])
+        with CaptureQueriesContext(connection) as consultas:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        self.assertFalse([c for c in consultas if 'SAVEPOINT' in c['sql']])
+        datos = {
+            'cedula': estudiante.cedula, 'nombres': "Ana", 'apellidos': "Rojas",
+            'extension': self.extensiones[0].pk, 'especialidad': self.especialidades[0].pk,
+            'cohorte': self.cohortes[0].pk, **{tipo: "Sí" for tipo in TIPOS},
+        }
+        with CaptureQueriesContext(connection) as consultas:
+            self.assertEqual(self.client.post(url, datos).status_code, 302)
+        self.assertTrue([c for c in consultas if 'SAVEPOINT' in c['sql']])
+        self.assertEqual(Estudiante.objects.get(pk=estudiante.pk).apellidos, "Rojas")
+
+
+# ===== Middleware de métricas =====
+
+class MetricasMiddlewareTests(ConEstudiantesMixin, TestCase):
+    ESTUDIANTES = 3
+    ROL = None
+
+    @override_settings(METRICAS_CABECERAS=True)
+    def test_cabeceras_en_depuracion(self):
+        respuesta = self.client.get(reverse('listar_cohortes'))
+        self.assertEqual(respuesta['X-Metricas-Consultas'], '1')
+        self.assertIn('sql;dur=', respuesta['Server-Timing'])
+        self.assertGreater(float(respuesta['X-Metricas-Plantillas-ms']), 0)
+
+    @override_settings(METRICAS_CABECERAS=False)
+    def test_log_en_produccion(self):
+        with self.assertLogs('estudiantes.metricas', level='INFO') as registro:
+            respuesta = self.client.get(reverse('listar_cohortes'))
+        self.assertNotIn('X-Metricas-Consultas', respuesta)
+        linea = json.loads(registro.records[0].getMessage())
+        self.assertEqual(linea['vista'], 'listar_cohortes')
+        self.assertEqual(linea['estado'], 200)
+        self.assertEqual(linea['consultas'], 1)
+        self.assertGreaterEqual(linea['total_ms'], linea['plantillas_ms'])
+
+
+@override_settings(CONSULTAS_CONCURRENTES=False)
+class PerfilMiddlewareTests(ConEstudiantesMixin, TestCase):
+    ESTUDIANTES = 3
+
+    def setUp(self):
+        super().setUp()
+        self.directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directorio, ignore_errors=True)
+        ajustes = override_settings(PERFILES_DIR=self.directorio)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        # Un expediente incompleto para que el reporte tenga filas
+        DocumentoEstudiante.objects.filter(estudiante=self.estudiantes[0]).update(estado_documento="No")
+        expedientes.recalcular_resumen([self.estudiantes[0].pk])
+
+    def funciones(self, base):
+        """
+        Nombres de las funciones del .pstats guardado.
+        """
+        estadisticas = pstats.Stats(os.path.join(self.directorio, f"{base}.pstats"))
+        return {funcion for _, _, funcion in estadisticas.stats}
+
+    def cliente_asgi(self):
+        cliente = AsyncClient()
+        cliente.cookies[settings.SESSION_COOKIE_NAME] = self.client.cookies[settings.SESSION_COOKIE_NAME].value
+        return cliente
+
+    def test_administrador_obtiene_perfil(self):
+        self.iniciar_sesion("Administrador")
+        respuesta = self.client.get(reverse('listar_cohortes'), {'perfil': 'cprofile'})
+        base = respuesta['X-Perfil']
+        self.assertIn('listar_cohortes-cprofile', base)
+        self.assertEqual(sorted(os.listdir(self.directorio)), [f"{base}.folded", f"{base}.pstats"])
+        self.assertEqual([p['base'] for p in perfiles.listar()], [base])
+
+        descarga = self.client.get(reverse('descargar_perfil', args=[f"{base}.pstats"]))
+        self.assertEqual(descarga.status_code, 200)
+        self.assertIn('attachment', descarga['Content-Disposition'])
+
+    def test_vista_sincrona_y_async_con_wsgi(self):
+        # La vista async corre en el bucle de async_to_sync, no en el hilo del middleware
+        base = self.client.get(reverse('listar_cohortes'), {'perfil': 'cprofile'})['X-Perfil']
+        self.assertIn('listar_cohortes', self.funciones(base))
+        base = self.client.get(reverse('reporte_matricula_cohorte'), {'perfil': 'cprofile'})['X-Perfil']
+        self.assertIn('reporte_matricula_cohorte', self.funciones(base))
+
+    def test_streaming_se_perfila_hasta_la_ultima_fila(self):
+        respuesta = self.client.get(reverse('reporte_expedientes_incompletos'), {'perfil': 'cprofile'})
+        base = respuesta['X-Perfil']
+        self.assertTrue(base.endswith('-cprofile-streaming'))
+        # Antes de enviar las filas todavía no hay perfil
+        self.assertEqual(os.listdir(self.directorio), [])
+        contenido = b''.join(respuesta.streaming_content).decode()
+        self.assertIn(self.estudiantes[0].cedula, contenido)
+        funciones = self.funciones(base)
+        self.assertIn('reporte_expedientes_incompletos', funciones)
+        self.assertIn('_filas_expedientes_incompletos', funciones)
+        self.assertIn('format_html_join', funciones)
+        with open(os.path.join(self.directorio, f"{base}.folded"), encoding='utf-8') as archivo:
+            self.assertTrue(all(linea.startswith('hilo ') for linea in archivo))
+
+    @override_settings(CONSULTAS_CONCURRENTES=True)
+    def test_hilos_del_pool_de_consultas(self):
+        def calcular_en_el_pool():
+            return threading.current_thread().name
+
+        sesion = perfiles.Sesion('cprofile')
+        with sesion.activa(), sesion.hilo():
+            hilo = async_to_sync(asincrono.ejecutar)(calcular_en_el_pool)
+        sesion.terminar()
+        self.assertTrue(hilo.startswith('consultas'))
+        self.assertIn('calcular_en_el_pool', {funcion for _, _, funcion in sesion.estadisticas().stats})
+
+    async def test_vista_sincrona_y_async_con_asgi(self):
+        # La vista síncrona corre en el hilo de sync_to_async, no en el bucle del middleware
+        cliente = self.cliente_asgi()
+        respuesta = await cliente.get(reverse('listar_cohortes'), {'perfil': 'cprofile'})
+        self.assertIn('listar_cohortes', self.funciones(respuesta['X-Perfil']))
+        respuesta = await cliente.get(reverse('reporte_expedientes_incompletos'), {'perfil': 'cprofile'})
+        contenido = b''.join([parte async for parte in respuesta.streaming_content]).decode()
+        self.assertIn(self.estudiantes[0].cedula, contenido)
+        funciones = self.funciones(respuesta['X-Perfil'])
+        self.assertIn('reporte_expedientes_incompletos', funciones)
+        self.assertIn('_filas_expedientes_incompletos', funciones)
+
+    def test_otros_roles_no_perfilan(self):
+        self.iniciar_sesion("Consulta")
+        respuesta = self.client.get(reverse('listar_cohortes'), {'perfil': 'cprofile'})
+        self.assertNotIn('X-Perfil', respuesta)
+        self.assertEqual(os.listdir(self.directorio), [])
+        self.assertRedirects(self.client.get(reverse('listar_perfiles')), reverse('home'), fetch_redirect_response=False)
+
+
+class TrabajosTests(ConEstudiantesMixin, TestCase):
+    ESTUDIANTES = 6
+    ROL = "Secretaria"
+
+    def setUp(self):
+        super().setUp()
+        self.directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directorio, ignore_errors=True)
+        ajustes = override_settings(TRABAJOS_DIR=self.directorio, TRABAJOS_AVANCE_SEGUNDOS=0)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+    def procesar(self):
+        trabajo = trabajos.tomar()
+        self.assertIsNotNone(trabajo)
+        self.assertIsNone(trabajos.tomar())
+        return trabajos.ejecutar(trabajo)
+
+    def test_exportacion_con_avance_y_descarga(self):
+        self.client.post(reverse('crear_trabajo'), {
+            'tipo': 'exportar', 'reporte': 'estudiantes', 'formato': 'csv', 'cohorte': self.cohortes[0].pk,
+        })
+        trabajo = Trabajo.objects.get()
+        estado = self.client.get(reverse('estado_trabajo', args=[trabajo.pk])).json()
+        self.assertEqual((estado['estado'], estado['descarga']), (Trabajo.PENDIENTE, None))
+
+        self.procesar()
+        estado = self.client.get(reverse('estado_trabajo', args=[trabajo.pk])).json()
+        self.assertEqual(estado['estado'], Trabajo.TERMINADO)
+        self.assertEqual(estado['resultado'], {'filas': 3})
+        self.assertEqual(estado['porcentaje'], 100)
+        descarga = self.client.get(estado['descarga'])
+        contenido = b''.join(descarga.streaming_content).decode('utf-8-sig')
+        self.assertEqual(len(contenido.splitlines()), 4)
+        self.assertIn('estudiantes-', descarga['Content-Disposition'])
+
+    def test_importacion_en_segundo_plano(self):
+        archivo = SimpleUploadedFile('nuevos.csv', (
+            "cedula,nombres,apellidos,especialidad,cohorte,extension\n"
+            "20000001,Luis,Rojas,Especialidad 0,Cohorte 0,Extensión 0\n"
+            "20000002,Ana,Mora,Especialidad 9,Cohorte 0,Extensión 0\n"
+        ).encode())
+        respuesta = self.client.post(reverse('importar_estudiantes'), {'archivo': archivo, 'segundo_plano': 'on'})
+        self.assertRedirects(respuesta, reverse('listar_trabajos'), fetch_redirect_response=False)
+        self.assertFalse(Estudiante.objects.filter(cedula='20000001').exists())
+
+        trabajo = self.procesar()
+        self.assertEqual(trabajo.resultado['creados'], 1)
+        self.assertEqual(trabajo.resultado['errores'], 1)
+        self.assertTrue(Estudiante.objects.filter(cedula='20000001').exists())
+        self.assertEqual(trabajo.hecho, trabajo.total)
+        # Queda solo el CSV de errores; la copia del archivo subido se borró
+        self.assertEqual(os.listdir(self.directorio), [trabajo.archivo])
+        self.assertEqual(matricula.verificar(), [])
+
+    def test_error_y_vencimiento(self):
+        fallido = trabajos.crear('paquete_cohorte', {'cohorte': 0}, self.usuario.pk)
+        with self.assertLogs('estudiantes.trabajos', 'ERROR'):
+            self.procesar()
+        fallido.refresh_from_db()
+        self.assertEqual(fallido.estado, Trabajo.FALLIDO)
+        self.assertTrue(fallido.mensaje)
+
+        trabajos.crear('paquete_cohorte', {'cohorte': self.cohortes[1].pk}, self.usuario.pk)
+        trabajo = self.procesar()
+        self.assertEqual(trabajo.resultado, {'cohorte': "Cohorte 1", 'estudiantes': 3})
+        self.assertEqual(self.client.get(reverse('descargar_trabajo', args=[trabajo.pk])).status_code, 200)
+
+        Trabajo.objects.filter(pk=trabajo.pk).update(vence=trabajo.terminado)
+        self.assertEqual(trabajos.limpiar(), (1, 0))
+        self.assertEqual(os.listdir(self.directorio), [])
+        self.assertEqual(self.client.get(reverse('descargar_trabajo', args=[trabajo.pk])).status_code, 404)
+
+    def test_solo_el_creador_o_el_administrador(self):
+        otro = Usuario.objects.create(nombre_usuario="otro", contrasena="-", rol="Secretaria")
+        trabajo = trabajos.crear('recalcular_expedientes', {}, otro.pk)
+        self.assertEqual(self.client.get(reverse('estado_trabajo', args=[trabajo.pk])).status_code, 404)
+        self.client.post(reverse('crear_trabajo'), {'tipo': 'recalcular_expedientes'})
+        self.assertEqual(Trabajo.objects.count(), 1)
+
+
+@override_settings(TRABAJOS_LATIDO_SEGUNDOS=0.05, TRABAJOS_ABANDONO_SEGUNDOS=0.3)
+class LatidoTrabajosTests(TransactionTestCase):
+    # TransactionTestCase: el latido escribe desde otro hilo, con su propia conexión
+
+    def setUp(self):
+        self.directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directorio, ignore_errors=True)
+        ajustes = override_settings(TRABAJOS_DIR=self.directorio)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+    def ejecutar(self, funcion):
+        with mock.patch.dict(trabajos.TIPOS, {'prueba': ("Prueba", funcion)}):
+            trabajos.crear('prueba', {})
+            return trabajos.ejecutar(trabajos.tomar())
+
+    def test_trabajo_lento_sin_avance_no_se_abandona(self):
+        def lento(trabajo, avance):
+            time.sleep(0.6)
+            return {'abandonados': trabajos.limpiar()[1]}
+
+        trabajo = self.ejecutar(lento)
+        self.assertEqual((trabajo.estado, trabajo.resultado), (Trabajo.TERMINADO, {'abandonados': 0}))
+
+    @override_settings(TRABAJOS_LATIDO_SEGUNDOS=60)
+    def test_abandonado_no_se_sobrescribe_al_terminar(self):
+        def abandonado(trabajo, avance):
+            trabajo.archivo = trabajos.nombre_archivo(trabajo, 'resultado.csv')
+            with open(trabajos.ruta(trabajo.archivo), 'w') as destino:
+                destino.write("a,b\n")
+            # Sin latidos, como si su proceso se hubiera detenido
+            Trabajo.objects.filter(pk=trabajo.pk).update(actualizado=timezone.now() - timedelta(hours=1))
+            self.assertEqual(trabajos.limpiar(), (0, 1))
+            return {'filas': 1}
+
+        with self.assertLogs('estudiantes.trabajos', 'WARNING'):
+            trabajo = self.ejecutar(abandonado)
+        self.assertEqual(trabajo.estado, Trabajo.FALLIDO)
+        self.assertEqual(trabajo.mensaje, "El proceso que lo ejecutaba se detuvo.")
+        self.assertIsNone(trabajo.resultado)
+        self.assertEqual(os.listdir(self.directorio), [])
+
+
+class EstaticosTests(TestCase):
+    def setUp(self):
+        self.destino = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.destino, True)
+
+    def test_plantillas_sin_cdn(self):
+        carpeta = os.path.join(os.path.dirname(__file__), 'templates')
+        for nombre in os.listdir(carpeta):
+            with open(os.path.join(carpeta, nombre), encoding='utf-8') as archivo:
+                with self.subTest(plantilla=nombre):
+                    self.assertIsNone(re.search(r'(src|href|url:)\s*=?\s*"https?://', archivo.read()))
+
+    def test_collectstatic_con_hash_comprimido_y_servido(self):
+        almacenamiento = {
+            'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+            'staticfiles': {'BACKEND': 'estudiantes.estaticos.EstaticosComprimidos'},
+        }
+        with override_settings(STATIC_ROOT=self.destino, STORAGES=almacenamiento, ESTATICOS_SERVIR=True):
+            call_command('collectstatic', interactive=False, verbosity=0)
+            with open(os.path.join(self.destino, 'staticfiles.json'), encoding='utf-8') as archivo:
+                nombre = json.load(archivo)['paths']['js/exportacion_diferida.js']
+            self.assertRegex(nombre, estaticos.CON_HASH)
+            ruta = os.path.join(self.destino, nombre)
+            self.assertTrue(os.path.exists(ruta + '.gz'))
+
+            cliente = Client()
+            respuesta = cliente.get(f'/static/{nombre}', HTTP_ACCEPT_ENCODING='gzip, deflate')
+            self.assertEqual(respuesta['Content-Encoding'], 'gzip')
+            self.assertEqual(respuesta['Content-Type'], 'text/javascript')
+            self.assertEqual(int(respuesta['Content-Length']), os.path.getsize(ruta + '.gz'))
+            self.assertIn('immutable', respuesta['Cache-Control'])
+            # Se envía por partes, sin leer el archivo entero en memoria
+            self.assertTrue(respuesta.streaming)
+            with open(ruta, 'rb') as archivo:
+                self.assertEqual(gzip.decompress(b''.join(respuesta.streaming_content)), archivo.read())
+            sin_hash = cliente.get('/static/js/exportacion_diferida.js')
+            self.assertFalse(sin_hash.has_header('Content-Encoding'))
+            self.assertEqual(sin_hash['Cache-Control'], estaticos.CACHE_SIN_HASH)
+            self.assertEqual(cliente.get('/static/js/no-existe.js').status_code, 404)
+            self.assertEqual(cliente.get('/static/../settings.py').status_code, 404)
+
+    def test_chequeo_de_despliegue_sin_librerias(self):
+        faltantes = [ruta for ruta in estaticos.LIBRERIAS if not finders.find(f'vendor/{ruta}')]
+        errores = estaticos.revisar_librerias(None)
+        self.assertEqual([error.id for error in errores], ['estudiantes.E001'] if faltantes else [])
+        with mock.patch.object(finders, 'find', return_value='/vendor/archivo'):
+            self.assertEqual(estaticos.revisar_librerias(None), [])
+
+    def test_libreria_faltante_es_error_en_produccion(self):
+        ruta = 'jquery/3.7.0/jquery.min.js'
+        with mock.patch.dict(estaticos._disponibles, {ruta: False}):
+            with override_settings(ESTATICOS_MANIFIESTO=False):
+                self.assertEqual(estaticos.url_libreria(ruta), estaticos.LIBRERIAS[ruta])
+            with override_settings(ESTATICOS_MANIFIESTO=True):
+                with self.assertRaises(ImproperlyConfigured):
+                    estaticos.url_libreria(ruta)
+
+    @skipUnless(VERSIONES.exists(), "vendor/ no está en el repositorio: ejecute descargar_estaticos")
+    def test_librerias_en_vendor_coinciden_con_versiones(self):
+        versiones = json.loads(VERSIONES.read_text(encoding='utf-8'))
+        for ruta in estaticos.LIBRERIAS:
+            with self.subTest(libreria=ruta):
+                self.assertIn(ruta, versiones)
+                archivo = VERSIONES.parent / ruta
+                self.assertTrue(archivo.exists())
+                self.assertEqual(hashlib.sha256(archivo.read_bytes()).hexdigest(), versiones[ruta]['sha256'])
+
+    def test_descarga_sigue_las_referencias_del_css(self):
+        from .management.commands.descargar_estaticos import Command
+        css = b'@font-face{src:url(../webfonts/fa-solid-900.woff2) format("woff2"),url("data:font/x;base64,AA")}'
+        self.assertEqual(
+            Command().referencias('font-awesome/6.5.0/css/all.min.css',
+                                  estaticos.LIBRERIAS['font-awesome/6.5.0/css/all.min.css'], css),
+            [('font-awesome/6.5.0/webfonts/fa-solid-900.woff2',
+              'https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.5.0/webfonts/fa-solid-900.woff2')],
+        )
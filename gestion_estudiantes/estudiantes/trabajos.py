@@ -0,0 +1,377 @@
+import csv
+import logging
+import os
+import re
+import threading
+import time
+import uuid
+import zipfile
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+from django.urls import reverse
+from django.utils import timezone
+
+from . import expedientes
+from .exportacion import TAMANO_BLOQUE, generar_csv, generar_xlsx
+from .importacion import Importador, leer_filas
+from .models import Cohorte, DocumentoEstudiante, Trabajo
+
+
+logger = logging.getLogger('estudiantes.trabajos')
+
+
+# ====================================
+# ===== TRABAJOS EN SEGUNDO PLANO ====
+# ====================================
+#
+# Las tareas largas (exportaciones grandes, importaciones, recálculo de todos los
+# expedientes, paquetes por cohorte) se guardan como filas de Trabajo y las ejecuta
+# el comando procesar_trabajos con un pool de hilos, fuera de las peticiones. No hace
+# falta otro servicio: la cola es la propia tabla. Varios procesos pueden atenderla a
+# la vez porque cada trabajo se toma con un UPDATE condicionado al estado.
+#
+# La página de trabajos consulta el avance en estado_trabajo (JSON). Los archivos
+# generados quedan en TRABAJOS_DIR hasta TRABAJOS_VENCE_SEGUNDOS después de terminar;
+# luego limpiar() los borra. Mientras un trabajo corre, un latido renueva su fecha
+# de actualización aunque no informe avance: limpiar() da por abandonados (su proceso
+# se detuvo) solo los que dejan de latir.
+#
+# Cada tipo es una función (trabajo, avance) que devuelve el resultado (un diccionario
+# para JSON) y, si genera un archivo, lo escribe en ruta(nombre_archivo(trabajo, ...))
+# y deja ese nombre en trabajo.archivo.
+
+TIPOS = {}
+
+
+def tipo(nombre, titulo):
+    def registrar(funcion):
+        TIPOS[nombre] = (titulo, funcion)
+        return funcion
+    return registrar
+
+
+# ===== Archivos =====
+
+_NOMBRE_VALIDO = re.compile(r'^[\w.-]+$')
+
+
+def ruta(nombre):
+    return os.path.join(settings.TRABAJOS_DIR, nombre)
+
+
+def nombre_archivo(trabajo, nombre):
+    return f"{trabajo.pk}-{nombre}"
+
+
+def guardar_entrada(archivo):
+    """
+    Copia un archivo subido a TRABAJOS_DIR (para importarlo después) y devuelve su nombre.
+    """
+    os.makedirs(settings.TRABAJOS_DIR, exist_ok=True)
+    extension = os.path.splitext(archivo.name)[1].lower()
+    nombre = f"entrada-{uuid.uuid4().hex}{extension}"
+    with open(ruta(nombre), 'wb') as destino:
+        for bloque in archivo.chunks():
+            destino.write(bloque)
+    return nombre
+
+
+def ruta_resultado(trabajo):
+    """
+    Ruta del archivo generado por el trabajo, o None si no hay o ya venció.
+    """
+    if not trabajo.archivo or not _NOMBRE_VALIDO.match(trabajo.archivo):
+        return None
+    if trabajo.vence and trabajo.vence <= timezone.now():
+        return None
+    archivo = ruta(trabajo.archivo)
+    return archivo if os.path.isfile(archivo) else None
+
+
+# ===== Cola =====
+
+def crear(nombre_tipo, parametros, usuario_id=None):
+    if nombre_tipo not in TIPOS:
+        raise ValueError(f"Tipo de trabajo desconocido: {nombre_tipo}")
+    return Trabajo.objects.create(tipo=nombre_tipo, parametros=parametros, usuario_id=usuario_id)
+
+
+def tomar():
+    """
+    Marca como en curso el trabajo pendiente más antiguo y lo devuelve (None si no hay).
+    Si otro proceso lo toma primero, se intenta con el siguiente.
+    """
+    pendientes = (Trabajo.objects.filter(estado=Trabajo.PENDIENTE)
+                  .order_by('creado', 'pk').values_list('pk', flat=True))
+    for pk in pendientes[:10]:
+        ahora = timezone.now()
+        tomado = Trabajo.objects.filter(pk=pk, estado=Trabajo.PENDIENTE).update(
+            estado=Trabajo.EN_CURSO, iniciado=ahora, actualizado=ahora,
+        )
+        if tomado:
+            return Trabajo.objects.get(pk=pk)
+    return None
+
+
+class Avance:
+    """
+    avance(hecho, total=None, mensaje='') guarda el avance del trabajo, a lo sumo una
+    vez cada TRABAJOS_AVANCE_SEGUNDOS para no escribir en la base de datos por cada fila.
+    """
+    def __init__(self, trabajo):
+        self.trabajo = trabajo
+        self.ultimo = 0.0
+
+    def __call__(self, hecho, total=None, mensaje=''):
+        ahora = time.monotonic()
+        if ahora - self.ultimo < settings.TRABAJOS_AVANCE_SEGUNDOS:
+            return
+        self.ultimo = ahora
+        campos = {'hecho': hecho, 'total': total, 'mensaje': mensaje[:200], 'actualizado': timezone.now()}
+        Trabajo.objects.filter(pk=self.trabajo.pk, estado=Trabajo.EN_CURSO).update(**campos)
+        for campo, valor in campos.items():
+            setattr(self.trabajo, campo, valor)
+
+
+class Latido:
+    """
+    Desde otro hilo, renueva 'actualizado' cada TRABAJOS_LATIDO_SEGUNDOS mientras dura
+    el bloque 'with', aunque el trabajo pase mucho tiempo sin llamar a avance (una
+    consulta larga, comprimir un archivo grande).
+    """
+    def __init__(self, trabajo):
+        self.trabajo = trabajo
+        self.detener = threading.Event()
+        self.hilo = threading.Thread(target=self.latir, name=f'latido-{trabajo.pk}', daemon=True)
+
+    def __enter__(self):
+        self.hilo.start()
+        return self
+
+    def __exit__(self, *error):
+        self.detener.set()
+        self.hilo.join()
+
+    def latir(self):
+        try:
+            while not self.detener.wait(settings.TRABAJOS_LATIDO_SEGUNDOS):
+                try:
+                    Trabajo.objects.filter(pk=self.trabajo.pk, estado=Trabajo.EN_CURSO).update(
+                        actualizado=timezone.now(),
+                    )
+                except Exception:
+                    # Un latido perdido (base de datos ocupada) no detiene el trabajo
+                    logger.warning("No se pudo guardar el latido del trabajo %s", self.trabajo.pk, exc_info=True)
+        finally:
+            connection.close()
+
+
+# Campos que ejecutar() guarda al terminar
+CAMPOS_FINALES = ['estado', 'mensaje', 'hecho', 'total', 'resultado', 'archivo', 'terminado', 'vence', 'actualizado']
+
+
+def ejecutar(trabajo):
+    """
+    Ejecuta un trabajo ya tomado y guarda su resultado o el error. Si mientras tanto
+    limpiar() lo dio por abandonado, no se sobrescribe ese estado y se borra el archivo.
+    """
+    close_old_connections()
+    titulo, funcion = TIPOS[trabajo.tipo]
+    try:
+        with Latido(trabajo):
+            trabajo.resultado = funcion(trabajo, Avance(trabajo))
+        trabajo.estado = Trabajo.TERMINADO
+        trabajo.mensaje = ''
+        if trabajo.total is not None:
+            trabajo.hecho = trabajo.total
+    except Exception as error:
+        logger.exception("Falló el trabajo %s", trabajo.pk)
+        trabajo.estado = Trabajo.FALLIDO
+        trabajo.mensaje = str(error)[:200] or error.__class__.__name__
+        # No se ofrece un archivo a medio escribir
+        if trabajo.archivo and os.path.isfile(ruta(trabajo.archivo)):
+            os.remove(ruta(trabajo.archivo))
+        trabajo.archivo = ''
+    trabajo.terminado = trabajo.actualizado = timezone.now()
+    trabajo.vence = trabajo.terminado + timedelta(seconds=settings.TRABAJOS_VENCE_SEGUNDOS)
+    guardado = Trabajo.objects.filter(pk=trabajo.pk, estado=Trabajo.EN_CURSO).update(
+        **{campo: getattr(trabajo, campo) for campo in CAMPOS_FINALES}
+    )
+    if not guardado:
+        logger.warning("El trabajo %s terminó después de darse por abandonado", trabajo.pk)
+        if trabajo.archivo and _NOMBRE_VALIDO.match(trabajo.archivo) and os.path.isfile(ruta(trabajo.archivo)):
+            os.remove(ruta(trabajo.archivo))
+        trabajo.refresh_from_db()
+    close_old_connections()
+    return trabajo
+
+
+def limpiar():
+    """
+    Borra los archivos vencidos y marca como fallidos los trabajos en curso sin latido
+    hace TRABAJOS_ABANDONO_SEGUNDOS (su proceso se detuvo). Devuelve
+    (archivos borrados, trabajos abandonados).
+    """
+    ahora = timezone.now()
+    borrados = 0
+    vencidos = Trabajo.objects.filter(vence__lte=ahora).exclude(archivo='')
+    for nombre in vencidos.values_list('archivo', flat=True):
+        if _NOMBRE_VALIDO.match(nombre) and os.path.isfile(ruta(nombre)):
+            os.remove(ruta(nombre))
+            borrados += 1
+    vencidos.update(archivo='')
+
+    abandonados = Trabajo.objects.filter(
+        estado=Trabajo.EN_CURSO,
+        actualizado__lt=ahora - timedelta(seconds=settings.TRABAJOS_ABANDONO_SEGUNDOS),
+    ).update(estado=Trabajo.FALLIDO, mensaje="El proceso que lo ejecutaba se detuvo.", terminado=ahora)
+    return borrados, abandonados
+
+
+def como_dict(trabajo):
+    """
+    Estado del trabajo para la consulta de avance (JSON).
+    """
+    porcentaje = None
+    if trabajo.total:
+        porcentaje = round(min(trabajo.hecho, trabajo.total) / trabajo.total * 100, 1)
+    elif trabajo.estado == Trabajo.TERMINADO:
+        porcentaje = 100
+    return {
+        'id': trabajo.pk,
+        'tipo': trabajo.tipo,
+        'titulo': TIPOS[trabajo.tipo][0] if trabajo.tipo in TIPOS else trabajo.tipo,
+        'estado': trabajo.estado,
+        'hecho': trabajo.hecho,
+        'total': trabajo.total,
+        'porcentaje': porcentaje,
+        'mensaje': trabajo.mensaje,
+        'resultado': trabajo.resultado,
+        'creado': trabajo.creado.isoformat(),
+        'terminado': trabajo.terminado.isoformat() if trabajo.terminado else None,
+        'descarga': reverse('descargar_trabajo', args=[trabajo.pk]) if ruta_resultado(trabajo) else None,
+    }
+
+
+# ===== Tipos de trabajo =====
+
+class _Contador:
+    """
+    Recorre 'filas' informando el avance; al terminar, 'hecho' tiene la cantidad.
+    """
+    def __init__(self, filas, avance, total=None):
+        self.filas = filas
+        self.avance = avance
+        self.total = total
+        self.hecho = 0
+
+    def __iter__(self):
+        for fila in self.filas:
+            self.hecho += 1
+            self.avance(self.hecho, self.total)
+            yield fila
+
+
+def _escribir(destino, formato, encabezado, filas, hoja):
+    if formato == 'xlsx':
+        for parte in generar_xlsx(encabezado, filas, hoja):
+            destino.write(parte)
+    else:
+        for parte in generar_csv(encabezado, filas):
+            destino.write(parte.encode('utf-8'))
+
+
+@tipo('exportar', "Exportación")
+def exportar(trabajo, avance):
+    """
+    Parámetros: reporte y formato (los de exportar en views.py) y filtros (los de la
+    lista de estudiantes).
+    """
+    from .views import EXPORTACIONES
+
+    reporte = trabajo.parametros['reporte']
+    formato = trabajo.parametros['formato']
+    titulo, encabezado, filas = EXPORTACIONES[reporte]
+    trabajo.archivo = nombre_archivo(trabajo, f"{reporte}-{timezone.localdate().isoformat()}.{formato}")
+    os.makedirs(settings.TRABAJOS_DIR, exist_ok=True)
+    contador = _Contador(filas(trabajo.parametros.get('filtros', {})), avance)
+    with open(ruta(trabajo.archivo), 'wb') as destino:
+        _escribir(destino, formato, encabezado, contador, titulo)
+    trabajo.hecho = contador.hecho
+    return {'filas': contador.hecho}
+
+
+@tipo('importar', "Importación")
+def importar(trabajo, avance):
+    """
+    Parámetros: entrada (archivo guardado con guardar_entrada) y nombre (el original).
+    Los errores de las filas quedan en un CSV descargable.
+    """
+    entrada = ruta(trabajo.parametros['entrada'])
+    try:
+        with open(entrada, 'rb') as archivo:
+            tamano = os.fstat(archivo.fileno()).st_size
+
+            def filas():
+                # El avance se mide en bytes leídos del archivo
+                leido = 0
+                for fila in leer_filas(archivo, trabajo.parametros['nombre']):
+                    leido = max(leido, min(archivo.tell(), tamano))
+                    avance(leido, tamano)
+                    yield fila
+
+            resultado = Importador().importar(filas())
+    finally:
+        if os.path.isfile(entrada):
+            os.remove(entrada)
+
+    if resultado.errores:
+        trabajo.archivo = nombre_archivo(trabajo, 'errores.csv')
+        with open(ruta(trabajo.archivo), 'w', encoding='utf-8-sig', newline='') as destino:
+            escritor = csv.writer(destino)
+            escritor.writerow(['Fila', 'Error'])
+            escritor.writerows(resultado.errores)
+    return {
+        'creados': resultado.creados,
+        'errores': len(resultado.errores),
+        'primeros_errores': resultado.errores[:settings.TRABAJOS_ERRORES_MOSTRADOS],
+    }
+
+
+@tipo('recalcular_expedientes', "Recálculo de expedientes")
+def recalcular_expedientes(trabajo, avance):
+    return {'actualizados': expedientes.recalcular_por_lotes(avance=avance)}
+
+
+@tipo('paquete_cohorte', "Paquete de cohorte")
+def paquete_cohorte(trabajo, avance):
+    """
+    Parámetros: cohorte (id). Genera un .zip con la lista de estudiantes de la cohorte
+    (Excel) y el estado de cada uno de sus documentos (CSV).
+    """
+    from .views import EXPORTACIONES
+
+    cohorte = Cohorte.objects.get(pk=trabajo.parametros['cohorte'])
+    titulo, encabezado, filas = EXPORTACIONES['estudiantes']
+    filtros = {'cohorte': str(cohorte.pk)}
+    total = cohorte.estudiante_set.count()
+    documentos = (
+        DocumentoEstudiante.objects.filter(estudiante__cohorte=cohorte)
+        .order_by('estudiante__apellidos', 'estudiante__nombres', 'estudiante_id', 'tipo_documento')
+        .values_list('estudiante__cedula', 'estudiante__apellidos', 'estudiante__nombres',
+                     'tipo_documento', 'estado_documento', 'observacion')
+        .iterator(chunk_size=TAMANO_BLOQUE)
+    )
+
+    nombre = re.sub(r'[^\w.-]+', '-', cohorte.nombre_cohorte).strip('-') or str(cohorte.pk)
+    trabajo.archivo = nombre_archivo(trabajo, f"cohorte-{nombre}.zip")
+    os.makedirs(settings.TRABAJOS_DIR, exist_ok=True)
+    with zipfile.ZipFile(ruta(trabajo.archivo), 'w', zipfile.ZIP_DEFLATED) as paquete:
+        with paquete.open('estudiantes.xlsx', 'w') as destino:
+            _escribir(destino, 'xlsx', encabezado, _Contador(filas(filtros), avance, total), titulo)
+        with paquete.open('documentos.csv', 'w') as destino:
+            _escribir(destino, 'csv', ['Cédula', 'Apellidos', 'Nombres', 'Documento', 'Estado', 'Observación'],
+                      documentos, titulo)
+    return {'cohorte': cohorte.nombre_cohorte, 'estudiantes': total}
@@ -8,10 +8,16 @@ urlpatterns = [
     
     # Estudiantes
     path('estudiantes/', views.listar_estudiantes, name='listar_estudiantes'),
+    path('estudiantes/datos/', views.listar_estudiantes_datos, name='listar_estudiantes_datos'),
+    path('estudiantes/todos/', views.listar_estudiantes_todos, name='listar_estudiantes_todos'),
+    path('estudiantes/buscar/', views.buscar_estudiantes, name='buscar_estudiantes'),
     path('registrar/', views.registrar_estudiante, name='registrar_estudiante'),
+    path('importar/', views.importar_estudiantes, name='importar_estudiantes'),
     path('editar/<int:pk>/', views.editar_estudiante, name='editar_estudiante'),
     path('detalle/<int:pk>/', views.detalle_estudiante, name='detalle_estudiante'),
     path('eliminar/<int:pk>/', views.eliminar_estudiante, name='eliminar_estudiante'),
+    path('documentos/en-bloque/', views.operaciones_documentos, name='operaciones_documentos'),
+    path('documentos/en-bloque/api/', views.operaciones_documentos_api, name='operaciones_documentos_api'),
 
     
     path('extensiones/', views.listar_extensiones, name='listar_extensiones'),
@@ -45,6 +51,35 @@ urlpatterns = [
     path('reportes/expedientes-incompletos/', views.reporte_expedientes_incompletos, name='reporte_expedientes_incompletos'),
     path('reportes/comparativa-especialidad/', views.comparativa_especialidad, name='comparativa_especialidad'),
     path('reportes/comparativa-extension/', views.comparativa_extension, name='comparativa_extension'),
+    path('reportes/panel/', views.panel_reportes, name='panel_reportes'),
+    path('reportes/tabla-dinamica/', views.reporte_pivote, name='reporte_pivote'),
+    path('reportes/tabla-dinamica/exportar/<slug:formato>/', views.exportar_pivote, name='exportar_pivote'),
+
+    # --- Exportaciones (CSV / XLSX generados en el servidor) ---
+    path('exportar/<slug:reporte>/<slug:formato>/', views.exportar, name='exportar'),
+
+    # --- Estado de la caché de datos de referencia (solo administrador) ---
+    path('estado/referencias/', views.estado_referencias, name='estado_referencias'),
+
+    # --- Perfiles de peticiones (solo administrador) ---
+    path('perfiles/', views.listar_perfiles, name='listar_perfiles'),
+    path('perfiles/<str:nombre>/', views.descargar_perfil, name='descargar_perfil'),
+
+    # --- Auditoría de cambios (solo administrador) ---
+    path('auditoria/', views.listar_auditoria, name='listar_auditoria'),
+
+    # --- Trabajos en segundo plano (exportaciones, importaciones, recálculos) ---
+    path('trabajos/', views.listar_trabajos, name='listar_trabajos'),
+    path('trabajos/crear/', views.crear_trabajo, name='crear_trabajo'),
+    path('trabajos/<int:pk>/estado/', views.estado_trabajo, name='estado_trabajo'),
+    path('trabajos/<int:pk>/descargar/', views.descargar_trabajo, name='descargar_trabajo'),
+
+    # --- API JSON de solo lectura (versión 1) ---
+    path('api/v1/estudiantes/', views.api_estudiantes, name='api_estudiantes'),
+    path('api/v1/estudiantes/cambios/', views.api_cambios, name='api_cambios'),
+    path('api/v1/cohortes/', views.api_referencias, {'tabla': 'cohortes'}, name='api_cohortes'),
+    path('api/v1/especialidades/', views.api_referencias, {'tabla': 'especialidades'}, name='api_especialidades'),
+    path('api/v1/extensiones/', views.api_referencias, {'tabla': 'extensiones'}, name='api_extensiones'),
 
     
     
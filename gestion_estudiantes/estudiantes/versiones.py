@@ -0,0 +1,113 @@
+import asyncio
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+
+# ====================================
+# ===== VERSIONES DE DATOS ===========
+# ====================================
+#
+# Contadores guardados en la caché compartida que cambian cada vez que cambian
+# ciertos datos. Quien guarda algo calculado lo asocia a la versión vigente; al
+# cambiar la versión, lo guardado deja de usarse sin tener que borrarlo.
+# Si la caché pierde un contador, se reinicia con la hora actual en nanosegundos
+# para que nunca repita un valor anterior.
+
+def _clave(nombre):
+    return f'version:{nombre}'
+
+
+def version(nombre):
+    clave = _clave(nombre)
+    valor = cache.get(clave)
+    if valor is None:
+        cache.add(clave, time.time_ns(), timeout=None)
+        valor = cache.get(clave)
+    return valor
+
+
+async def aversion(nombre):
+    clave = _clave(nombre)
+    valor = await cache.aget(clave)
+    if valor is None:
+        await cache.aadd(clave, time.time_ns(), timeout=None)
+        valor = await cache.aget(clave)
+    return valor
+
+
+def incrementar(nombre):
+    """
+    Cambia la versión cuando se confirma la transacción en curso (de inmediato si no hay
+    transacción), así nadie calcula con datos viejos bajo la versión nueva.
+    """
+    def _incrementar():
+        try:
+            cache.incr(_clave(nombre))
+        except ValueError:
+            cache.set(_clave(nombre), time.time_ns(), timeout=None)
+    transaction.on_commit(_incrementar)
+
+
+# ===== Valores calculados =====
+# Tras un cambio de versión, solo un proceso recalcula; los demás esperan unos
+# instantes a que el valor esté listo.
+
+SEGUNDOS_BLOQUEO = 30
+ESPERA_MAXIMA = 5
+INTERVALO_ESPERA = 0.05
+
+
+def obtener_o_calcular(clave, calcular, segundos):
+    """
+    Devuelve el valor guardado en la caché con esa clave (que debe incluir la versión),
+    o lo calcula con calcular() y lo guarda por 'segundos'.
+    """
+    datos = cache.get(clave)
+    if datos is not None:
+        return datos
+
+    # Solo quien consigue el bloqueo recalcula (evita que todos consulten a la vez)
+    if cache.add(f'{clave}:calculando', True, timeout=SEGUNDOS_BLOQUEO):
+        try:
+            datos = calcular()
+            cache.set(clave, datos, timeout=segundos)
+        finally:
+            cache.delete(f'{clave}:calculando')
+        return datos
+
+    limite = time.monotonic() + ESPERA_MAXIMA
+    while time.monotonic() < limite:
+        time.sleep(INTERVALO_ESPERA)
+        datos = cache.get(clave)
+        if datos is not None:
+            return datos
+    # Quien calculaba tardó demasiado: se calcula sin guardar
+    return calcular()
+
+
+async def aobtener_o_calcular(clave, calcular, segundos):
+    """
+    Como obtener_o_calcular(), para vistas async: calcular es una corrutina y la
+    espera no bloquea el bucle de eventos.
+    """
+    datos = await cache.aget(clave)
+    if datos is not None:
+        return datos
+
+    if await cache.aadd(f'{clave}:calculando', True, timeout=SEGUNDOS_BLOQUEO):
+        try:
+            datos = await calcular()
+            await cache.aset(clave, datos, timeout=segundos)
+        finally:
+            await cache.adelete(f'{clave}:calculando')
+        return datos
+
+    limite = time.monotonic() + ESPERA_MAXIMA
+    while time.monotonic() < limite:
+        await asyncio.sleep(INTERVALO_ESPERA)
+        datos = await cache.aget(clave)
+        if datos is not None:
+            return datos
+    return await calcular()
@@ -1,12 +1,20 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse
 from django.contrib import messages
-from .models import Estudiante, DocumentoEstudiante, Extension, Usuario, Cohorte, Especialidad
-from .forms import EstudianteForm, ExtensionForm, UsuarioForm, CohorteForm, EspecialidadForm
+from .models import Estudiante, DocumentoEstudiante, Extension, Usuario, Cohorte, Especialidad, RegistroAuditoria, Trabajo
+from .forms import EstudianteForm, ExtensionForm, UsuarioForm, CohorteForm, EspecialidadForm, ImportarEstudiantesForm, OperacionDocumentosForm
+from . import api, asincrono, auditoria, busqueda, condicional, documentos, expedientes, matricula, perfiles, pivote, referencias, streaming, tablero, trabajos
+from .paginacion import paginar
+from .importacion import ErrorImportacion, importar_archivo
+from .exportacion import FORMATOS, TAMANO_BLOQUE, respuesta_exportacion
 from django.db import transaction
+from django.conf import settings
 from django.contrib.auth.hashers import make_password, check_password
-from django.db.models import Count, Q
-from django.http import JsonResponse
+from django.http import FileResponse, JsonResponse, Http404
 import json
+from datetime import datetime, time, timedelta
+from django.utils import timezone
+from django.utils.dateparse import parse_date
 
 
 def user_role(request):
@@ -33,26 +41,13 @@ TIPOS_DOCUMENTO = [
 
 ESTADOS_DOCUMENTO = ["Sí", "No", "Copia", "Vencida", "Vacío"]
 
-def home(request):
-            # Verificar si hay usuario en sesión
-    if not request.session.get('usuario_id'):
+@condicional.segun_tablas('estudiantes', 'cohortes', 'especialidades')
+async def home(request):
+    # Verificar si hay usuario en sesión
+    if not await request.session.aget('usuario_id'):
         return redirect('login_usuario')
-    # Conteo de estudiantes por cohorte
-    cohorte_data = Estudiante.objects.values('cohorte__nombre_cohorte').annotate(count=Count('id')).order_by('cohorte__nombre_cohorte')
-    cohorte_labels = [item['cohorte__nombre_cohorte'] for item in cohorte_data]
-    cohorte_counts = [item['count'] for item in cohorte_data]
-
-    # Conteo de estudiantes por especialidad
-    especialidad_data = Estudiante.objects.values('especialidad__nombre_especialidad').annotate(count=Count('id')).order_by('especialidad__nombre_especialidad')
-    especialidad_labels = [item['especialidad__nombre_especialidad'] for item in especialidad_data]
-    especialidad_counts = [item['count'] for item in especialidad_data]
-
-    context = {
-        'cohorte_labels': cohorte_labels,
-        'cohorte_counts': cohorte_counts,
-        'especialidad_labels': especialidad_labels,
-        'especialidad_counts': especialidad_counts,
-    }
+    # Conteos por cohorte y especialidad, desde la caché (ver tablero.py)
+    context = await tablero.adatos_tablero()
 
     return render(request, 'home.html', context)
 
@@ -61,11 +56,6 @@ def home(request):
 # ===== CRUD DE ESTUDIANTES ==========
 # ====================================
 
-def listar_estudiantes(request):
-    estudiantes = Estudiante.objects.all()
-    return render(request, 'listar_estudiantes.html', {'estudiantes': estudiantes})
-
-
 # ===== REGISTRAR ESTUDIANTE =====
 def registrar_estudiante(request):
     if solo_consulta(request):
@@ -74,17 +64,12 @@ def registrar_estudiante(request):
     if request.method == 'POST':
         form = EstudianteForm(request.POST)
         if form.is_valid():
-            # Guarda el estudiante
-            estudiante = form.save()
-
-            # Crear automáticamente los documentos con estado inicial
-            for tipo in TIPOS_DOCUMENTO:
-                estado = request.POST.get(tipo, "Vacío")
-                DocumentoEstudiante.objects.create(
-                    estudiante=estudiante,
-                    tipo_documento=tipo,
-                    estado_documento=estado
-                )
+            # Todos los documentos se crean, con "Vacío" si no se indicó el estado
+            estados = documentos.estados_enviados(request.POST, por_defecto="Vacío")
+            estudiante = form.save(commit=False)
+            with transaction.atomic():
+                documentos.guardar(estudiante, estados)
+                auditoria.registrar(auditoria.CREAR, estudiante)
 
             messages.success(request, "✅ Estudiante registrado correctamente.")
             return redirect('listar_estudiantes')
@@ -100,43 +85,136 @@ def registrar_estudiante(request):
     })
 
 
+# ===== IMPORTAR ESTUDIANTES =====
+ERRORES_MOSTRADOS = 200
+
+
+def importar_estudiantes(request):
+    if solo_consulta(request):
+        messages.error(request, "No tienes permisos para agregar estudiantes.")
+        return redirect('listar_estudiantes')
+    contexto = {'tipos': TIPOS_DOCUMENTO, 'estados': ESTADOS_DOCUMENTO}
+    if request.method == 'POST':
+        form = ImportarEstudiantesForm(request.POST, request.FILES)
+        if form.is_valid():
+            archivo = form.cleaned_data['archivo']
+            if form.cleaned_data['segundo_plano']:
+                trabajo = trabajos.crear('importar', {
+                    'entrada': trabajos.guardar_entrada(archivo),
+                    'nombre': archivo.name,
+                }, request.session.get('usuario_id'))
+                messages.success(request, f"⏳ Importación en cola (trabajo #{trabajo.pk}).")
+                return redirect('listar_trabajos')
+            try:
+                resultado = importar_archivo(archivo, archivo.name)
+            except ErrorImportacion as error:
+                contexto['error_archivo'] = str(error)
+            else:
+                contexto['resultado'] = resultado
+                contexto['errores'] = resultado.errores[:ERRORES_MOSTRADOS]
+                contexto['errores_ocultos'] = max(len(resultado.errores) - ERRORES_MOSTRADOS, 0)
+                messages.success(request, f"✅ {resultado.creados} estudiantes importados.")
+    else:
+        form = ImportarEstudiantesForm()
+    contexto['form'] = form
+    return render(request, 'importar_estudiantes.html', contexto)
+
+
 # ===== EDITAR ESTUDIANTE =====
-@transaction.atomic
 def editar_estudiante(request, pk):
     if not solo_admin(request):
         messages.error(request, "No tienes permisos para editar estudiantes.")
         return redirect('listar_estudiantes')
-    estudiante = get_object_or_404(Estudiante, pk=pk)
     if request.method == 'POST':
-        form = EstudianteForm(request.POST, instance=estudiante)
-        if form.is_valid():
-            form.save()
-            # Actualizar estados de documentos
-            for tipo in TIPOS_DOCUMENTO:
-                estado = request.POST.get(tipo)
-                if estado:
-                    doc, created = DocumentoEstudiante.objects.get_or_create(
-                        estudiante=estudiante, tipo_documento=tipo
-                    )
-                    doc.estado_documento = estado
-                    doc.save()
-
-            messages.success(request, "✅ Estudiante actualizado correctamente.")
-            return redirect('listar_estudiantes')
-        else:
-            messages.error(request, "❌ Corrige los errores en el formulario.")
+        # Solo el POST abre la transacción: con transaction_mode IMMEDIATE toma el
+        # bloqueo de escritura, que el GET no necesita para mostrar el formulario
+        with transaction.atomic():
+            estudiante = get_object_or_404(Estudiante, pk=pk)
+            antes = auditoria.instantanea(estudiante)
+            form = EstudianteForm(request.POST, instance=estudiante)
+            if form.is_valid():
+                # Guarda el estudiante y solo los documentos que cambiaron
+                documentos.guardar(form.save(commit=False), documentos.estados_enviados(request.POST),
+                                   documentos.fechas_enviadas(request.POST))
+                auditoria.registrar(auditoria.EDITAR, estudiante, antes)
+                messages.success(request, "✅ Estudiante actualizado correctamente.")
+                return redirect('listar_estudiantes')
+        messages.error(request, "❌ Corrige los errores en el formulario.")
     else:
+        estudiante = get_object_or_404(Estudiante, pk=pk)
         form = EstudianteForm(instance=estudiante)
-        documentos = DocumentoEstudiante.objects.filter(estudiante=estudiante)
 
     return render(request, 'editar_estudiante.html', {
         'form': form,
-        'documentos': documentos,
+        'documentos': DocumentoEstudiante.objects.filter(estudiante=estudiante),
         'estados': ESTADOS_DOCUMENTO
     })
 
 
+# ===== DOCUMENTOS EN BLOQUE =====
+# Cambia un documento a todos los estudiantes de un filtro (ver documentos.en_bloque).
+# Primero se muestra cuántos cambiarían y se aplica al confirmar.
+def _puede_operar_documentos(request):
+    return solo_admin(request) or solo_secretaria(request)
+
+
+def operaciones_documentos(request):
+    if not _puede_operar_documentos(request):
+        messages.error(request, "No tienes permisos para cambiar documentos.")
+        return redirect('listar_estudiantes')
+    previa = None
+    if request.method == 'POST':
+        form = OperacionDocumentosForm(request.POST)
+        if form.is_valid():
+            aplicar = request.POST.get('accion') == 'aplicar'
+            resultado = documentos.en_bloque(
+                form.cleaned_data['tipo_documento'], form.cleaned_data['estado_documento'],
+                form.filtros(), observacion=form.nueva_observacion(), aplicar=aplicar,
+            )
+            if aplicar:
+                messages.success(request, f"✅ {resultado['actualizados']} documentos actualizados y "
+                                          f"{resultado['creados']} creados.")
+                return redirect('operaciones_documentos')
+            previa = resultado
+        else:
+            messages.error(request, "❌ Corrige los errores en el formulario.")
+    else:
+        form = OperacionDocumentosForm()
+    return render(request, 'operaciones_documentos.html', {'form': form, 'previa': previa})
+
+
+def operaciones_documentos_api(request):
+    """
+    POST con JSON: {"tipo_documento", "estado_documento", "observacion", "cohorte",
+    "especialidad", "extension", "cedulas": [...], "aplicar": false}. Devuelve los conteos
+    de documentos.en_bloque; sin "aplicar": true no cambia nada.
+    """
+    if not request.session.get('usuario_id'):
+        return JsonResponse({'error': 'Sesión no iniciada.'}, status=401)
+    if not _puede_operar_documentos(request):
+        return JsonResponse({'error': 'No tienes permisos.'}, status=403)
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Usa POST.'}, status=405)
+    try:
+        datos = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({'error': 'JSON no válido.'}, status=400)
+    if not isinstance(datos, dict):
+        return JsonResponse({'error': 'Se espera un objeto JSON.'}, status=400)
+    if isinstance(datos.get('cedulas'), list):
+        datos['cedulas'] = ",".join(str(cedula) for cedula in datos['cedulas'])
+    form = OperacionDocumentosForm(datos)
+    if not form.is_valid():
+        return JsonResponse({'error': form.errors.get_json_data()}, status=400)
+    resultado = documentos.en_bloque(
+        form.cleaned_data['tipo_documento'], form.cleaned_data['estado_documento'],
+        form.filtros(), observacion=form.nueva_observacion(), aplicar=datos.get('aplicar') is True,
+    )
+    return JsonResponse(resultado)
+
+
 # ===== DETALLE DE ESTUDIANTE =====
+@condicional.segun_tablas('estudiantes', 'documentos', 'cohortes', 'especialidades', 'extensiones')
 def detalle_estudiante(request, pk):
     estudiante = get_object_or_404(Estudiante, pk=pk)
     documentos = DocumentoEstudiante.objects.filter(estudiante=estudiante)
@@ -153,25 +231,160 @@ def eliminar_estudiante(request, pk):
         return redirect('listar_estudiantes')
     estudiante = get_object_or_404(Estudiante, pk=pk)
     if request.method == 'POST':
-        estudiante.delete()
+        with transaction.atomic():
+            auditoria.registrar(auditoria.ELIMINAR, estudiante)
+            estudiante.delete()
         messages.success(request, "🗑️ Estudiante eliminado correctamente.")
         return redirect('listar_estudiantes')
     return render(request, 'eliminar_estudiante.html', {'estudiante': estudiante})
 
 
 # ===== LISTAR ESTUDIANTES =====
+@condicional.segun_tablas('cohortes', 'especialidades', 'extensiones')
 def listar_estudiantes(request):
-    estudiantes = Estudiante.objects.all().order_by('apellidos', 'nombres')
+    # Las filas se cargan por páginas desde listar_estudiantes_datos
     return render(request, 'listar_estudiantes.html', {
-        'estudiantes': estudiantes
+        'cohortes': referencias.obtener('cohortes'),
+        'especialidades': referencias.obtener('especialidades'),
+        'extensiones': referencias.obtener('extensiones'),
+        'expedientes': Estudiante.EXPEDIENTES,
+    })
+
+
+# Filas de la vista "todos" (format_html_join); {0} es el id del estudiante
+FILA_ESTUDIANTE = '<tr><td>{1}</td><td>{2}</td><td>{3}</td><td>%s</td></tr>\n'
+ACCION_ESTUDIANTE = '<a href="%s{0}/" class="btn-icon %s" title="%s"><i class="fas %s"></i></a>'
+ACCIONES_ESTUDIANTE = [
+    ('detalle_estudiante', 'view', 'Ver', 'fa-eye'),
+    ('editar_estudiante', 'edit', 'Editar', 'fa-edit'),
+    ('eliminar_estudiante', 'delete', 'Eliminar', 'fa-trash-alt'),
+]
+
+
+def _accion_estudiante(ruta, clase, titulo, icono):
+    # La URL sin el id se calcula una vez: reverse() en cada fila costaría más que el
+    # resto de la fila
+    url = reverse(ruta, args=[0])[:-len('0/')]
+    return ACCION_ESTUDIANTE % (url, clase, titulo, icono)
+
+
+@condicional.segun_tablas('estudiantes', 'cohortes', 'especialidades', 'extensiones')
+def listar_estudiantes_todos(request):
+    """
+    Todos los estudiantes que cumplen los filtros de la lista, en una sola tabla que
+    se envía en streaming (ver streaming.py).
+    """
+    acciones = ACCIONES_ESTUDIANTE if solo_admin(request) else ACCIONES_ESTUDIANTE[:1]
+    fila = FILA_ESTUDIANTE % ''.join(_accion_estudiante(*accion) for accion in acciones)
+    filas = (
+        filtrar_estudiantes(request.GET)
+        .order_by('apellidos', 'nombres', 'id')
+        .values_list('id', 'cedula', 'nombres', 'apellidos')
+        .iterator(chunk_size=TAMANO_BLOQUE)
+    )
+    return streaming.respuesta_html(request, 'listar_estudiantes.html', {'todos': True}, fila, filas)
+
+
+# Orden permitido por columna: siempre termina en 'id' para que el cursor sea único
+ORDENES_ESTUDIANTES = {
+    'cedula': ('cedula', 'id'),
+    'nombres': ('nombres', 'apellidos', 'id'),
+    'apellidos': ('apellidos', 'nombres', 'id'),
+}
+
+
+def filtrar_estudiantes(parametros, queryset=None):
+    """
+    Aplica los filtros de la lista de estudiantes (cohorte, especialidad, extensión,
+    expediente y término de búsqueda) tomados de request.GET.
+    """
+    if queryset is None:
+        queryset = Estudiante.objects.all()
+    for campo in ('cohorte', 'especialidad', 'extension'):
+        valor = parametros.get(campo, '')
+        if valor.isdigit():
+            queryset = queryset.filter(**{f'{campo}_id': int(valor)})
+    expediente = parametros.get('expediente', '')
+    if expediente in dict(Estudiante.EXPEDIENTES):
+        queryset = expedientes.estudiantes_con_expediente(expediente, queryset)
+    termino = (parametros.get('search[value]') or parametros.get('q') or '').strip()
+    return busqueda.filtrar(queryset, termino)
+
+
+def _entero(valor, por_defecto, minimo=0, maximo=None):
+    try:
+        valor = int(valor)
+    except (TypeError, ValueError):
+        return por_defecto
+    valor = max(valor, minimo)
+    return min(valor, maximo) if maximo is not None else valor
+
+
+@condicional.segun_tablas('estudiantes')
+def listar_estudiantes_datos(request):
+    """
+    Página de estudiantes en el formato "server-side" de DataTables. Usa un cursor
+    (parámetro 'cursor') sobre (apellidos, nombres, id) en vez de OFFSET y no cuenta
+    el total de la tabla: recordsFiltered solo indica si existe una página siguiente.
+    """
+    inicio = _entero(request.GET.get('start'), 0)
+    cantidad = _entero(request.GET.get('length'), 25, minimo=1, maximo=100)
+
+    columna = request.GET.get('order[0][column]', '')
+    campo_orden = request.GET.get(f'columns[{columna}][data]', 'apellidos')
+    claves = ORDENES_ESTUDIANTES.get(campo_orden, ORDENES_ESTUDIANTES['apellidos'])
+    descendente = request.GET.get('order[0][dir]') == 'desc'
+
+    queryset = filtrar_estudiantes(request.GET).values('id', 'cedula', 'nombres', 'apellidos')
+    filas, siguiente = paginar(
+        queryset, claves,
+        cursor=request.GET.get('cursor'),
+        cantidad=cantidad,
+        descendente=descendente,
+        desplazamiento=inicio,
+    )
+
+    es_admin = solo_admin(request)
+    for fila in filas:
+        fila['acciones'] = {'ver': reverse('detalle_estudiante', args=[fila['id']])}
+        if es_admin:
+            fila['acciones']['editar'] = reverse('editar_estudiante', args=[fila['id']])
+            fila['acciones']['eliminar'] = reverse('eliminar_estudiante', args=[fila['id']])
+
+    vistos = inicio + len(filas) + (1 if siguiente else 0)
+    return JsonResponse({
+        'draw': _entero(request.GET.get('draw'), 0),
+        'recordsTotal': vistos,
+        'recordsFiltered': vistos,
+        'data': filas,
+        'cursor': siguiente,
+    })
+
+
+# ===== BÚSQUEDA RÁPIDA (autocompletado) =====
+def buscar_estudiantes(request):
+    """
+    Estudiantes que coinciden con 'q' (cédula, nombres o apellidos, por prefijo y sin
+    importar acentos), ordenados por relevancia.
+    """
+    if not request.session.get('usuario_id'):
+        return JsonResponse({'error': 'Sesión no iniciada.'}, status=401)
+    limite = _entero(request.GET.get('limite'), busqueda.LIMITE, minimo=1, maximo=50)
+    resultados = busqueda.buscar(request.GET.get('q', ''), limite)
+    for resultado in resultados:
+        resultado['url'] = reverse('detalle_estudiante', args=[resultado['id']])
+    return JsonResponse({
+        'motor': 'fts5' if busqueda.fts_disponible() else 'like',
+        'resultados': resultados,
     })
 
 
 
 
 # 📋 Listar extensiones
+@condicional.segun_tablas('extensiones')
 def listar_extensiones(request):
-    extensiones = Extension.objects.all()
+    extensiones = referencias.obtener('extensiones')
     return render(request, 'listar_extensiones.html', {'extensiones': extensiones})
 
 # ➕ Registrar nueva extensión
@@ -182,7 +395,7 @@ def registrar_extension(request):
     if request.method == 'POST':
         form = ExtensionForm(request.POST)
         if form.is_valid():
-            form.save()
+            auditoria.registrar(auditoria.CREAR, form.save())
             messages.success(request, 'Extensión registrada correctamente.')
             return redirect('listar_extensiones')
     else:
@@ -196,9 +409,11 @@ def editar_extension(request, id):
         return redirect('listar_extensiones')
     extension = get_object_or_404(Extension, id=id)
     if request.method == 'POST':
+        antes = auditoria.instantanea(extension)
         form = ExtensionForm(request.POST, instance=extension)
         if form.is_valid():
             form.save()
+            auditoria.registrar(auditoria.EDITAR, extension, antes)
             messages.success(request, 'Extensión actualizada correctamente.')
             return redirect('listar_extensiones')
     else:
@@ -212,7 +427,9 @@ def eliminar_extension(request, id):
         return redirect('listar_extensiones')
     extension = get_object_or_404(Extension, id=id)
     if request.method == 'POST':
-        extension.delete()
+        with transaction.atomic():
+            auditoria.registrar(auditoria.ELIMINAR, extension)
+            extension.delete()
         messages.success(request, 'Extensión eliminada correctamente.')
         return redirect('listar_extensiones')
     return render(request, 'eliminar_extension.html', {'extension': extension})
@@ -251,6 +468,7 @@ def logout_usuario(request):
 
 
 # ===== LISTAR USUARIOS =====
+@condicional.segun_tablas('usuarios')
 def listar_usuarios(request):
     if not request.session.get('usuario_id'):
         return redirect('login_usuario')
@@ -270,7 +488,7 @@ def crear_usuario(request):
     if request.method == "POST":
         form = UsuarioForm(request.POST)
         if form.is_valid():
-            form.save()
+            auditoria.registrar(auditoria.CREAR, form.save())
             messages.success(request, "Usuario creado correctamente")
             return redirect('listar_usuarios')
     else:
@@ -290,11 +508,13 @@ def editar_usuario(request, pk):
     usuario = get_object_or_404(Usuario, pk=pk)
 
     if request.method == "POST":
+        antes = auditoria.instantanea(usuario)
         # Para evitar error de validación de nombre único al editar
         form = UsuarioForm(request.POST, instance=usuario)
         if form.is_valid():
             # Permitir mantener el mismo nombre de usuario
             form.save()
+            auditoria.registrar(auditoria.EDITAR, usuario, antes)
             messages.success(request, "Usuario actualizado correctamente")
             return redirect('listar_usuarios')
     else:
@@ -314,16 +534,186 @@ def eliminar_usuario(request, pk):
     usuario = get_object_or_404(Usuario, pk=pk)
 
     if request.method == "POST":
-        usuario.delete()
+        with transaction.atomic():
+            auditoria.registrar(auditoria.ELIMINAR, usuario)
+            usuario.delete()
         messages.success(request, "Usuario eliminado correctamente")
         return redirect('listar_usuarios')
 
     return render(request, "eliminar_usuario.html", {'usuario': usuario})
 
 
+# ===== ESTADO DE LA CACHÉ DE REFERENCIAS =====
+# Contadores del proceso que atiende la petición (cada proceso tiene los suyos)
+def estado_referencias(request):
+    if not solo_admin(request):
+        return JsonResponse({'error': 'No tienes permisos.'}, status=403)
+    return JsonResponse(referencias.estadisticas())
+
+
+# ===== PERFILES DE PETICIONES (solo administrador) =====
+def listar_perfiles(request):
+    if not solo_admin(request):
+        messages.error(request, "No tienes permisos para ver los perfiles.")
+        return redirect('home')
+    return render(request, 'listar_perfiles.html', {
+        'perfiles': perfiles.listar(),
+        'directorio': settings.PERFILES_DIR,
+    })
+
+
+def descargar_perfil(request, nombre):
+    if not solo_admin(request):
+        messages.error(request, "No tienes permisos para ver los perfiles.")
+        return redirect('home')
+    ruta = perfiles.ruta_archivo(nombre)
+    if ruta is None:
+        raise Http404("Perfil no encontrado")
+    return FileResponse(open(ruta, 'rb'), as_attachment=True, filename=nombre)
+
+
+# ===== AUDITORÍA (solo administrador) =====
+# Filtros: estudiante (id) o cédula, usuario (id), desde y hasta (AAAA-MM-DD)
+AUDITORIA_POR_PAGINA = 50
+
+
+def _inicio_del_dia(texto, dias=0):
+    try:
+        dia = parse_date(texto or '')
+    except ValueError:
+        dia = None
+    if dia is None:
+        return None
+    return timezone.make_aware(datetime.combine(dia + timedelta(days=dias), time.min))
+
+
+def _filtrar_auditoria(parametros):
+    registros = RegistroAuditoria.objects.all()
+    estudiante = parametros.get('estudiante', '')
+    cedula = parametros.get('cedula', '').strip()
+    if cedula:
+        estudiante = Estudiante.objects.filter(cedula=cedula).values_list('pk', flat=True).first()
+        if estudiante is None:
+            return registros.none()
+    if str(estudiante).isdigit():
+        registros = registros.filter(estudiante_id=int(estudiante))
+    usuario = parametros.get('usuario', '')
+    if usuario.isdigit():
+        registros = registros.filter(usuario_id=int(usuario))
+    # Por rango de fecha y hora (no fecha__date), para que se use el índice
+    desde = _inicio_del_dia(parametros.get('desde'))
+    if desde:
+        registros = registros.filter(fecha__gte=desde)
+    hasta = _inicio_del_dia(parametros.get('hasta'), dias=1)
+    if hasta:
+        registros = registros.filter(fecha__lt=hasta)
+    return registros
+
+
+def listar_auditoria(request):
+    if not solo_admin(request):
+        messages.error(request, "No tienes permisos para ver la auditoría.")
+        return redirect('home')
+    registros, siguiente = paginar(
+        _filtrar_auditoria(request.GET), ('fecha', 'id'),
+        cursor=request.GET.get('cursor'), cantidad=AUDITORIA_POR_PAGINA, descendente=True,
+    )
+    parametros = request.GET.copy()
+    if siguiente:
+        parametros['cursor'] = siguiente
+    return render(request, 'listar_auditoria.html', {
+        'registros': registros,
+        'siguiente': parametros.urlencode() if siguiente else None,
+        'usuarios': Usuario.objects.order_by('nombre_usuario').values_list('pk', 'nombre_usuario'),
+        'filtros': request.GET,
+    })
+
+
+# ===== TRABAJOS EN SEGUNDO PLANO =====
+# Cada usuario ve sus trabajos; el administrador, todos (ver trabajos.py)
+FILTROS_EXPORTACION = ('cohorte', 'especialidad', 'extension', 'expediente', 'q')
+TRABAJOS_MOSTRADOS = 50
+
+
+def _trabajos_visibles(request):
+    if solo_admin(request):
+        return Trabajo.objects.all()
+    return Trabajo.objects.filter(usuario_id=request.session.get('usuario_id'))
+
+
+def listar_trabajos(request):
+    if not request.session.get('usuario_id'):
+        return redirect('login_usuario')
+    lista = list(_trabajos_visibles(request).order_by('-creado', '-pk')[:TRABAJOS_MOSTRADOS])
+    return render(request, 'listar_trabajos.html', {
+        'trabajos': [(trabajo, trabajos.como_dict(trabajo)) for trabajo in lista],
+        'reportes': [(clave, titulo) for clave, (titulo, _, _) in EXPORTACIONES.items()],
+        'formatos': FORMATOS,
+        'cohortes': referencias.obtener('cohortes'),
+        'especialidades': referencias.obtener('especialidades'),
+        'extensiones': referencias.obtener('extensiones'),
+        'expedientes': Estudiante.EXPEDIENTES,
+        'es_admin': solo_admin(request),
+    })
+
+
+def crear_trabajo(request):
+    if not request.session.get('usuario_id'):
+        return redirect('login_usuario')
+    if request.method != 'POST':
+        return redirect('listar_trabajos')
+    tipo = request.POST.get('tipo')
+    if tipo == 'exportar':
+        reporte = request.POST.get('reporte')
+        formato = request.POST.get('formato')
+        if reporte not in EXPORTACIONES or formato not in FORMATOS:
+            messages.error(request, "❌ Exportación no disponible.")
+            return redirect('listar_trabajos')
+        filtros = {campo: request.POST[campo] for campo in FILTROS_EXPORTACION if request.POST.get(campo)}
+        parametros = {'reporte': reporte, 'formato': formato, 'filtros': filtros}
+    elif tipo == 'paquete_cohorte':
+        cohorte = request.POST.get('cohorte', '')
+        if not cohorte.isdigit() or not Cohorte.objects.filter(pk=cohorte).exists():
+            messages.error(request, "❌ Selecciona una cohorte.")
+            return redirect('listar_trabajos')
+        parametros = {'cohorte': int(cohorte)}
+    elif tipo == 'recalcular_expedientes' and solo_admin(request):
+        parametros = {}
+    else:
+        messages.error(request, "No tienes permisos para crear ese trabajo.")
+        return redirect('listar_trabajos')
+    trabajo = trabajos.crear(tipo, parametros, request.session.get('usuario_id'))
+    messages.success(request, f"⏳ Trabajo #{trabajo.pk} en cola.")
+    return redirect('listar_trabajos')
+
+
+def estado_trabajo(request, pk):
+    """
+    Avance y resultado de un trabajo, para consultar cada pocos segundos desde la página.
+    """
+    if not request.session.get('usuario_id'):
+        return JsonResponse({'error': 'Sesión no iniciada.'}, status=401)
+    trabajo = _trabajos_visibles(request).filter(pk=pk).first()
+    if trabajo is None:
+        return JsonResponse({'error': 'Trabajo no encontrado.'}, status=404)
+    return JsonResponse(trabajos.como_dict(trabajo))
+
+
+def descargar_trabajo(request, pk):
+    if not request.session.get('usuario_id'):
+        return redirect('login_usuario')
+    trabajo = _trabajos_visibles(request).filter(pk=pk).first()
+    ruta = trabajos.ruta_resultado(trabajo) if trabajo else None
+    if ruta is None:
+        raise Http404("Archivo no disponible o vencido")
+    nombre = trabajo.archivo.split('-', 1)[1]
+    return FileResponse(open(ruta, 'rb'), as_attachment=True, filename=nombre)
+
+
 # 📋 Listar cohortes
+@condicional.segun_tablas('cohortes')
 def listar_cohortes(request):
-    cohortes = Cohorte.objects.all().order_by('nombre_cohorte')
+    cohortes = referencias.obtener('cohortes')
     return render(request, 'listar_cohortes.html', {'cohortes': cohortes})
 
 # ➕ Registrar nueva cohorte
@@ -334,7 +724,7 @@ def registrar_cohorte(request):
     if request.method == 'POST':
         form = CohorteForm(request.POST)
         if form.is_valid():
-            form.save()
+            auditoria.registrar(auditoria.CREAR, form.save())
             messages.success(request, '✅ Cohorte registrada correctamente.')
             return redirect('listar_cohortes')
         else:
@@ -350,9 +740,11 @@ def editar_cohorte(request, id):
         return redirect('listar_cohortes')
     cohorte = get_object_or_404(Cohorte, id=id)
     if request.method == 'POST':
+        antes = auditoria.instantanea(cohorte)
         form = CohorteForm(request.POST, instance=cohorte)
         if form.is_valid():
             form.save()
+            auditoria.registrar(auditoria.EDITAR, cohorte, antes)
             messages.success(request, '✅ Cohorte actualizada correctamente.')
             return redirect('listar_cohortes')
         else:
@@ -368,7 +760,9 @@ def eliminar_cohorte(request, id):
         return redirect('listar_cohortes')
     cohorte = get_object_or_404(Cohorte, id=id)
     if request.method == 'POST':
-        cohorte.delete()
+        with transaction.atomic():
+            auditoria.registrar(auditoria.ELIMINAR, cohorte)
+            cohorte.delete()
         messages.success(request, '🗑️ Cohorte eliminada correctamente.')
         return redirect('listar_cohortes')
     return render(request, 'eliminar_cohorte.html', {'cohorte': cohorte})
@@ -379,8 +773,9 @@ def eliminar_cohorte(request, id):
 # ====================================
 
 # 📋 Listar especialidades
+@condicional.segun_tablas('especialidades')
 def listar_especialidades(request):
-    especialidades = Especialidad.objects.all().order_by('nombre_especialidad')
+    especialidades = referencias.obtener('especialidades')
     return render(request, 'listar_especialidades.html', {'especialidades': especialidades})
 
 # ➕ Registrar nueva especialidad
@@ -391,7 +786,7 @@ def registrar_especialidad(request):
     if request.method == 'POST':
         form = EspecialidadForm(request.POST)
         if form.is_valid():
-            form.save()
+            auditoria.registrar(auditoria.CREAR, form.save())
             messages.success(request, '✅ Especialidad registrada correctamente.')
             return redirect('listar_especialidades')
         else:
@@ -407,9 +802,11 @@ def editar_especialidad(request, id):
         return redirect('listar_especialidades')
     especialidad = get_object_or_404(Especialidad, id=id)
     if request.method == 'POST':
+        antes = auditoria.instantanea(especialidad)
         form = EspecialidadForm(request.POST, instance=especialidad)
         if form.is_valid():
             form.save()
+            auditoria.registrar(auditoria.EDITAR, especialidad, antes)
             messages.success(request, '✅ Especialidad actualizada correctamente.')
             return redirect('listar_especialidades')
         else:
@@ -425,7 +822,9 @@ def eliminar_especialidad(request, id):
         return redirect('listar_especialidades')
     especialidad = get_object_or_404(Especialidad, id=id)
     if request.method == 'POST':
-        especialidad.delete()
+        with transaction.atomic():
+            auditoria.registrar(auditoria.ELIMINAR, especialidad)
+            especialidad.delete()
         messages.success(request, '🗑️ Especialidad eliminada correctamente.')
         return redirect('listar_especialidades')
     return render(request, 'eliminar_especialidad.html', {'especialidad': especialidad})
@@ -433,17 +832,38 @@ def eliminar_especialidad(request, id):
 # ====================================
 # ===== REPORTES ESTADÍSTICOS ========
 # ====================================
+# Vistas async: las consultas se hacen fuera del bucle de eventos y, cuando son
+# varias e independientes, a la vez (ver asincrono.py). Los datos se leen completos
+# antes de renderizar, porque la plantilla no puede consultar la base de datos; la
+# excepción es el detalle de expedientes incompletos, que se envía en streaming y lee
+# sus filas con asincrono.iterar (ver streaming.py).
+
+# Los conteos salen de las tablas de resumen (ver matricula.py)
+def datos_matricula_cohorte():
+    return matricula.por_cohorte()
 
-def reporte_matricula_cohorte(request):
+
+def datos_por_especialidad():
+    return matricula.por_especialidad()
+
+
+def datos_por_extension():
+    return matricula.por_extension()
+
+
+def _con_porcentaje(datos):
+    total_general = sum(d['total'] for d in datos)
+    for d in datos:
+        d['porcentaje'] = round((d['total'] / total_general * 100), 2) if total_general > 0 else 0
+    return total_general
+
+
+@condicional.segun_tablas(*condicional.REPORTES)
+async def reporte_matricula_cohorte(request):
     """
     Cantidad de matrícula (estudiantes inscritos en cada cohorte)
     """
-    datos = (
-        Estudiante.objects
-        .values('cohorte__nombre_cohorte', 'cohorte__mes', 'cohorte__anio')
-        .annotate(total=Count('id'))
-        .order_by('cohorte__anio', 'cohorte__mes')
-    )
+    datos = await asincrono.ejecutar(list, datos_matricula_cohorte())
 
     total_general = sum(d['total'] for d in datos)
     contexto = {
@@ -453,71 +873,59 @@ def reporte_matricula_cohorte(request):
     return render(request, 'reporte_matricula_cohorte.html', contexto)
 
 
-def reporte_expedientes_completos(request):
+@condicional.segun_tablas(*condicional.REPORTES)
+async def reporte_expedientes_completos(request):
     """
     Cantidad y porcentaje de estudiantes con expedientes completos (todos los documentos en 'Sí')
     """
-    estudiantes = Estudiante.objects.all()
-    total_estudiantes = estudiantes.count()
-    completos = 0
-
-    for est in estudiantes:
-        documentos = DocumentoEstudiante.objects.filter(estudiante=est)
-        if documentos.exists() and all(doc.estado_documento == 'Sí' for doc in documentos):
-            completos += 1
-
-    porcentaje = (completos / total_estudiantes * 100) if total_estudiantes > 0 else 0
+    resumen = await asincrono.ejecutar(expedientes.resumen_expedientes)
+    total_estudiantes = resumen['total']
+    completos = resumen[expedientes.COMPLETO]
 
     contexto = {
         'total_estudiantes': total_estudiantes,
         'completos': completos,
-        'porcentaje': round(porcentaje, 2)
+        'porcentaje': expedientes.porcentaje(completos, total_estudiantes)
     }
     return render(request, 'reporte_expedientes_completos.html', contexto)
 
 
-def reporte_expedientes_incompletos(request):
+# Cédula, nombres, apellidos, especialidad, cohorte, extensión y documentos faltantes
+FILA_EXPEDIENTE_INCOMPLETO = '<tr>' + '<td>{}</td>' * 7 + '</tr>\n'
+
+
+@condicional.segun_tablas(*condicional.REPORTES)
+async def reporte_expedientes_incompletos(request):
     """
     Cantidad y porcentaje de estudiantes con expedientes incompletos 
     (al menos un documento en estado 'No' o 'Vencida')
     """
-    estudiantes = Estudiante.objects.all()
-    total_estudiantes = estudiantes.count()
-    incompletos = 0
-    detalle_incompletos = []
-
-    for est in estudiantes:
-        documentos = DocumentoEstudiante.objects.filter(estudiante=est)
-        # Verificamos si al menos un documento está en 'No' o 'Vencida'
-        if documentos.exists() and any(doc.estado_documento in ['No', 'Vencida'] for doc in documentos):
-            incompletos += 1
-            detalle_incompletos.append(est)
-
-    porcentaje = (incompletos / total_estudiantes * 100) if total_estudiantes > 0 else 0
+    resumen = await asincrono.ejecutar(expedientes.resumen_expedientes)
+    total_estudiantes = resumen['total']
+    incompletos = resumen[expedientes.INCOMPLETO]
 
     contexto = {
         'total_estudiantes': total_estudiantes,
         'incompletos': incompletos,
-        'porcentaje': round(porcentaje, 2),
-        'detalles': detalle_incompletos  # para mostrar la tabla de detalle
+        'porcentaje': expedientes.porcentaje(incompletos, total_estudiantes),
     }
-    return render(request, 'reporte_expedientes_incompletos.html', contexto)
+    # La tabla de detalle llega en streaming, a medida que se leen las filas
+    filas = (
+        ['-' if valor is None else valor for valor in fila]
+        for fila in _filas_expedientes_incompletos(request.GET)
+    )
+    return streaming.respuesta_html(
+        request, 'reporte_expedientes_incompletos.html', contexto, FILA_EXPEDIENTE_INCOMPLETO, filas,
+    )
 
 
-def comparativa_especialidad(request):
+@condicional.segun_tablas(*condicional.REPORTES)
+async def comparativa_especialidad(request):
     """
     Comparativa del total de estudiantes inscritos por especialidad
     """
-    datos = (
-        Estudiante.objects
-        .values('especialidad__nombre_especialidad')
-        .annotate(total=Count('id'))
-        .order_by('especialidad__nombre_especialidad')
-    )
-
-    total_general = sum(d['total'] for d in datos)
-    for d in datos:
-        d['porcentaje'] = round((d['total'] / total_general * 100), 2) if total_general > 0 else 0
+    datos = await asincrono.ejecutar(list, datos_por_especialidad())
+    total_general = _con_porcentaje(datos)
 
     contexto = {
         'datos': datos,
@@ -526,20 +934,13 @@ def comparativa_especialidad(request):
     return render(request, 'comparativa_especialidad.html', contexto)
 
 
-def comparativa_extension(request):
+@condicional.segun_tablas(*condicional.REPORTES)
+async def comparativa_extension(request):
     """
     Comparativa del total de estudiantes inscritos por extensión
     """
-    datos = (
-        Estudiante.objects
-        .values('extension__nombre_extension')
-        .annotate(total=Count('id'))
-        .order_by('extension__nombre_extension')
-    )
-
-    total_general = sum(d['total'] for d in datos)
-    for d in datos:
-        d['porcentaje'] = round((d['total'] / total_general * 100), 2) if total_general > 0 else 0
+    datos = await asincrono.ejecutar(list, datos_por_extension())
+    total_general = _con_porcentaje(datos)
 
     contexto = {
         'datos': datos,
@@ -547,3 +948,203 @@ def comparativa_extension(request):
     }
     return render(request, 'comparativa_extension.html', contexto)
 
+
+# ===== TABLA DINÁMICA =====
+def _parametros_pivote(parametros):
+    """
+    Lee filas, columnas, medida, porcentaje y filtros de la URL; lo que no sea válido
+    se reemplaza por el valor por defecto.
+    """
+    filas = parametros.get('filas')
+    columnas = parametros.get('columnas')
+    if filas not in pivote.DIMENSIONES:
+        filas = 'especialidad'
+    if columnas not in pivote.DIMENSIONES or columnas == filas:
+        columnas = 'extension' if filas != 'extension' else 'especialidad'
+    medida = parametros.get('medida')
+    porcentaje = parametros.get('porcentaje', '')
+    filtros = {
+        dimension: _entero(parametros.get(dimension), None, minimo=1)
+        for dimension in ('especialidad', 'extension', 'cohorte')
+    }
+    return {
+        'filas': filas,
+        'columnas': columnas,
+        'medida': medida if medida in pivote.VALORES else 'estudiantes',
+        'porcentaje': porcentaje if porcentaje in pivote.PORCENTAJES else '',
+        'filtros': filtros,
+    }
+
+
+@condicional.segun_tablas(*condicional.REPORTES)
+async def reporte_pivote(request):
+    """
+    Tabla dinámica: cruza dos dimensiones (especialidad, extensión, cohorte o estado
+    del documento) con totales y porcentajes
+    """
+    parametros = _parametros_pivote(request.GET)
+    tabla, especialidades, extensiones, cohortes = await asincrono.en_paralelo(
+        lambda: pivote.pivotar(**parametros),
+        lambda: referencias.obtener('especialidades'),
+        lambda: referencias.obtener('extensiones'),
+        lambda: referencias.obtener('cohortes'),
+    )
+    contexto = {
+        'pivote': tabla,
+        'parametros': parametros,
+        'dimensiones': [(clave, titulo) for clave, (titulo, _, _) in pivote.DIMENSIONES.items()],
+        'medidas': [(clave, titulo) for clave, (titulo, _) in pivote.VALORES.items()],
+        'porcentajes': pivote.PORCENTAJES.items(),
+        'especialidades': especialidades,
+        'extensiones': extensiones,
+        'cohortes': cohortes,
+        'consulta': request.GET.urlencode(),
+    }
+    return render(request, 'reporte_pivote.html', contexto)
+
+
+def exportar_pivote(request, formato):
+    if not request.session.get('usuario_id'):
+        return redirect('login_usuario')
+    if formato not in FORMATOS:
+        raise Http404("Exportación no disponible.")
+    tabla = pivote.pivotar(**_parametros_pivote(request.GET))
+    return respuesta_exportacion('tabla-dinamica', formato, tabla.encabezado(), tabla.filas_exportacion(),
+                                 hoja='Tabla Dinámica')
+
+
+# ===== PANEL DE REPORTES =====
+@condicional.segun_tablas(*condicional.REPORTES)
+async def panel_reportes(request):
+    """
+    Matrícula por cohorte, especialidad y extensión y estado de los expedientes en una
+    sola página; las cuatro consultas se hacen a la vez
+    """
+    cohortes, especialidades, extensiones, resumen = await asincrono.en_paralelo(
+        lambda: list(datos_matricula_cohorte()),
+        lambda: list(datos_por_especialidad()),
+        lambda: list(datos_por_extension()),
+        expedientes.resumen_expedientes,
+    )
+    total_estudiantes = resumen['total']
+    _con_porcentaje(cohortes)
+    _con_porcentaje(especialidades)
+    _con_porcentaje(extensiones)
+    contexto = {
+        'cohortes': cohortes,
+        'especialidades': especialidades,
+        'extensiones': extensiones,
+        'expedientes': [
+            (titulo, resumen[clave], expedientes.porcentaje(resumen[clave], total_estudiantes))
+            for clave, titulo in Estudiante.EXPEDIENTES
+        ],
+        'total_estudiantes': total_estudiantes,
+    }
+    return render(request, 'panel_reportes.html', contexto)
+
+
+# ====================================
+# ===== EXPORTACIONES ================
+# ====================================
+# Se generan en el servidor y se envían en streaming (ver exportacion.py)
+
+def _filas_estudiantes(parametros):
+    expedientes_texto = dict(Estudiante.EXPEDIENTES)
+    filas = (
+        filtrar_estudiantes(parametros)
+        .order_by('apellidos', 'nombres', 'id')
+        .values_list('cedula', 'nombres', 'apellidos', 'especialidad__nombre_especialidad',
+                     'cohorte__nombre_cohorte', 'extension__nombre_extension', 'estado_expediente')
+        .iterator(chunk_size=TAMANO_BLOQUE)
+    )
+    for *fila, expediente in filas:
+        yield fila + [expedientes_texto.get(expediente, expediente)]
+
+
+def _filas_matricula_cohorte(parametros):
+    for d in datos_matricula_cohorte():
+        yield d['cohorte__nombre_cohorte'], d['cohorte__mes'], d['cohorte__anio'], d['total']
+
+
+def _filas_expedientes_incompletos(parametros):
+    yield from (
+        expedientes.estudiantes_con_expediente(expedientes.INCOMPLETO)
+        .order_by('apellidos', 'nombres', 'id')
+        .values_list('cedula', 'nombres', 'apellidos', 'especialidad__nombre_especialidad',
+                     'cohorte__nombre_cohorte', 'extension__nombre_extension', 'documentos_faltantes')
+        .iterator(chunk_size=TAMANO_BLOQUE)
+    )
+
+
+def _filas_comparativa(datos, campo):
+    datos = list(datos)
+    total_general = sum(d['total'] for d in datos)
+    for d in datos:
+        yield d[campo], d['total'], expedientes.porcentaje(d['total'], total_general)
+
+
+EXPORTACIONES = {
+    'estudiantes': (
+        'Estudiantes',
+        ['Cédula', 'Nombres', 'Apellidos', 'Especialidad', 'Cohorte', 'Extensión', 'Expediente'],
+        _filas_estudiantes,
+    ),
+    'matricula-cohorte': (
+        'Matrícula por Cohorte',
+        ['Cohorte', 'Mes', 'Año', 'Total Inscritos'],
+        _filas_matricula_cohorte,
+    ),
+    'expedientes-incompletos': (
+        'Expedientes Incompletos',
+        ['Cédula', 'Nombres', 'Apellidos', 'Especialidad', 'Cohorte', 'Extensión', 'Documentos Faltantes'],
+        _filas_expedientes_incompletos,
+    ),
+    'comparativa-especialidad': (
+        'Comparativa por Especialidad',
+        ['Especialidad', 'Total', 'Porcentaje'],
+        lambda parametros: _filas_comparativa(datos_por_especialidad(), 'especialidad__nombre_especialidad'),
+    ),
+    'comparativa-extension': (
+        'Comparativa por Extensión',
+        ['Extensión', 'Total', 'Porcentaje'],
+        lambda parametros: _filas_comparativa(datos_por_extension(), 'extension__nombre_extension'),
+    ),
+}
+
+
+def exportar(request, reporte, formato):
+    if not request.session.get('usuario_id'):
+        return redirect('login_usuario')
+    if reporte not in EXPORTACIONES or formato not in FORMATOS:
+        raise Http404("Exportación no disponible.")
+    titulo, encabezado, filas = EXPORTACIONES[reporte]
+    return respuesta_exportacion(reporte, formato, encabezado, filas(request.GET), hoja=titulo)
+
+
+# ====================================
+# ===== API JSON (v1, solo lectura) ==
+# ====================================
+# Usa la misma sesión que las páginas; los parámetros están en api.py
+
+def _api(request, funcion, *args):
+    if not request.session.get('usuario_id'):
+        return api.respuesta({'error': 'Sesión no iniciada.'}, status=401)
+    try:
+        return api.respuesta(funcion(*args))
+    except ValueError as error:
+        return api.respuesta({'error': str(error)}, status=400)
+
+
+@condicional.segun_tablas('estudiantes', 'documentos', 'cohortes', 'especialidades', 'extensiones')
+def api_estudiantes(request):
+    return _api(request, api.estudiantes, request.GET)
+
+
+# Sin ETag: el resultado depende de la hora (api.MARGEN_CAMBIOS)
+def api_cambios(request):
+    return _api(request, api.cambios, request.GET)
+
+
+@condicional.segun_tablas('cohortes', 'especialidades', 'extensiones')
+def api_referencias(request, tabla):
+    return _api(request, api.referencias, tabla)
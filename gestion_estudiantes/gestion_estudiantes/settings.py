@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -41,20 +42,29 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Primero, para que también cuente las consultas de sesión y mensajes
+    'estudiantes.middleware.MetricasMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    # Antes de la sesión: los archivos estáticos no la necesitan
+    'estudiantes.middleware.EstaticosMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
+    # Después de la sesión: guarda quién hizo cada cambio (ver auditoria.py)
+    'estudiantes.middleware.AuditoriaMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    # Después de la sesión: solo perfila peticiones de administradores
+    'estudiantes.middleware.PerfilMiddleware',
 ]
 
 ROOT_URLCONF = 'gestion_estudiantes.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates que además mide el tiempo de render (estudiantes/metricas.py)
+        'BACKEND': 'estudiantes.metricas.PlantillasMedidas',
         'DIRS': [],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -73,14 +83,154 @@ WSGI_APPLICATION = 'gestion_estudiantes.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# DB_MOTOR=sqlite (por defecto): archivo db.sqlite3 (o DB_NOMBRE) con WAL, que se guarda
+#   en el archivo y lo activa una vez la migración 0013, y los PRAGMA de SQLITE_PRAGMAS,
+#   que Django ejecuta al abrir cada conexión (OPTIONS['init_command']).
+#   SQLITE_AJUSTES=0 deja la configuración por defecto de Django (solo para comparar).
+# DB_MOTOR=postgresql: usa DB_NOMBRE, DB_USUARIO, DB_CLAVE, DB_HOST y DB_PUERTO, con un
+#   pool de conexiones de psycopg 3 (pip install "psycopg[binary,pool]").
+# Las conexiones se reutilizan entre peticiones durante DB_CONEXION_SEGUNDOS.
+
+DB_MOTOR = os.environ.get('DB_MOTOR', 'sqlite')
+DB_CONEXION_SEGUNDOS = int(os.environ.get('DB_CONEXION_SEGUNDOS', 600))
+
+SQLITE_AJUSTES = os.environ.get('SQLITE_AJUSTES', '1') == '1'
+# Solo los que valen por conexión (journal_mode no: ver la migración 0013)
+SQLITE_PRAGMAS = {
+    'synchronous': 'NORMAL',        # seguro con WAL; no sincroniza el disco en cada commit
+    'busy_timeout': int(os.environ.get('SQLITE_ESPERA_MS', 5000)),  # espera al escritor en vez de fallar
+    'cache_size': -20000,           # 20 MB de caché de páginas por conexión
+    'mmap_size': 256 * 1024 * 1024, # lee el archivo mapeado en memoria
+    'temp_store': 'MEMORY',         # ordenamientos temporales en memoria
+} if SQLITE_AJUSTES else {}
+SQLITE_INICIO = '; '.join(f"PRAGMA {nombre} = {valor}" for nombre, valor in SQLITE_PRAGMAS.items())
+
+if DB_MOTOR == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('DB_NOMBRE', 'gestion_estudiantes'),
+            'USER': os.environ.get('DB_USUARIO', 'postgres'),
+            'PASSWORD': os.environ.get('DB_CLAVE', ''),
+            'HOST': os.environ.get('DB_HOST', 'localhost'),
+            'PORT': os.environ.get('DB_PUERTO', '5432'),
+            # Con pool, Django devuelve la conexión al pool al terminar cada petición
+            # (por eso CONN_MAX_AGE debe quedar en 0)
+            'CONN_MAX_AGE': 0,
+            'OPTIONS': {
+                'pool': {
+                    'min_size': int(os.environ.get('DB_POOL_MIN', 2)),
+                    'max_size': int(os.environ.get('DB_POOL_MAX', 10)),
+                    'timeout': 10,
+                },
+            },
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('DB_NOMBRE', BASE_DIR / 'db.sqlite3'),
+            'CONN_MAX_AGE': DB_CONEXION_SEGUNDOS,
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                # Toma el bloqueo de escritura al empezar la transacción: evita el
+                # "database is locked" que ocurre al pasar de lectura a escritura
+                'transaction_mode': 'IMMEDIATE',
+                'init_command': SQLITE_INICIO,
+            } if SQLITE_AJUSTES else {},
+        }
+    }
+
+
+# Caché
+# CACHE_BACKEND=archivo (por defecto): en disco (CACHE_DIR), compartida por todos los
+# procesos del servidor y por el de trabajos. Las versiones de datos (estudiantes/
+# versiones.py) viven aquí: los ETag, los datos de referencia y los gráficos del
+# inicio de cada proceso se invalidan cuando otro proceso escribe.
+# CACHE_BACKEND=memoria: en la memoria de cada proceso. Solo para un servidor de un
+# único proceso (runserver): con varios, un proceso no ve los cambios de versión de
+# otro y sigue respondiendo 304 y validando con datos viejos.
+
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'archivo')
+
+if CACHE_BACKEND == 'archivo':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ.get('CACHE_DIR', BASE_DIR / 'cache'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'gestion_estudiantes',
+        }
     }
+
+# Segundos que se guardan los gráficos del inicio (igual se invalidan al cambiar los datos)
+TABLERO_CACHE_SEGUNDOS = 60 * 60
+
+# Segundos que se guarda el cubo de la tabla dinámica (estudiantes/pivote.py)
+PIVOTE_CACHE_SEGUNDOS = 60 * 60
+
+# Vistas async de reportes (estudiantes/asincrono.py): con CONSULTAS_CONCURRENTES las
+# consultas independientes de una página se hacen a la vez, cada una con su conexión.
+# Con False van una tras otra en el hilo de la petición.
+CONSULTAS_CONCURRENTES = os.environ.get('CONSULTAS_CONCURRENTES', '1') == '1'
+# Hilos (y conexiones) del proceso para esas consultas
+CONSULTAS_HILOS = int(os.environ.get('CONSULTAS_HILOS', 8))
+
+
+# Métricas por petición (estudiantes/middleware.py)
+# Con METRICAS_CABECERAS se envían como cabeceras HTTP (Server-Timing); si no, se
+# escriben como líneas JSON en el log 'estudiantes.metricas'.
+
+METRICAS_CABECERAS = os.environ.get('METRICAS_CABECERAS', '1' if DEBUG else '0') == '1'
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'consola': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'estudiantes.metricas': {
+            'handlers': ['consola'],
+            'level': os.environ.get('METRICAS_NIVEL', 'INFO'),
+            'propagate': False,
+        },
+        'estudiantes.trabajos': {
+            'handlers': ['consola'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
 }
 
 
+# Perfiles de peticiones (estudiantes/perfiles.py), a pedido de un administrador con
+# ?perfil=cprofile o ?perfil=muestreo. PERFILES_ACTIVOS=0 desactiva la opción.
+
+PERFILES_ACTIVOS = os.environ.get('PERFILES_ACTIVOS', '1') == '1'
+PERFILES_DIR = os.environ.get('PERFILES_DIR', BASE_DIR / 'perfiles')
+PERFILES_MAXIMO = 50
+
+
+# Trabajos en segundo plano (estudiantes/trabajos.py), ejecutados por
+# "python manage.py procesar_trabajos". Los cambios que hace un trabajo invalidan la
+# caché del servidor a través de la caché compartida (CACHE_BACKEND=archivo).
+
+TRABAJOS_DIR = os.environ.get('TRABAJOS_DIR', BASE_DIR / 'trabajos')
+TRABAJOS_HILOS = int(os.environ.get('TRABAJOS_HILOS', 2))
+TRABAJOS_VENCE_SEGUNDOS = 24 * 60 * 60      # los archivos generados se borran después
+TRABAJOS_AVANCE_SEGUNDOS = 1                # frecuencia máxima con que se guarda el avance
+TRABAJOS_LATIDO_SEGUNDOS = 60              # cada cuánto un trabajo en curso avisa que sigue vivo
+TRABAJOS_ABANDONO_SEGUNDOS = 10 * 60        # en curso sin latido: su proceso se detuvo
+TRABAJOS_ERRORES_MOSTRADOS = 50
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -119,15 +269,34 @@ USE_TZ = True
 STATIC_URL = '/static/'
 
 # Opcional: si quieres una carpeta extra donde recoger archivos estáticos
+# (solo se usa si existe)
 STATICFILES_DIRS = [
-    BASE_DIR / "static",  # si tu carpeta 'static' está en la raíz del proyecto
+    carpeta for carpeta in [BASE_DIR / "static"]  # si tu carpeta 'static' está en la raíz del proyecto
+    if carpeta.is_dir()
 ]
 
+# Destino de "python manage.py collectstatic"
+STATIC_ROOT = os.environ.get('STATIC_ROOT', BASE_DIR / 'staticfiles')
+
+# Con ESTATICOS_MANIFIESTO (por defecto sin DEBUG), collectstatic agrega el hash del
+# contenido a cada nombre y guarda copias .gz/.br (estudiantes/estaticos.py); las
+# plantillas usan esos nombres. Con ESTATICOS_SERVIR, EstaticosMiddleware los sirve
+# desde STATIC_ROOT con caché de un año (útil con uvicorn o gunicorn sin otro servidor).
+ESTATICOS_MANIFIESTO = os.environ.get('ESTATICOS_MANIFIESTO', '0' if DEBUG else '1') == '1'
+ESTATICOS_SERVIR = os.environ.get('ESTATICOS_SERVIR', '1' if ESTATICOS_MANIFIESTO else '0') == '1'
+
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {
+        'BACKEND': 'estudiantes.estaticos.EstaticosComprimidos' if ESTATICOS_MANIFIESTO
+        else 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+}
+
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
-import os
 TEMPLATES[0]['DIRS'] = [os.path.join(BASE_DIR, 'templates')]